@@ -0,0 +1,48 @@
+"""
+Compares merging duplicated gene names with groupby.apply and with MQReader.sum_duplicates.
+
+Usage: python benchmarks/duplicate_merge.py [n_proteins] [n_duplicated_genes]
+"""
+import sys
+import timeit
+import numpy as np
+import pandas as pd
+
+from mspypeline import MQReader
+
+
+def create_protein_groups(n_proteins: int, n_duplicated_genes: int, n_samples: int = 20) -> pd.DataFrame:
+    rng = np.random.RandomState(0)
+    gene_names = np.array([f"GENE{i}" for i in range(n_proteins)], dtype=object)
+    # every duplicated gene name occurs twice
+    gene_names[n_proteins - n_duplicated_genes:] = gene_names[:n_duplicated_genes]
+    df = pd.DataFrame({
+        "Gene name": gene_names,
+        "Protein name": [f"Protein {i}" for i in range(n_proteins)],
+        "protein id": [f"P{i}" for i in range(n_proteins)],
+    })
+    for prefix in ("Intensity ", "LFQ intensity ", "iBAQ "):
+        for sample in range(n_samples):
+            df[f"{prefix}S{sample}"] = rng.randint(0, 10 ** 6, n_proteins).astype("int64")
+    df = df.set_index(df["Gene name"], drop=False)
+    return df[df.index.duplicated(keep=False)]
+
+
+def group_sum(x):
+    # the per group merge previously used by the MQReader
+    x.iloc[0].loc[x.select_dtypes("number").columns] = x.sum(axis=0, numeric_only=True)
+    return x.iloc[0]
+
+
+def main(n_proteins: int = 20000, n_duplicated_genes: int = 3000, repeat: int = 3):
+    df_dup = create_protein_groups(n_proteins, n_duplicated_genes)
+    t_apply = min(timeit.repeat(lambda: df_dup.groupby(df_dup.index).apply(group_sum), number=1, repeat=repeat))
+    t_vectorized = min(timeit.repeat(lambda: MQReader.sum_duplicates(df_dup), number=1, repeat=repeat))
+    print(f"{df_dup.shape[0]} rows with {n_duplicated_genes} duplicated gene names")
+    print(f"groupby.apply:  {t_apply:.3f} s")
+    print(f"sum_duplicates: {t_vectorized:.3f} s")
+    print(f"speedup:        {t_apply / t_vectorized:.1f}x")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -17,6 +17,7 @@ from .modules import *
 from .core import *
 from .file_reader import *
 from .file_reader.MQReader import MQReader
+from .file_reader.MQBatchReader import MQBatchReader
 # import for "from package import *"
 __all__ = [
     "create_app",
@@ -25,7 +26,8 @@ __all__ = [
     "__version__",
     "plotly_plots",
     "matplotlib_plots",
-    "MQReader"
+    "MQReader",
+    "MQBatchReader"
 ]
 __all__.extend(core.__all__)
 __all__.extend(modules.__all__)
@@ -1,4 +1,5 @@
 import os
+import json
 from copy import deepcopy
 from inspect import isclass
 from typing import Tuple, Dict, Type, Optional
@@ -18,6 +19,7 @@ class MSPInitializer:
     yml_file_name_tmp = "config_tmp.yml"
     yml_file_name = "config.yml"
     default_yml_name = "ms_analysis_default.yml"
+    load_timings_file_name = "load_timings.json"
     go_path = "go_terms"
     pathway_path = "pathways"
     possible_gos = sorted([x for x in os.listdir(os.path.join(path_package_config, go_path))
@@ -199,3 +201,16 @@ class MSPInitializer:
         self.logger.info("Reading proteins and receptors of interest")
         self.interesting_proteins, self.go_analysis_gene_names = self.init_interest_from_txt()
         self.update_config_file()
+
+    def write_load_timings(self):
+        """
+        Writes the time needed to load the data of all readers to load_timings.json in the config dir and logs a
+        summary table.
+
+        """
+        timings = {name: data.timings for name, data in self.reader_data.items() if hasattr(data, "timings")}
+        for name, registry in timings.items():
+            self.logger.info("Loading times of %s:\n%s", name, registry.summary())
+        os.makedirs(self.path_config, exist_ok=True)
+        with open(os.path.join(self.path_config, MSPInitializer.load_timings_file_name), "w") as f:
+            json.dump({name: registry.to_records() for name, registry in timings.items()}, f, indent=2, default=str)
@@ -17,7 +17,7 @@ from mspypeline.file_reader import BaseReader
 from mspypeline.plotting_backend import matplotlib_plots
 from mspypeline.modules import default_normalizers, Normalization, DataTree
 from mspypeline.helpers import get_number_rows_cols_for_fig, get_number_of_non_na_values, \
-    get_intersection_and_unique, get_logger, dict_depth, add_end_docstrings, make_contrasts
+    get_intersection_and_unique, get_logger, dict_depth, add_end_docstrings, make_contrasts, LazyDict
 
 # TODO VALIDATE descriptive plots not changing between log2 and non log2
 
@@ -88,6 +88,8 @@ class BasePlotter:
         "plot_venn_groups", "plot_r_volcano", "plot_pca_overview",
         "plot_normalization_overview_all_normalizers", "plot_heatmap_overview_all_normalizers"
     ]
+    # intensity_entries used by the readers to determine which columns are required
+    default_intensity_entries = ()
 
     def __init__(
             self,
@@ -149,7 +151,8 @@ class BasePlotter:
         # setup everything for all_intensity dict
         self.int_mapping = {}
         self.intensity_label_names = {}
-        self.all_intensities_dict: Dict[str, pd.DataFrame] = {}
+        # the log2 intensities are computed when they are first used and kept afterwards
+        self.all_intensities_dict: LazyDict = LazyDict(cache=True)
         self.all_tree_dict: Dict[str, DataTree] = {}
         self.analysis_design = self.configs.get("analysis_design", {})
         if not self.analysis_design:
@@ -240,6 +243,29 @@ class BasePlotter:
         default_kwargs.update(**kwargs)
         return cls(**default_kwargs)
 
+    def group_levels(self, dfs_to_use: Iterable[str], levels: Iterable[int], method: str = "mean"):
+        """
+        Computes the groupby of all levels of each df_to_use in one pass with :meth:`DataTree.groupby_levels`.
+        The results are memoized by the trees, so the plots grouping each level separately use them.
+
+        Parameters
+        ----------
+        dfs_to_use
+            names of the trees in :attr:`all_tree_dict`
+        levels
+            levels to group
+        method
+            aggregation of the groups
+
+        """
+        for df_to_use in dfs_to_use:
+            tree = self.all_tree_dict.get(df_to_use, None)
+            if tree is None:
+                continue
+            tree_levels = [level for level in levels if level in tree.level_keys_full_name]
+            if tree_levels:
+                tree.groupby_levels(tree_levels, method=method)
+
     def create_results(self):
         """
         Creates all plots that where the "create_plot" setting is set to True.
@@ -263,6 +289,7 @@ class BasePlotter:
                              scale: str = "normal", df: Optional[pd.DataFrame] = None):
         """
         Adds a two options to all_intensities_dict and all_tree_dict, called option_name and option_name_log2.
+        The log2 option does not store a copy of the data, it is transformed when it is used.
 
         Parameters
         ----------
@@ -306,19 +333,13 @@ class BasePlotter:
         intensities = intensities[mask]
 
         # add log2 intensities
-        intensities_log2 = np.log2(intensities)
-
-        self.all_intensities_dict.update({
-            option_name: intensities, f"{option_name}_log2": intensities_log2,
-        })
+        self.all_intensities_dict[option_name] = intensities
+        self.all_intensities_dict.set_lazy(f"{option_name}_log2", lambda: np.log2(intensities))
 
+        tree = DataTree.from_analysis_design(self.analysis_design, intensities, self.configs.get("has_techrep", False))
         self.all_tree_dict.update({
-            f"{option_name}": DataTree.from_analysis_design(
-                self.analysis_design, intensities, self.configs.get("has_techrep", False)
-            ),
-            f"{option_name}_log2": DataTree.from_analysis_design(
-                self.analysis_design, intensities_log2, self.configs.get("has_techrep", False)
-            )
+            f"{option_name}": tree,
+            f"{option_name}_log2": DataTree.from_transform(tree, "log2", self.configs.get("has_techrep", False)),
         })
 
     def add_normalized_option(self, df_to_use: str, normalizer: Union[Type[Normalization.BaseNormalizer], Any], norm_option_name: str):
@@ -368,7 +389,7 @@ class BasePlotter:
             key: self.all_tree_dict[df_to_use][key].get_total_number_children()
             for key in self.all_tree_dict[df_to_use].level_keys_full_name[level]
         }
-        counts_per_group = self.all_tree_dict[df_to_use].groupby(level, method=lambda x: (x > 0).sum())
+        counts_per_group = self.all_tree_dict[df_to_use].groupby(level, method="detected")
         named_sets = {}
         for group, n_child in n_children.items():
             minimum = non_na_function(n_child)
@@ -376,7 +397,7 @@ class BasePlotter:
         return named_sets
 
     def get_venn_data_per_key(self, df_to_use: str, key: str):
-        df = self.all_tree_dict[df_to_use].aggregate(key, method=None) > 0
+        df = self.all_tree_dict[df_to_use][key].get_detected()
         per_group_dict = {column: set(df.index[df[column]]) for column in df}
         return per_group_dict
 
@@ -391,6 +412,7 @@ class BasePlotter:
 
         """
         plots = []
+        self.group_levels(dfs_to_use, levels, method="detected")
         for level in levels:
             for df_to_use in dfs_to_use:
                 plot_kwargs = dict(intensity_label=self.intensity_label_names[df_to_use],
@@ -455,9 +477,8 @@ class BasePlotter:
         level_values = self.all_tree_dict[df_to_use].level_keys_full_name[level]
         level_counts = []
         for full_name in level_values:
-            intensities = self.all_tree_dict[df_to_use][full_name].aggregate(None)
             # from 0 to number of replicates, how often was each protein detected
-            counts = (intensities > 0).sum(axis=1)
+            counts = self.all_tree_dict[df_to_use].aggregate(full_name, method="detected")
             counts = counts.value_counts().drop([0], errors="ignore").rename(full_name)
             level_counts.append(counts)
         level_counts = pd.concat(level_counts, axis=1).astype("Int64").sort_index()
@@ -489,14 +510,10 @@ class BasePlotter:
         level_values = self.all_tree_dict[df_to_use].level_keys_full_name[level]
         all_heights = {}
         for experiment in level_values:
-            intensities = self.all_tree_dict[df_to_use][experiment].aggregate(None)
-            counts = (intensities > 0).sum(axis=1)
-            counts = counts[counts > 0]
-            heights = [len(counts)]
-            for col in intensities:
-                h = len(intensities[col][intensities[col] > 0])
-                heights.append(h)
-            all_heights[experiment] = pd.Series(heights, index=["Total"] + intensities.columns.to_list(), name=experiment)
+            counts = self.all_tree_dict[df_to_use].aggregate(experiment, method="detected")
+            detected = self.all_tree_dict[df_to_use][experiment].get_detected()
+            heights = [int((counts > 0).sum())] + detected.sum(axis=0).to_list()
+            all_heights[experiment] = pd.Series(heights, index=["Total"] + detected.columns.to_list(), name=experiment)
         return {"all_heights": all_heights}
 
     @add_end_docstrings(plot_para_return_docstring.format(
@@ -623,7 +640,7 @@ class BasePlotter:
         """
         intensities = self.all_tree_dict[df_to_use][full_name].aggregate(None)
         non_na = get_number_of_non_na_values(intensities.shape[1])
-        mask = (intensities > 0).sum(axis=1) >= non_na
+        mask = self.all_tree_dict[df_to_use].aggregate(full_name, method="detected") >= non_na
         intensities = intensities[mask]
         if intensities.empty:
             self.logger.warning("data for %s is empty", full_name)
@@ -657,8 +674,8 @@ class BasePlotter:
     def get_pathway_analysis_data(self, df_to_use: str, level: int, pathway: str, equal_var=True, **kwargs):
         level_keys = self.all_tree_dict[df_to_use].level_keys_full_name[level]
         found_proteins = set(self.interesting_proteins[pathway])
-        found_proteins &= set(self.all_intensities_dict[df_to_use].index)
-        found_proteins = list(found_proteins)
+        found_proteins &= set(self.all_tree_dict[df_to_use].index)
+        found_proteins = sorted(found_proteins)
         if len(found_proteins) < 1:
             self.logger.warning("Skipping pathway %s in pathway analysis because no proteins were found", pathway)
             return {}
@@ -740,7 +757,7 @@ class BasePlotter:
             for pathway in self.interesting_proteins:
                 plt.close("all")
                 found_proteins = set(self.interesting_proteins[pathway])
-                found_proteins &= set(self.all_intensities_dict[df_to_use].index)
+                found_proteins &= set(self.all_tree_dict[df_to_use].index)
                 found_proteins = sorted(list(found_proteins))
                 if len(found_proteins) < 1:
                     self.logger.warning("Skipping pathway %s in pathway timeline because no proteins were found", pathway)
@@ -750,7 +767,11 @@ class BasePlotter:
     def get_experiment_comparison_data(self, df_to_use: str, full_name1: str, full_name2: str):
         protein_intensities_sample1 = self.all_tree_dict[df_to_use][full_name1].aggregate(None)
         protein_intensities_sample2 = self.all_tree_dict[df_to_use][full_name2].aggregate(None)
-        mask, exclusive_1, exclusive_2 = get_intersection_and_unique(protein_intensities_sample1, protein_intensities_sample2)
+        mask, exclusive_1, exclusive_2 = get_intersection_and_unique(
+            protein_intensities_sample1, protein_intensities_sample2,
+            detected_1=self.all_tree_dict[df_to_use].aggregate(full_name1, method="detected"),
+            detected_2=self.all_tree_dict[df_to_use].aggregate(full_name2, method="detected")
+        )
         # flatten all replicates
         exclusive_sample1 = protein_intensities_sample1[exclusive_1].mean(axis=1)
         exclusive_sample2 = protein_intensities_sample2[exclusive_2].mean(axis=1)
@@ -791,7 +812,7 @@ class BasePlotter:
     def get_go_analysis_data(self, df_to_use: str, level: int):
         if not self.go_analysis_gene_names:
             return {}
-        background = set(self.all_intensities_dict[df_to_use].index)
+        background = set(self.all_tree_dict[df_to_use].index)
         heights = ddict(list)
         test_results = ddict(list)
         for compartiment, all_pathway_genes in self.go_analysis_gene_names.items():
@@ -883,7 +904,10 @@ class BasePlotter:
             self.logger.warning("Skipping Volcano plot for comparison: %s, %s because the groups contain only "
                                 "%s and %s experiments", g1, g2, v1.shape[1], v2.shape[1])
             return {}
-        mask, exclusive_1, exclusive_2 = get_intersection_and_unique(v1, v2)
+        mask, exclusive_1, exclusive_2 = get_intersection_and_unique(
+            v1, v2, detected_1=self.all_tree_dict[df_to_use].aggregate(g1, method="detected"),
+            detected_2=self.all_tree_dict[df_to_use].aggregate(g2, method="detected")
+        )
 
         df = pd.concat([v1[mask], v2[mask]], axis=1)
         design = pd.DataFrame([[0] * v1.shape[1] + [1] * v2.shape[1],
@@ -957,7 +981,7 @@ class BasePlotter:
             data_input = data_input.dropna(axis=0)
         else:
             if fill_na_before_norm:
-                data_input.fillna(fill_value, inplace=True)
+                data_input = data_input.fillna(fill_value)
         data_norm = data_input.subtract(data_input.mean(axis=1), axis=0).divide(data_input.std(axis=1), axis=0)
         if not fill_na_before_norm:
             data_norm.fillna(fill_value, inplace=True)
@@ -1024,6 +1048,7 @@ class BasePlotter:
 
         """
         plots = []
+        self.group_levels(dfs_to_use, levels)
         for level in levels:
             for df_to_use in dfs_to_use:
                 data = self.get_boxplot_data(df_to_use=df_to_use, level=level, **kwargs)
@@ -1055,6 +1080,7 @@ class BasePlotter:
 
         """
         plots = []
+        self.group_levels(dfs_to_use, levels)
         for level in levels:
             for df_to_use in dfs_to_use:
                 data = self.get_n_protein_vs_quantile_data(df_to_use=df_to_use, level=level, **kwargs)
@@ -1080,6 +1106,7 @@ class BasePlotter:
 
         """
         plots = []
+        self.group_levels(dfs_to_use, levels)
         for level in levels:
             for df_to_use in dfs_to_use:
                 data = self.get_kde_data(df_to_use=df_to_use, level=level, **kwargs)
@@ -1105,6 +1132,7 @@ class BasePlotter:
 
         """
         plots = []
+        self.group_levels(dfs_to_use, levels)
         for level in levels:
             for df_to_use in dfs_to_use:
                 n_prot_data = self.get_n_protein_vs_quantile_data(df_to_use=df_to_use, level=level, **kwargs)
@@ -1148,6 +1176,7 @@ class BasePlotter:
 
         """
         plots = []
+        self.group_levels(dfs_to_use, levels)
         for df_to_use in dfs_to_use:
             for level in levels:
                 data = self.get_intensity_heatmap_data(df_to_use=df_to_use, level=level, **kwargs)
@@ -8,6 +8,8 @@ from matplotlib.backends.backend_pdf import PdfPages
 from mspypeline.core import MSPInitializer
 from mspypeline.core.MSPPlots import BasePlotter
 from mspypeline.plotting_backend import matplotlib_plots
+from mspypeline.helpers import DataDict
+from mspypeline.helpers.Aggregators import EvidenceAggregator
 
 
 class MQReader:  # TODO currently circular dependency
@@ -15,6 +17,9 @@ class MQReader:  # TODO currently circular dependency
 
 
 class MaxQuantPlotter(BasePlotter):
+    default_intensity_entries = (("raw", "Intensity ", "Intensity"), ("lfq", "LFQ intensity ", "LFQ intensity"),
+                                 ("ibaq", "iBAQ ", "iBAQ intensity"))
+
     def __init__(
             self,
             start_dir: str,
@@ -24,7 +29,7 @@ class MaxQuantPlotter(BasePlotter):
             go_analysis_gene_names: dict = None,
             configs: dict = None,
             required_reader="mqreader",
-            intensity_entries=(("raw", "Intensity ", "Intensity"), ("lfq", "LFQ intensity ", "LFQ intensity"), ("ibaq", "iBAQ ", "iBAQ intensity")),
+            intensity_entries=default_intensity_entries,
             loglevel=logging.DEBUG
     ):
         super().__init__(
@@ -42,8 +47,7 @@ class MaxQuantPlotter(BasePlotter):
     @classmethod
     def from_MSPInitializer(cls, mspinit_instance: MSPInitializer, **kwargs):
         default_kwargs = dict(
-            intensity_entries=(("raw", "Intensity ", "Intensity"), ("lfq", "LFQ intensity ", "LFQ intensity"),
-                               ("ibaq", "iBAQ ", "iBAQ intensity")),
+            intensity_entries=cls.default_intensity_entries,
             intensity_df_name="proteinGroups",
             required_reader="mqreader"
         )
@@ -54,8 +58,7 @@ class MaxQuantPlotter(BasePlotter):
     def from_file_reader(cls, reader_instance: MQReader, **kwargs):
         default_kwargs = dict(
             intensity_df_name="proteinGroups",
-            intensity_entries=(("raw", "Intensity ", "Intensity"), ("lfq", "LFQ intensity ", "LFQ intensity"),
-                               ("ibaq", "iBAQ ", "iBAQ intensity")),
+            intensity_entries=cls.default_intensity_entries,
         )
         default_kwargs.update(**kwargs)
         return super().from_file_reader(reader_instance, **default_kwargs)
@@ -63,6 +66,8 @@ class MaxQuantPlotter(BasePlotter):
     def create_report(self):
         """
         Creates a MaxQuantReport.pdf, which can be used as quality control.
+        If streaming is set in the reader config, the evidence.txt, msScans.txt and msmsScans.txt are read in chunks
+        and only their summaries are kept in memory.
 
         Returns
         -------
@@ -99,7 +104,14 @@ class MaxQuantPlotter(BasePlotter):
                     ax.set_yscale(**yscale)
             return bar_container
 
-        def hist2d_with_hist(xdata, ydata, title=None, xlabel=None, ylabel=None):
+        def get_edges(hist):
+            return np.append(hist["left"].values, hist["right"].values[-1])
+
+        def hist_from_counts(ax, hist, column, **kwargs):
+            # the counts are used as weights of the left bin edges to recreate the histogram of the original data
+            return ax.hist(hist["left"], bins=get_edges(hist), weights=hist[column], **kwargs)
+
+        def hist2d_with_hist(key, title=None, xlabel=None, ylabel=None):
             fig = plt.figure(figsize=(14, 7))
             if title is not None:
                 fig.suptitle(title)
@@ -109,15 +121,17 @@ class MaxQuantPlotter(BasePlotter):
             ax1dhistvert = fig.add_subplot(spec[0, 0])
             ax1dhisthor = fig.add_subplot(spec[1, 1])
 
-            h, xedges, yedges, image = ax2dhist.hist2d(xdata, ydata,
-                                                       bins=100, range=((0, 145), (0, 2)))  # TODO find ranges/bins
+            xedges = get_edges(evidence["rt_rl_x_hist"])
+            yedges = get_edges(evidence["rt_rl_y_hist"])
+            h = evidence["rt_rl_hist2d"].loc[key].values
+            ax2dhist.pcolormesh(xedges, yedges, h.T)  # TODO find ranges/bins
             ax2dhist.set_xlabel(xlabel)
             ax2dhist.set_ylabel(ylabel)
 
-            ax1dhistvert.hist(xdata, bins=xedges)
+            hist_from_counts(ax1dhistvert, evidence["rt_rl_x_hist"], key)
             ax1dhistvert.set_ylabel("Counts")
 
-            ax1dhisthor.hist(ydata, bins=yedges, orientation="horizontal")
+            hist_from_counts(ax1dhisthor, evidence["rt_rl_y_hist"], key, orientation="horizontal")
             ax1dhisthor.set_xlabel("Counts")
 
             ax1dhistvert.set_xlim(*ax2dhist.get_xlim())
@@ -149,30 +163,58 @@ class MaxQuantPlotter(BasePlotter):
             x = np.repeat(x, 2)
             return x, y, bins
 
+        def get_plot_data_from_counts(hist):
+            bins = get_edges(hist)
+            y = hist.drop(["left", "right"], axis=1).sum(axis=1).values
+            y = y / np.diff(bins) / y.sum()
+            y = np.concatenate(([0], np.repeat(y, 2), [0]))
+            x = np.repeat(bins, 2)
+            return x, y, bins
+
         import matplotlib.cm as cm
         cmap = cm.get_cmap("jet")
 
         prefix = "Intensity "
+        streaming = self.configs.get("streaming", False)
         group_iter = None
         plot_colors = {}
 
         self.logger.info("Reading files")
+        report_keys = ["parameters", "summary", "peptides", "proteinGroups", "contaminants"]
+        if streaming:
+            report_keys += ["evidence_summary", "msScans_trace", "msmsScans_trace"]
+        else:
+            report_keys += ["evidence", "msScans", "msmsScans"]
+        # start reading all files in parallel, accessing the data below waits until the file is read
+        if isinstance(self.required_reader_data, DataDict):
+            # missing files and files without the required columns are known from their header
+            missing_keys = [key for key in report_keys if not self.required_reader_data.is_available(key)]
+            if missing_keys:
+                self.logger.debug("Skipping report sections of: %s", ", ".join(missing_keys))
+            report_keys = [key for key in report_keys if key not in missing_keys]
+            self.required_reader_data.prefetch(report_keys, max_workers=self.configs.get("prefetch_workers", None))
+
+        def get_report_data(key):
+            # data that can not be read is not accessed, to avoid parsing files without the required columns
+            if key not in report_keys:
+                raise KeyError(key)
+            return self.required_reader_data[key]
 
         try:
             self.logger.debug("Reading parameters")
-            parameters = self.required_reader_data['parameters']
+            parameters = get_report_data('parameters')
         except KeyError:
             self.logger.warning("Did not find parameters")
             parameters = None
         try:
             self.logger.debug("Reading summary")
-            summary = self.required_reader_data['summary']
+            summary = get_report_data('summary')
         except KeyError:
             self.logger.warning("Did not find summary")
             summary = None
         try:
             self.logger.debug("Reading peptides")
-            peptides = self.required_reader_data["peptides"]
+            peptides = get_report_data("peptides")
             peptides_prefix_columns = [x for x in peptides.columns if x.startswith(prefix)]
             peptides_intensities = peptides[peptides_prefix_columns].replace({0: np.nan})
             peptides_intensities.columns = pd.MultiIndex.from_arrays(
@@ -194,8 +236,8 @@ class MaxQuantPlotter(BasePlotter):
             peptides = None
         try:
             self.logger.debug("Reading proteinGroups")
-            prot_groups = self.required_reader_data["proteinGroups"]
-            contaminants = self.required_reader_data["contaminants"]
+            prot_groups = get_report_data("proteinGroups")
+            contaminants = get_report_data("contaminants")
             prot_groups_prefix_columns = [x for x in prot_groups.columns if x.startswith(prefix)]
             prot_groups_colors = [x.replace(prefix, "") for x in prot_groups_prefix_columns]
             plot_colors.update({col: cmap(i/len(prot_groups_colors)) for i, col in enumerate(prot_groups_colors)})
@@ -214,23 +256,21 @@ class MaxQuantPlotter(BasePlotter):
             has_ibaq = "File is missing"
         try:
             self.logger.debug("Reading evidence")
-            evidence = self.required_reader_data["evidence"]
-            mz = evidence.pivot(index=None, columns="Experiment", values="m/z")
-            plot_colors.update({col: cmap(i/len(mz.columns)) for i, col in enumerate(mz.columns)})
-            charge = evidence.pivot(index=None, columns="Experiment", values="Charge")
-            charge = charge.apply(pd.Series.value_counts)
-            charge.index = charge.index.astype(int)
-            missed_cleavages = evidence.pivot(index=None, columns="Experiment", values="Missed cleavages")
-            missed_cleavages = missed_cleavages.apply(pd.Series.value_counts)
-            missed_cleavages.index = missed_cleavages.index.astype(int)
-            retention_length = evidence.pivot(index=None, columns="Experiment", values="Retention length")
-            retention_time = evidence.pivot(index=None, columns="Experiment", values="Retention time")
+            if streaming:
+                evidence = get_report_data("evidence_summary")
+            else:
+                evidence_df = get_report_data("evidence")
+                evidence = EvidenceAggregator.summarize(lambda: [evidence_df])
+            experiments = evidence["mz_hist"].columns.drop(["left", "right"])
+            plot_colors.update({col: cmap(i/len(experiments)) for i, col in enumerate(experiments)})
+            charge = evidence["charge"]
+            missed_cleavages = evidence["missed_cleavages"]
         except KeyError:
             self.logger.warning("Did not find evidence")
             evidence = None
         try:
             self.logger.debug("Reading msScans")
-            ms_scans = self.required_reader_data["msScans"]
+            ms_scans = get_report_data("msScans_trace" if streaming else "msScans")
             ms_scan_groups = ms_scans.groupby("Raw file")
             group_iter = ms_scan_groups.groups
         except KeyError:
@@ -238,7 +278,7 @@ class MaxQuantPlotter(BasePlotter):
             ms_scans = None
         try:
             self.logger.debug("Reading msmsScans")
-            msms_scans = self.required_reader_data["msmsScans"]
+            msms_scans = get_report_data("msmsScans_trace" if streaming else "msmsScans")
             msms_scan_groups = msms_scans.groupby("Raw file")
             group_iter = msms_scan_groups.groups
         except KeyError:
@@ -307,7 +347,7 @@ class MaxQuantPlotter(BasePlotter):
                                 title="Peptide Charges")
 
             if evidence is not None:
-                axarr[1].hist(evidence["m/z"])
+                hist_from_counts(axarr[1], evidence["mz_overall_hist"], EvidenceAggregator.overall_name)
                 axarr[1].set_xlabel("m/z")
                 axarr[1].set_ylabel("counts")
                 axarr[1].set_title("peptide m/z")
@@ -421,8 +461,8 @@ class MaxQuantPlotter(BasePlotter):
             if evidence is not None:
                 self.logger.debug("Creating overall retention time vs retention length")
 
-                fig, ax = hist2d_with_hist(title="Overall Retention time vs Retention length",
-                                           xdata=evidence["Retention time"], ydata=evidence["Retention length"],
+                fig, ax = hist2d_with_hist(EvidenceAggregator.overall_name,
+                                           title="Overall Retention time vs Retention length",
                                            xlabel="Retention time [min]", ylabel="Retention length [min]")
 
                 pdf.savefig(figure=fig)
@@ -437,14 +477,14 @@ class MaxQuantPlotter(BasePlotter):
                 before_aa_counts_flat = before_aa_counts.sum(axis=1)
                 last_aa_counts_flat = last_aa_counts.sum(axis=1)
 
-                mz_x, mz_y, mz_bins = get_plot_data_from_hist(mz, n_bins=15, density=True)
+                mz_x, mz_y, mz_bins = get_plot_data_from_counts(evidence["mz_hist"])
 
-                for experiment in mz.columns:
+                for experiment in experiments:
                     plot_color = plot_colors[experiment]
                     fig, axarr = plt.subplots(3, 2, figsize=(14, 7))
                     fig.suptitle(experiment)
 
-                    axarr[0, 0].hist(mz[experiment], density=True, color=plot_color, bins=mz_bins)
+                    hist_from_counts(axarr[0, 0], evidence["mz_hist"], experiment, density=True, color=plot_color)
                     axarr[0, 0].plot(mz_x, mz_y, color="black")
                     # axarr[0, 0].hist(mz.drop(experiment, axis=1).values.flatten(), histtype="step", density=True, color="black", bins=bins, linewidth=2)
                     # axarr[0, 0].hist(mz_flat, histtype="step", density=True, color="black", bins=bins, linewidth=2)
@@ -528,7 +568,7 @@ class MaxQuantPlotter(BasePlotter):
                 yield plots
 
             def split_p(n_rwos, n_cols, figsize=(7, 7), plot_name="", data=None, plot_fn=None):
-                n_figures = int(np.ceil(len(retention_time.columns) / (n_rwos * n_cols)))
+                n_figures = int(np.ceil(len(experiments) / (n_rwos * n_cols)))
 
                 with PdfPages(os.path.join(self.start_dir, plot_name + ".pdf")) as pdf:
                     for n_figure in range(n_figures):
@@ -536,7 +576,7 @@ class MaxQuantPlotter(BasePlotter):
                         for i, (pos, ax) in enumerate(np.ndenumerate(axarr)):
                             idx = n_figure * (n_rwos * n_cols) + i
                             try:
-                                experiment = retention_time.columns[idx]
+                                experiment = experiments[idx]
                             except IndexError:
                                 break
                             plot_fn(ax, data[experiment], experiment)
@@ -547,20 +587,20 @@ class MaxQuantPlotter(BasePlotter):
             # Retention time of individuals samples vs remaining
             if evidence is not None:
                 self.logger.debug("Creating individual retention time histograms")
-                b, h, bins = get_plot_data_from_hist(retention_time, density=True, n_bins=25)
+                b, h, bins = get_plot_data_from_counts(evidence["rt_hist"])
 
-                n_figures = int(np.ceil(len(retention_time.columns) / 9))
+                n_figures = int(np.ceil(len(experiments) / 9))
 
                 for n_figure in range(n_figures):
                     fig, axarr = plt.subplots(3, 3, figsize=(15, 15))
                     for i, (pos, ax) in enumerate(np.ndenumerate(axarr)):
                         idx = n_figure * 9 + i
                         try:
-                            experiment = retention_time.columns[idx]
+                            experiment = experiments[idx]
                         except IndexError:
                             break
-                        ax.hist(retention_time.loc[:, experiment], bins=bins, density=True,
-                                color=plot_colors[experiment])
+                        hist_from_counts(ax, evidence["rt_hist"], experiment, density=True,
+                                         color=plot_colors[experiment])
                         ax.plot(b, h, color="black")
                         ax.set_title(experiment)
                         ax.set_xlabel("Retention time")
@@ -574,9 +614,8 @@ class MaxQuantPlotter(BasePlotter):
             # retention time vs retention length individual
             if evidence is not None:
                 self.logger.debug("Creating individual retention time vs retention length")
-                for experiment in retention_length.columns:
-                    fig, ax = hist2d_with_hist(title=experiment, xdata=retention_time[experiment],
-                                               ydata=retention_length[experiment], xlabel="Retention time [min]",
+                for experiment in experiments:
+                    fig, ax = hist2d_with_hist(experiment, title=experiment, xlabel="Retention time [min]",
                                                ylabel="Retention length [min]")
 
                     pdf.savefig(figure=fig)
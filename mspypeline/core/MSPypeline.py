@@ -36,9 +36,10 @@ class UIHandler:
             mspinit.configs.update(configs)
             mspinit.read_data()
             # create plotter from initializer
-            mspplots = selected_reader.plotter.from_MSPInitializer(mspinit)
+            mspplots = selected_reader.plotter.from_MSPInitializer(mspinit, required_reader=selected_reader.name)
             # create all plots and other results
             mspplots.create_results()
+            mspinit.write_load_timings()
 
 
 class MSPGUI(tk.Tk):
@@ -291,16 +292,22 @@ class MSPGUI(tk.Tk):
         self.running_text.set("Creating Plots")
         self.update()
         self.update_button()
-        mspplots = self.selected_reader.plotter.from_MSPInitializer(self.mspinit)
+        mspplots = self.selected_reader.plotter.from_MSPInitializer(
+            self.mspinit, required_reader=self.selected_reader.name)
         mspplots.create_results()
+        # the data is loaded while the results are created
+        self.mspinit.write_load_timings()
         self.running_text.set("Please press Start")
 
     def report_button(self):
         self.running_text.set("Creating Report")
         self.update()
         self.update_button()
-        mspplots = self.selected_reader.plotter.from_MSPInitializer(self.mspinit)
+        mspplots = self.selected_reader.plotter.from_MSPInitializer(
+            self.mspinit, required_reader=self.selected_reader.name)
         mspplots.create_report()
+        # the data is loaded while the results are created
+        self.mspinit.write_load_timings()
         self.running_text.set("Please press Start")
 
     def plot_intermediate_row(self, text: str):
@@ -1,6 +1,6 @@
 import logging
 from abc import abstractmethod, ABC
-from typing import Iterable
+from typing import Iterable, List
 try:
     from ruamel_yaml import YAML
 except ModuleNotFoundError:
@@ -11,7 +11,10 @@ from mspypeline.helpers import get_logger, DataDict
 
 class BaseReader(ABC):
     def __init__(self, start_dir: str, reader_config: dict, loglevel=logging.DEBUG):
-        self.full_data = DataDict(data_source=self)
+        # optional limit of the memory used by the data in megabytes
+        memory_limit = reader_config.get("memory_limit", None) if reader_config else None
+        self.full_data = DataDict(data_source=self,
+                                  memory_limit=int(memory_limit * 1e6) if memory_limit is not None else None)
         self.start_dir = start_dir
         self.reader_config = reader_config
         self.logger = get_logger(self.__class__.__name__, loglevel)
@@ -44,6 +47,54 @@ class BaseReader(ABC):
     def plotter(cls):  # -> Type[BasePlotter]
         raise NotImplementedError
 
+    def get_source_files(self, key: str) -> List[str]:
+        """
+        Paths of all files on disk the data stored under key in :attr:`full_data` is derived from.
+        Only data with source files can be cached.
+
+        Parameters
+        ----------
+        key
+            name of the data
+
+        Returns
+        -------
+        List[str]
+            paths of the source files, by default no files
+
+        """
+        return []
+
+    def is_readable(self, key: str) -> bool:
+        """
+        Checks whether the data stored under key in :attr:`full_data` can be read, without reading it.
+
+        Parameters
+        ----------
+        key
+            name of the data
+
+        Returns
+        -------
+        bool
+            False if the data can not be read, by default True
+
+        """
+        return True
+
+    def prefetch(self, keys: Iterable[str]):
+        """
+        Loads the data of all keys into :attr:`full_data` in parallel, see :meth:`DataDict.prefetch`.
+
+        Parameters
+        ----------
+        keys
+            names of the data
+
+        """
+        workers = self.reader_config.get("prefetch_workers", None) if self.reader_config else None
+        return self.full_data.prefetch(keys, max_workers=workers)
+
 
 class MissingFilesException(Exception):
     pass
@@ -0,0 +1,148 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+from typing import List
+import pandas as pd
+
+from mspypeline.helpers import dict_depth, get_analysis_design, DataCache
+from mspypeline.file_reader import BaseReader, MissingFilesException
+from mspypeline.file_reader.MQReader import MQReader
+from mspypeline.core import MaxQuantPlotter
+
+
+class MQBatchReader(BaseReader):
+    """
+    Reads the proteinGroups.txt of multiple MaxQuant searches of the same study and combines them into one dataset.
+    The txt dirs are set with txt_dirs in the mqbatchreader section of the config file. Each dir is read with a
+    :class:`MQReader` using the other settings of the section. The protein groups of all runs are aligned on the
+    index_col, the sample names of all runs need to be unique.
+
+    """
+    name = "mqbatchreader"
+    required_files = [MQReader.proteins_txt]
+    plotter = MaxQuantPlotter
+    # settings that describe the combined dataset and are not passed to the reader of each run
+    batch_settings = ("txt_dirs", "analysis_design", "levels", "level_names", "all_replicates", "use_cache")
+
+    def __init__(self, start_dir: str, reader_config: dict, loglevel=logging.DEBUG):
+        super().__init__(start_dir, reader_config, loglevel=loglevel)
+        txt_dirs = self.reader_config.get("txt_dirs", []) if self.reader_config else []
+        if not txt_dirs:
+            raise MissingFilesException("No txt_dirs specified for " + MQBatchReader.name)
+
+        run_config = {k: v for k, v in self.reader_config.items() if k not in MQBatchReader.batch_settings}
+        run_config["use_cache"] = False
+        self.readers = []
+        for txt_dir in txt_dirs:
+            # a run without data is skipped instead of disabling the batch reader
+            try:
+                self.readers.append(MQReader(txt_dir, dict(run_config), loglevel=loglevel))
+            except MissingFilesException:
+                self.logger.warning("Skipping run %s, %s could not be found", txt_dir, MQReader.proteins_txt)
+        if not self.readers:
+            raise MissingFilesException(f"Could not find {MQReader.proteins_txt} in any of the txt_dirs: "
+                                        + ", ".join(txt_dirs))
+        # the loading times of all runs are collected together
+        for reader in self.readers:
+            reader.full_data.timings = self.full_data.timings
+
+        # each sample needs to be unique in the combined dataset
+        self.intensity_column_names = [name for reader in self.readers for name in reader.intensity_column_names]
+        duplicated = pd.Index(self.intensity_column_names)
+        duplicated = duplicated[duplicated.duplicated()]
+        if not duplicated.empty:
+            raise ValueError(f"Sample names need to be unique across all runs, duplicates: {', '.join(duplicated)}. "
+                             f"Consider renaming them with a {MQReader.mapping_txt} file in the run directories")
+        if not self.reader_config.get("all_replicates", False):
+            self.reader_config["all_replicates"] = self.intensity_column_names
+        # determine the grouping of the combined dataset
+        self.analysis_design = self.determine_groupings()
+        if not self.reader_config.get("analysis_design", False):
+            self.reader_config["analysis_design"] = self.analysis_design
+            self.reader_config["levels"] = dict_depth(self.analysis_design)
+            self.reader_config["level_names"] = [x for x in range(self.reader_config["levels"])]
+        if self.reader_config.get("use_cache", False):
+            cache_config = {k: v for k, v in self.reader_config.items()
+                            if k in MQReader.cache_settings or k == "txt_dirs"}
+            self.full_data.cache = DataCache(os.path.join(self.start_dir, MQReader.cache_dir), cache_config,
+                                             loglevel=loglevel)
+
+    def determine_groupings(self) -> dict:
+        if self.reader_config.get("analysis_design", False):
+            return self.reader_config["analysis_design"]
+        n_levels = {len(name.split("_")) for name in self.intensity_column_names}
+        if not all(reader.naming_convention for reader in self.readers) or len(n_levels) != 1:
+            raise NotImplementedError("The sample names of all runs need to follow the same naming convention")
+        return get_analysis_design(self.intensity_column_names)
+
+    def get_source_files(self, key: str) -> List[str]:
+        if key not in ("proteinGroups", "contaminants"):
+            return []
+        return [file for reader in self.readers for file in reader.get_source_files(key)]
+
+    def is_readable(self, key: str) -> bool:
+        if key not in ("proteinGroups", "contaminants"):
+            return super().is_readable(key)
+        return all(reader.is_readable(key) for reader in self.readers)
+
+    def read_runs(self, key: str) -> List[pd.DataFrame]:
+        """
+        Reads the data stored under key of all runs in parallel.
+
+        Parameters
+        ----------
+        key
+            name of the data in :attr:`MQReader.full_data`
+
+        Returns
+        -------
+        List[pd.DataFrame]
+            The data of all runs in the order of the txt_dirs
+
+        """
+        workers = self.reader_config.get("prefetch_workers", None)
+        with ThreadPoolExecutor(max_workers=workers or len(self.readers)) as executor:
+            return list(executor.map(lambda reader: reader.full_data[key], self.readers))
+
+    def combine_runs(self, dfs: List[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Aligns the data of all runs on the index_col. The columns of each sample are taken from its run, all other
+        columns are taken from the first run containing the protein. Intensities of proteins missing in a run are 0.
+
+        Parameters
+        ----------
+        dfs
+            data of all runs in the order of the txt_dirs
+
+        Returns
+        -------
+        pd.DataFrame
+            the combined data
+
+        """
+        sample_dfs, annotation_dfs = [], []
+        for reader, df in zip(self.readers, dfs):
+            sample_suffixes = tuple(" " + name for name in reader.intensity_column_names)
+            sample_columns = [col for col in df.columns if col.endswith(sample_suffixes)]
+            sample_dfs.append(df.loc[:, sample_columns])
+            annotation_dfs.append(df.drop(sample_columns, axis=1))
+        annotation = reduce(lambda df1, df2: df1.combine_first(df2), annotation_dfs)
+        # keep the order of the columns in the files
+        annotation = annotation.loc[:, list(dict.fromkeys(col for df in annotation_dfs for col in df.columns))]
+        samples = pd.concat(sample_dfs, axis=1, sort=False).reindex(annotation.index)
+        intensity_prefixes = tuple(prefix for _, prefix, _ in self.plotter.default_intensity_entries)
+        intensity_columns = [col for col in samples.columns if col.startswith(intensity_prefixes)]
+        samples.loc[:, intensity_columns] = samples.loc[:, intensity_columns].fillna(0)
+        return pd.concat([annotation, samples], axis=1)
+
+    def load_combined(self, key: str) -> pd.DataFrame:
+        df = self.combine_runs(self.read_runs(key))
+        self.logger.debug("%s shape after combining %s runs: %s", key, len(self.readers), df.shape)
+        return df
+
+    def preprocess_proteinGroups(self):
+        return self.load_combined("proteinGroups")
+
+    def preprocess_contaminants(self):
+        return self.load_combined("contaminants")
@@ -1,12 +1,24 @@
 import os
-from typing import Union
+import io
+import json
+import hashlib
+import re
+import gzip
+import threading
+import bz2
+from contextlib import contextmanager
+from itertools import islice
+from typing import Union, List, Optional, Dict, Iterable, Iterator, Pattern, Tuple
+import numpy as np
 import pandas as pd
 from pandas.api.types import is_numeric_dtype
 import logging
 
-from mspypeline.helpers import dict_depth, get_analysis_design
+from mspypeline.helpers import dict_depth, get_analysis_design, DataCache, HeaderIndex, TimingRegistry
+from mspypeline.helpers.Aggregators import EvidenceAggregator, ScanTraceAggregator
 from mspypeline.file_reader import BaseReader, MissingFilesException
 from mspypeline.core import MaxQuantPlotter
+from mspypeline.version import __version__
 
 
 class MQReader(BaseReader):
@@ -21,6 +33,75 @@ class MQReader(BaseReader):
     required_files = [proteins_txt]
     name = "mqreader"
     plotter = MaxQuantPlotter
+    cache_dir = "cache"
+    # file in the cache dir holding the settings the cached protein groups were processed with
+    ingest_state_file = "protein_groups_state.json"
+    # reader settings that change the preprocessed data, other settings like memory_limit keep the cache valid
+    cache_settings = ("index_col", "duplicate_handling", "drop_columns", "load_all_columns", "dtypes",
+                      "all_replicates", "analysis_design", "levels", "level_names")
+    # compressed versions of the txt files are used if the uncompressed file does not exist
+    compressed_file_endings = (".gz", ".bz2", ".zst")
+    # parsers that can be selected with csv_engine in the reader config
+    csv_engines = ("pandas", "pyarrow")
+    # strings parsed as missing values by the pyarrow engine, these are the defaults of pd.read_csv
+    csv_null_values = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+                       "N/A", "NA", "NULL", "NaN", "n/a", "nan", "null"]
+    # maps the keys of full_data to the file they are read from
+    source_txt_files = {
+        "proteinGroups": proteins_txt,
+        "contaminants": proteins_txt,
+        "peptides": peptides_txt,
+        "summary": summary_txt,
+        "parameters": parameters_txt,
+        "evidence": evidence_txt,
+        "msScans": ms_scans_txt,
+        "msmsScans": msms_scans_txt,
+        "evidence_summary": evidence_txt,
+        "msScans_trace": ms_scans_txt,
+        "msmsScans_trace": msms_scans_txt,
+    }
+    # columns that need to be present in the source file to read the data
+    required_columns = {
+        "peptides": ["Reverse", "Potential contaminant"],
+        "evidence": ["Experiment", "Reverse", "Potential contaminant"],
+        "msScans": ScanTraceAggregator.required_columns,
+        "msmsScans": ScanTraceAggregator.required_columns,
+        "evidence_summary": EvidenceAggregator.required_columns + ["Reverse", "Potential contaminant"],
+        "msScans_trace": ScanTraceAggregator.required_columns,
+        "msmsScans_trace": ScanTraceAggregator.required_columns,
+    }
+    # number of rows read to index a file
+    n_index_rows = 1000
+    # number of bytes of compressed files read to estimate the compression ratio
+    index_bytes = 4 * 2 ** 20
+    # approximate size in bytes of the text of a chunk if chunksize is not set in the reader config
+    chunk_bytes = 64 * 2 ** 20
+    # width in minutes of the retention time bins of the streamed scan traces
+    scan_trace_bin_width = 0.05
+    # columns of the proteinGroups.txt required besides the intensities for filtering and annotation
+    protein_groups_annotation_columns = ["Fasta headers", "Gene names", "Protein names",
+                                         "Only identified by site", "Reverse", "Potential contaminant"]
+    # intensities that MaxQuant normalizes across all samples, they change for all samples if samples are added
+    cross_sample_prefixes = ("LFQ intensity ",)
+    # dtypes used while parsing the files, low cardinality strings are read as categories and measurements as float32
+    # columns that are missing in a file are ignored. Can be changed with the dtypes section of the reader config
+    scan_dtypes = {"Raw file": "category", "Retention time": "float32", "Total ion current": "float32"}
+    default_dtypes = {
+        "evidence": {
+            "Raw file": "category", "Experiment": "category", "Type": "category", "Charge": "int8",
+            "Reverse": "category", "Potential contaminant": "category", "m/z": "float32", "Mass": "float32",
+            "Retention time": "float32", "Retention length": "float32", "Calibrated retention time": "float32",
+            "Score": "float32", "Intensity": "float32",
+        },
+        "msScans": scan_dtypes,
+        "msmsScans": scan_dtypes,
+    }
+    # first entry of a fasta header, eg: "sp|P12345|ABC_HUMAN Protein ABC OS=Homo sapiens GN=ABC PE=1"
+    # the description after the second pipe contains the protein name before the first underscore and the gene name
+    fasta_header_regex = re.compile(
+        r"^;*(?P<header>[^;|]*(?:\|(?P<protein_id>[^;|]*)"
+        r"(?:\|(?P<description>(?=(?P<protein_name>[^_;]*))(?:(?=[^;]*?GN=(?P<gene_name>[^\s;]*)))?[^;]*))?)?)"
+    )
 
     def __init__(self, start_dir: str,
                  reader_config: dict,
@@ -37,13 +118,20 @@ class MQReader(BaseReader):
         self.index_col = self.reader_config.get("index_col", index_col)
         self.duplicate_handling = self.reader_config.get("duplicate_handling", duplicate_handling)
         to_drop = self.reader_config.get("drop_columns", drop_columns if drop_columns is not None else [])
+        self.csv_engine = self.get_csv_engine()
+        # proteinGroups and contaminants are created from the same parse, which is done only once
+        self.protein_groups_lock = threading.Lock()
+        # checksums of the sample columns of the last parse of the proteinGroups.txt, see get_column_checksums
+        self.protein_groups_checksums: Dict[str, str] = {}
+        # the header index is stored next to the cache
+        use_cache = self.reader_config.get("use_cache", False)
+        self.header_index = HeaderIndex(os.path.join(self.start_dir, MQReader.cache_dir) if use_cache else None,
+                                        loglevel=loglevel)
 
         # read a sample of all required files. If any required file is missing exit
         # but we need only one file from the max quant results
         try:
-            file_dir = os.path.join(self.data_dir, self.proteins_txt)
-            df = pd.read_csv(file_dir, sep="\t", nrows=5)
-            self.proteins_txt_columns = df.columns
+            self.proteins_txt_columns = self.get_txt_columns(self.proteins_txt)
         except FileNotFoundError:
             raise MissingFilesException("Could find all of: " + ", ".join(MQReader.required_files))
 
@@ -63,6 +151,11 @@ class MQReader(BaseReader):
         except FileNotFoundError:
             self.mapping_txt = None
 
+        # compile the mapping once, it is used for all column names and sample names of all files
+        self.mapping_dict, self.mapping_regex = self.compile_mapping()
+        # for names of equal length the one listed last in the mapping is used
+        self.mapping_rank = {key: i for i, key in enumerate(self.mapping_dict)}
+
         # rename all columns based on the mapping
         self.new_proteins_txt_columns = self.proteins_txt_columns
         if self.mapping_txt is not None:
@@ -71,6 +164,7 @@ class MQReader(BaseReader):
         # get columns that should be dropped
         if isinstance(to_drop, str):
             to_drop = [to_drop]
+        self.drop_columns = list(to_drop)
 
         # subset on all columns that start with intensity
         self.intensity_column_names = sorted([x.replace("Intensity ", "") for x in self.new_proteins_txt_columns
@@ -86,27 +180,427 @@ class MQReader(BaseReader):
             self.reader_config["analysis_design"] = self.analysis_design
             self.reader_config["levels"] = dict_depth(self.analysis_design)
             self.reader_config["level_names"] = [x for x in range(self.reader_config["levels"])]
+        # persist the preprocessed data between runs
+        if self.reader_config.get("use_cache", False):
+            cache_config = {k: v for k, v in self.reader_config.items() if k in MQReader.cache_settings}
+            self.full_data.cache = DataCache(os.path.join(self.start_dir, MQReader.cache_dir), cache_config,
+                                             loglevel=loglevel)
 
-    def rename_df_columns(self, col_names: list) -> list:
+    def get_source_files(self, key: str) -> List[str]:
+        if key not in MQReader.source_txt_files:
+            return []
+        source_files = [self.get_txt_path(MQReader.source_txt_files[key])]
+        # the sample mapping changes the column names of the data
+        mapping_file = os.path.join(self.start_dir, MQReader.mapping_txt)
+        if os.path.isfile(mapping_file):
+            source_files.append(mapping_file)
+        return source_files
+
+    def get_txt_path(self, file_name: str) -> str:
+        """
+        Finds the path of a file in the data dir. If the file does not exist, but a compressed version of it, the path
+        to the compressed file is returned.
+
+        Parameters
+        ----------
+        file_name
+            name of the uncompressed file
+
+        Returns
+        -------
+        str
+            path of the file
+
+        """
+        file_path = os.path.join(self.data_dir, file_name)
+        if not os.path.isfile(file_path):
+            for file_ending in MQReader.compressed_file_endings:
+                if os.path.isfile(file_path + file_ending):
+                    return file_path + file_ending
+        return file_path
+
+    @contextmanager
+    def open_txt(self, file_name: str):
+        """
+        Opens a file of the data dir for reading with pd.read_csv. Compressed files are decompressed while reading.
+
+        Parameters
+        ----------
+        file_name
+            name of the uncompressed file
+
+        Yields
+        ------
+        Union[str, IO[bytes]]
+            the path of the file or a stream of the decompressed file
+
+        """
+        file_path = self.get_txt_path(file_name)
+        if not file_path.endswith(".zst"):
+            # pandas decompresses gzip and bz2 files based on the file ending
+            yield file_path
+            return
+        with self.open_txt_stream(file_path) as (stream, _):
+            yield stream
+
+    @contextmanager
+    def open_txt_stream(self, file_path: str):
+        """
+        Opens a file as binary stream, compressed files are decompressed while reading.
+
+        Parameters
+        ----------
+        file_path
+            path of the file
+
+        Yields
+        ------
+        Tuple[IO[bytes], IO[bytes]]
+            the stream of the decompressed file and the stream of the file on disk
+
+        """
+        with open(file_path, "rb") as f:
+            if file_path.endswith(".gz"):
+                stream = gzip.GzipFile(fileobj=f)
+            elif file_path.endswith(".bz2"):
+                stream = bz2.BZ2File(f)
+            elif file_path.endswith(".zst"):
+                try:
+                    import zstandard
+                except ImportError:
+                    self.logger.error("Reading %s requires the zstandard package", file_path)
+                    raise
+                stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(f))
+            else:
+                stream = f
+            with stream:
+                yield stream, f
+
+    def describe_txt(self, file_path: str) -> dict:
+        """
+        Describes a file based on its first rows, see :meth:`get_file_info`.
+
+        """
+        with self.open_txt_stream(file_path) as (stream, f):
+            lines = list(islice(stream, MQReader.n_index_rows + 2))
+            n_lines, text_size = len(lines), sum(len(line) for line in lines)
+            complete = n_lines <= MQReader.n_index_rows + 1
+            if not complete and stream is not f:
+                # the compression ratio is estimated from a larger part of compressed files
+                while f.tell() < MQReader.index_bytes:
+                    block = stream.read(2 ** 20)
+                    if not block:
+                        complete = True
+                        break
+                    n_lines += block.count(b"\n") + (len(block) < 2 ** 20 and not block.endswith(b"\n"))
+                    text_size += len(block)
+            n_bytes_read = f.tell()
+        lines = lines[:MQReader.n_index_rows + 1]
+        sample = pd.read_csv(io.BytesIO(b"".join(lines)), sep="\t")
+        row_bytes = (text_size - len(lines[0])) / max(n_lines - 1, 1)
+        size = os.path.getsize(file_path)
+        if complete:
+            n_rows = n_lines - 1
+        else:
+            n_rows = int((size * text_size / n_bytes_read - len(lines[0])) / row_bytes)
+        return {
+            "columns": list(sample.columns),
+            "dtypes": {col: str(dtype) for col, dtype in sample.dtypes.items()},
+            "n_rows": n_rows,
+            "complete": complete,
+            "size": size,
+            "row_bytes": row_bytes,
+        }
+
+    def get_file_info(self, file_name: str) -> dict:
+        """
+        Gets the metadata of a file from the :attr:`header_index`, which is used to plan reads before the file is
+        parsed. The metadata is determined from the first n_index_rows rows of the file.
+
+        Parameters
+        ----------
+        file_name
+            name of the uncompressed file
+
+        Returns
+        -------
+        dict
+            "columns" the column names, "dtypes" the dtypes pandas infers for the first rows,
+            "n_rows" the estimated number of rows, "complete" whether n_rows is exact,
+            "size" the size of the file in bytes and "row_bytes" the average size of a row in bytes
+
+        """
+        return self.header_index.get(self.get_txt_path(file_name), self.describe_txt)
+
+    def get_txt_columns(self, file_name: str) -> pd.Index:
+        return pd.Index(self.get_file_info(file_name)["columns"])
+
+    def get_chunksize(self, file_name: str) -> int:
+        """
+        Gets the number of rows read per chunk. If chunksize is not set in the reader config, it is chosen so that
+        the text of a chunk has a size of about chunk_bytes.
+
+        """
+        chunksize = self.reader_config.get("chunksize", None)
+        if chunksize is None:
+            chunksize = max(1000, int(MQReader.chunk_bytes / max(self.get_file_info(file_name)["row_bytes"], 1)))
+        return chunksize
+
+    def is_readable(self, key: str) -> bool:
+        if key not in MQReader.source_txt_files:
+            return super().is_readable(key)
+        file_name = MQReader.source_txt_files[key]
+        if not os.path.isfile(self.get_txt_path(file_name)):
+            return False
+        columns = self.get_txt_columns(file_name) if key in MQReader.required_columns else []
+        return all(col in columns for col in MQReader.required_columns.get(key, []))
+
+    def get_csv_engine(self) -> str:
+        """
+        Gets the parser selected with csv_engine in the reader config. The pyarrow engine parses the files with
+        multiple threads, if pyarrow is not installed the files are parsed with pandas.
+
+        Returns
+        -------
+        str
+            one of :attr:`csv_engines`
+
+        """
+        csv_engine = self.reader_config.get("csv_engine", "pandas")
+        if csv_engine not in MQReader.csv_engines:
+            raise ValueError(f"Invalid csv_engine: {csv_engine}, should be one of {', '.join(MQReader.csv_engines)}")
+        if csv_engine == "pyarrow":
+            try:
+                import pyarrow.csv
+            except ImportError:
+                self.logger.warning("csv_engine pyarrow requires the pyarrow package, using pandas instead")
+                return "pandas"
+        return csv_engine
+
+    def read_txt(self, file_name: str, usecols: Optional[List[str]] = None, dtype: Optional[dict] = None,
+                 index_col: Optional[List[int]] = None, squeeze: bool = False, encoding: Optional[str] = None
+                 ) -> Union[pd.DataFrame, pd.Series]:
+        """
+        Reads a file of the data dir with the parser selected by csv_engine. The arguments have the same meaning as
+        for pd.read_csv. If the pyarrow engine can not parse the file it is read with pandas.
+
+        Parameters
+        ----------
+        file_name
+            name of the uncompressed file
+        usecols
+            columns to read, all columns are read if None
+        dtype
+            mapping from column name to dtype
+        index_col
+            positions of the columns used as index
+        squeeze
+            if the data contains only one column return a Series
+        encoding
+            encoding of the file
+
+        Returns
+        -------
+        Union[pd.DataFrame, pd.Series]
+            the content of the file
+
+        """
+        file_size = os.path.getsize(self.get_txt_path(file_name))
+        with self.full_data.timings.measure(file_name, "parse", bytes_read=file_size) as record:
+            df = None
+            if self.csv_engine == "pyarrow":
+                import pyarrow as pa
+                try:
+                    df = self.read_txt_pyarrow(file_name, usecols, dtype, encoding)
+                except pa.ArrowException as e:
+                    self.logger.warning("Could not parse %s with pyarrow, using pandas instead: %s", file_name, e)
+                else:
+                    if index_col is not None:
+                        df = df.set_index([df.columns[i] for i in index_col])
+                    if squeeze and df.shape[1] == 1:
+                        df = df.iloc[:, 0]
+                    record["engine"] = "pyarrow"
+            if df is None:
+                with self.open_txt(file_name) as file_dir:
+                    df = pd.read_csv(file_dir, sep="\t", usecols=usecols, dtype=dtype, index_col=index_col,
+                                     squeeze=squeeze, encoding=encoding)
+                record["engine"] = "pandas"
+            TimingRegistry.add_data(record, df)
+        return df
+
+    @staticmethod
+    def get_arrow_types(dtype: Optional[dict]) -> dict:
+        """
+        Converts pandas dtypes to the corresponding arrow types. Categories are read as dictionary encoded strings.
+
+        """
+        import pyarrow as pa
+        arrow_types = {}
+        for col, t in (dtype or {}).items():
+            if t == "category":
+                arrow_types[col] = pa.dictionary(pa.int32(), pa.string())
+            elif t in (str, "str", object, "object"):
+                arrow_types[col] = pa.string()
+            else:
+                arrow_types[col] = pa.from_numpy_dtype(np.dtype(t))
+        return arrow_types
+
+    def get_convert_options(self, file_name: str, usecols: Optional[List[str]], column_types: dict):
+        import pyarrow.csv
+        include_columns = []
+        if usecols is not None:
+            header = self.get_txt_columns(file_name)
+            missing = [col for col in usecols if col not in header]
+            if missing:
+                raise ValueError(f"Missing columns in {file_name}: {missing}")
+            # pandas keeps the order of the file
+            include_columns = [col for col in header if col in usecols]
+        return pyarrow.csv.ConvertOptions(column_types=column_types, include_columns=include_columns,
+                                          null_values=MQReader.csv_null_values, strings_can_be_null=True)
+
+    @staticmethod
+    def arrow_to_pandas(table) -> pd.DataFrame:
+        """
+        Converts an arrow table to a DataFrame with the dtypes pandas would use.
+
+        """
+        import pyarrow as pa
+        df = table.to_pandas()
+        for field in table.schema:
+            if pa.types.is_null(field.type):
+                # pandas reads columns without any value as float
+                df[field.name] = df[field.name].astype(float)
+            elif pa.types.is_dictionary(field.type):
+                # pandas sorts the categories
+                df[field.name] = df[field.name].cat.set_categories(sorted(df[field.name].cat.categories))
+        return df
+
+    def read_txt_pyarrow(self, file_name: str, usecols: Optional[List[str]] = None, dtype: Optional[dict] = None,
+                         encoding: Optional[str] = None) -> pd.DataFrame:
+        import pyarrow as pa
+        import pyarrow.csv
+        read_options = pyarrow.csv.ReadOptions(encoding=encoding or "utf8")
+        parse_options = pyarrow.csv.ParseOptions(delimiter="\t")
+        column_types = MQReader.get_arrow_types(dtype)
+        convert_options = self.get_convert_options(file_name, usecols, column_types)
+        with self.open_txt(file_name) as file_dir:
+            table = pyarrow.csv.read_csv(file_dir, read_options=read_options, parse_options=parse_options,
+                                         convert_options=convert_options)
+        # pandas does not parse dates, read these columns as strings instead
+        timestamps = [field.name for field in table.schema if pa.types.is_timestamp(field.type)]
+        if timestamps:
+            convert_options.column_types = dict(column_types, **{col: pa.string() for col in timestamps})
+            with self.open_txt(file_name) as file_dir:
+                table = pyarrow.csv.read_csv(file_dir, read_options=read_options, parse_options=parse_options,
+                                             convert_options=convert_options)
+        return MQReader.arrow_to_pandas(table)
+
+    def get_protein_groups_columns(self) -> Optional[List[str]]:
+        """
+        Determines the columns of the proteinGroups.txt that are required for the analysis. These are all columns
+        starting with a prefix of the intensity_entries of the :attr:`plotter`, the columns used to determine
+        contaminants and to annotate the proteins, as well as the index_col if it is part of the file.
+        Setting load_all_columns in the reader config disables the selection.
+
+        Returns
+        -------
+        Optional[List[str]]
+            The names of all required columns in the file or None if all columns should be read
+
+        """
+        if self.reader_config.get("load_all_columns", False):
+            return None
+        prefixes = tuple(name_in_file for _, name_in_file, _ in self.plotter.default_intensity_entries)
+        required_columns = set(MQReader.protein_groups_annotation_columns) | {self.index_col}
+        return [col for col in self.proteins_txt_columns if col.startswith(prefixes) or col in required_columns]
+
+    def invalidate_cache(self, key: str = None):
+        """
+        Removes cached data of key, or all cached data if key is None. The data is preprocessed again on next access.
+
+        Parameters
+        ----------
+        key
+            name of the data in :attr:`full_data`
+
+        """
+        self.full_data.invalidate_cache(key)
+
+    def get_dtypes(self, key: str) -> Dict[str, str]:
+        """
+        Gets the dtypes of the columns of a file. The default dtypes are updated with the dtypes section of the
+        reader config, where a column can be set to null to use the dtype pandas infers and a file can be set to null
+        to not use any dtypes.
+
+        Parameters
+        ----------
+        key
+            name of the data in :attr:`full_data`
+
+        Returns
+        -------
+        Dict[str, str]
+            mapping from column name to dtype
+
+        """
+        dtypes_config = self.reader_config.get("dtypes", {})
+        if key in dtypes_config and dtypes_config[key] is None:
+            return {}
+        dtypes = dict(MQReader.default_dtypes.get(key, {}))
+        dtypes.update(dtypes_config.get(key, {}))
+        return {col: dtype for col, dtype in dtypes.items() if dtype is not None}
+
+    def compile_mapping(self) -> Tuple[Dict[str, str], Optional[Pattern]]:
+        """
+        Creates the mapping from old to new sample names and a regex finding the longest old name starting at each
+        position of a string.
+
+        Returns
+        -------
+        Tuple[Dict[str, str], Optional[Pattern]]
+            The mapping and the compiled regex, which is None if there is no mapping
+
+        """
         if self.mapping_txt is None:
-            return col_names
-        mapping_dict = {old_name: new_name for old_name, new_name
+            return {}, None
+        mapping_dict = {str(old_name): str(new_name) for old_name, new_name
                         in zip(self.mapping_txt.iloc[:, 0], self.mapping_txt.iloc[:, 1])}
+        # the lookahead allows overlapping matches, trying longer names first selects the longest at each position
+        keys = sorted(mapping_dict, key=len, reverse=True)
+        mapping_regex = re.compile("(?=(" + "|".join(re.escape(key) for key in keys) + "))")
+        return mapping_dict, mapping_regex
 
-        def find_key_match(col):
-            matches = []
-            for key in mapping_dict:
-                if key in col:
-                    matches.append(key)
-            matches = sorted(matches, key=len)
-            if len(matches) == 0:
-                return ""
-            else:
-                return matches[-1]
-        match_list = [find_key_match(col) for col in col_names]
-        # add a replace value for the default string
-        mapping_dict[""] = ""
-        return [col_names[i].replace(match_list[i], mapping_dict[match_list[i]]) for i in range(len(col_names))]
+    def rename_df_columns(self, col_names: list) -> list:
+        if self.mapping_regex is None:
+            return col_names
+
+        def rename(col):
+            matches = [match.group(1) for match in self.mapping_regex.finditer(col)]
+            if not matches:
+                return col
+            key = max(matches, key=lambda x: (len(x), self.mapping_rank[x]))
+            return col.replace(key, self.mapping_dict[key])
+        return [rename(col) for col in col_names]
+
+    def rename_df_values(self, values: pd.Series) -> pd.Series:
+        """
+        Renames the sample names in a column, such as the Experiment column, once per unique value.
+
+        Parameters
+        ----------
+        values
+            sample names to rename
+
+        Returns
+        -------
+        pd.Series
+            The renamed values
+
+        """
+        if self.mapping_regex is None:
+            return values
+        unique_values = values.dropna().unique().tolist()
+        return values.map(dict(zip(unique_values, self.rename_df_columns(unique_values))))
 
     def check_naming_convention(self) -> bool:
         # does the name follow the convention
@@ -150,106 +644,264 @@ class MQReader(BaseReader):
         # TODO update the attempted matching mechanism
 
 
-    def preprocess_contaminants(self):
-        file_dir = os.path.join(self.data_dir, MQReader.proteins_txt)
-        df_protein_groups = pd.read_csv(file_dir, sep="\t")
-        df_protein_groups.columns = self.rename_df_columns(df_protein_groups.columns)
+    def read_protein_groups(self) -> Dict[str, pd.DataFrame]:
+        """
+        Reads the proteinGroups.txt once and splits it into the proteins marked as contaminant and all other proteins.
+        If incremental is set in the reader config and samples were only added to the file since the tables were
+        cached, only the columns of the new samples are read and merged with the cached tables,
+        see :meth:`read_protein_groups_delta`.
 
+        Returns
+        -------
+        Dict[str, pd.DataFrame]
+            Mapping with the keys "proteinGroups" and "contaminants"
 
-        contaminants = (df_protein_groups[["Only identified by site", "Reverse", "Potential contaminant"]] == "+"
+        """
+        tables = None
+        if self.reader_config.get("incremental", False):
+            state = self.read_ingest_state()
+            previous = self.load_previous_protein_groups(state)
+            if previous is not None:
+                tables = self.read_protein_groups_delta(previous, state.get("checksums", {}))
+        if tables is None:
+            # all samples might have changed
+            self.full_data.pop("sample_changes", None)
+            tables = self.parse_protein_groups(self.get_protein_groups_columns())
+        self.write_ingest_state()
+        return tables
+
+    def parse_protein_groups(self, usecols: Optional[List[str]], checksum_only: Iterable[str] = ()
+                             ) -> Dict[str, pd.DataFrame]:
+        """
+        Reads the usecols of the proteinGroups.txt and splits them into the proteins marked as contaminant and all
+        other proteins. Both tables are annotated and their duplicates are handled with :meth:`process_protein_groups`.
+        For incremental reads the checksums of the sample columns are stored in protein_groups_checksums.
+
+        Parameters
+        ----------
+        usecols
+            columns to read or None to read all columns
+        checksum_only
+            renamed columns which are only read for their checksum and are not part of the tables
+
+        Returns
+        -------
+        Dict[str, pd.DataFrame]
+            Mapping with the keys "proteinGroups" and "contaminants"
+
+        """
+        df_protein_groups = self.read_txt(MQReader.proteins_txt, usecols=usecols)
+        with self.full_data.timings.measure(MQReader.proteins_txt, "filter"):
+            df_protein_groups.columns = self.rename_df_columns(df_protein_groups.columns)
+            if self.reader_config.get("incremental", False):
+                self.protein_groups_checksums = self.get_column_checksums(df_protein_groups)
+            df_protein_groups = df_protein_groups.drop(list(checksum_only), axis=1)
+            contaminants = (df_protein_groups[["Only identified by site", "Reverse", "Potential contaminant"]] == "+"
                             ).sum(axis=1) != 0
-        self.logger.debug("Removing %s rows from %s because they are not marked as contaminant",
-                          (~contaminants).sum(), MQReader.proteins_txt)
-        df_protein_groups  = df_protein_groups[contaminants]
+        self.logger.debug("Found %s rows in %s which are marked as contaminant",
+                          contaminants.sum(), MQReader.proteins_txt)
+        return {
+            "proteinGroups": self.process_protein_groups(df_protein_groups[~contaminants], "proteinGroups"),
+            "contaminants": self.process_protein_groups(df_protein_groups[contaminants], "contaminants"),
+        }
 
-        if any(df_protein_groups["Fasta headers"].isna()):
-            self.logger.warning("Missing fasta headers using default columns for information")
-            gene_name = df_protein_groups["Gene names"]
-            sep_ind = gene_name.str.contains(";").fillna(False)
-            if sep_ind.sum() > 0:
-                gene_name[sep_ind] = gene_name[sep_ind].str.split(";", expand=True)[0]
-            concat_df = pd.DataFrame({
-                "protein id": df_protein_groups["Protein names"],
-                "Gene name": gene_name.str.upper(),
-                "Protein name": ["Missing"] * gene_name.shape[0],
-            })
-        else:
-            # split the fasta headers
-            colon_start = df_protein_groups["Fasta headers"].str.startswith(";")
-            df_protein_groups.loc[colon_start, "Fasta headers"] = df_protein_groups.loc[
-                colon_start, "Fasta headers"].str.lstrip(";")
-            # first split all fasta headers that contain multiple entries
-            sep_ind = df_protein_groups["Fasta headers"].str.contains(";").fillna(False)
-            # replace all fasta headers with multiple entries with only the first one
-            df_protein_groups.loc[sep_ind, "Fasta headers"] = \
-                df_protein_groups.loc[sep_ind, "Fasta headers"].str.split(";", expand=True)[0]
-            # split the fasta headers with the pipe symbol
-            fasta_col = df_protein_groups["Fasta headers"].str.split("|", n=2).apply(pd.Series)
-            fasta_col.columns = ["trash", "protein id", "description"]
-            # extract the gene name from the description eg: "GN=abcd"
-            gene_names_fasta = fasta_col["description"].str.extract(r"(GN=(.*?)(\s|$))")[1]
-            # added upper() function to avoid that non-human gene names are not recognized
-            concat_df = pd.DataFrame({
-                "protein id": fasta_col["protein id"],
-                "Gene name": gene_names_fasta.str.upper(),
-                "Protein name": fasta_col["description"].str.split("_", expand=True)[0]
-            })
-        # concat all important columns with the original dataframe
-        df_protein_groups = pd.concat([df_protein_groups, concat_df], axis=1)
-        self.logger.debug("Shape of df_contaminants befor masking %s ", df_protein_groups.shape)
-        # remove all rows where the column used for indexing is missing
-        mask = ~pd.isna(df_protein_groups[self.index_col])
+    def get_column_checksums(self, df_protein_groups: pd.DataFrame) -> Dict[str, str]:
+        """
+        Parameters
+        ----------
+        df_protein_groups
+            the renamed, unprocessed protein groups
 
-        df_protein_groups = df_protein_groups.loc[mask]
+        Returns
+        -------
+        Dict[str, str]
+            checksum of the values of each column belonging to a sample, except the columns normalized across samples
 
-        self.logger.debug("Shape of df_contaminants after masking %s ", df_protein_groups.shape)
-        if ~mask.sum() > 0:
-            self.logger.warning("Removing %s rows because the index col information from: %s is missing",
-                                ~mask.sum(), self.index_col)
-        #set index
-        self.logger.info("Setting index of %s to %s", MQReader.proteins_txt, self.index_col)
-        df_protein_groups = df_protein_groups.set_index(df_protein_groups[self.index_col], drop=False)
-        # convert all non numeric intensities
-        for col in [col for col in df_protein_groups.columns if "Intensity " in col or "LFQ " in col or "iBAQ " in col]:
-            if not is_numeric_dtype(df_protein_groups[col]):
-                df_protein_groups[col] = df_protein_groups[col].apply(lambda x: x.replace(",", ".")).fillna(0)
-                df_protein_groups[col] = df_protein_groups[col].astype("int64")
-        # handle all rows with duplicated index column
-        duplicates = df_protein_groups.duplicated(subset=self.index_col, keep=False)
-        if any(duplicates):
-            self.logger.warning("Found duplicates in %s column. Duplicate names: %s",
-                                self.index_col, ", ".join(df_protein_groups[duplicates].loc[:, self.index_col]))
-            if self.duplicate_handling == "drop":
-                self.logger.warning("Dropping all %s duplicates.", duplicates.sum())
-                df_protein_groups = df_protein_groups.drop_duplicates(subset=self.index_col, keep=False)
-            elif self.duplicate_handling == "sum":
-                def group_sum(x):
-                    x.iloc[0].loc[x.select_dtypes("number").columns] = x.sum(axis=0, numeric_only=True)
-                    return x.iloc[0]
+        """
+        suffixes = tuple(" " + sample for sample in self.intensity_column_names)
+        return {col: hashlib.sha1(pd.util.hash_pandas_object(df_protein_groups[col], index=False).values).hexdigest()
+                for col in df_protein_groups.columns
+                if col.endswith(suffixes) and not col.startswith(MQReader.cross_sample_prefixes)}
 
-                new_index = df_protein_groups.index.drop_duplicates(keep=False)
-                duplicate_index = df_protein_groups.index.difference(new_index)
-                df_dup = df_protein_groups.loc[duplicate_index, :]
-                self.logger.warning("Merging %s rows into %s by summing numerical columns. "
-                                    "Some information might be incorrect", df_dup.shape[0], duplicate_index.shape[0])
-                df_dup = df_dup.groupby(df_dup.index).apply(group_sum)
-                df_protein_groups = pd.concat([df_protein_groups.loc[new_index, :], df_dup], axis=0)
-        self.logger.debug("%s shape after preprocessing: %s", MQReader.proteins_txt, df_protein_groups.shape)
+    def get_ingest_settings(self) -> str:
+        # hash of the settings that change the preprocessing of the protein groups independent of the samples
+        return DataCache.hash_config({
+            "index_col": self.index_col, "duplicate_handling": self.duplicate_handling,
+            "drop_columns": self.drop_columns, "load_all_columns": self.reader_config.get("load_all_columns", False),
+            "dtypes": self.reader_config.get("dtypes"), "mapping": self.mapping_dict,
+            "intensity_entries": self.plotter.default_intensity_entries, "version": __version__,
+        })
 
-        return df_protein_groups
+    def write_ingest_state(self):
+        if self.full_data.cache is None:
+            return
+        try:
+            os.makedirs(self.full_data.cache.cache_dir, exist_ok=True)
+            with open(os.path.join(self.full_data.cache.cache_dir, MQReader.ingest_state_file), "w") as f:
+                json.dump({"settings": self.get_ingest_settings(), "checksums": self.protein_groups_checksums}, f)
+        except OSError as e:
+            self.logger.warning("Could not write %s: %s", MQReader.ingest_state_file, e)
 
+    def read_ingest_state(self) -> Optional[dict]:
+        """
+        Returns
+        -------
+        Optional[dict]
+            settings and column checksums of the cached protein groups or None if there is no state
 
-    def preprocess_proteinGroups(self):
-        file_dir = os.path.join(self.data_dir, MQReader.proteins_txt)
-        df_protein_groups = pd.read_csv(file_dir, sep="\t")
-        df_protein_groups.columns = self.rename_df_columns(df_protein_groups.columns)
-        not_contaminants = (df_protein_groups[
-                                ["Only identified by site", "Reverse", "Potential contaminant"]] == "+"
-                            ).sum(axis=1) == 0
-        self.logger.debug("Removing %s rows from %s because they are marked as contaminant",
-                          (~not_contaminants).sum(), MQReader.proteins_txt)
-        df_protein_groups = df_protein_groups[not_contaminants]
-        if any(df_protein_groups["Fasta headers"].isna()):
+        """
+        if self.full_data.cache is None:
+            return None
+        try:
+            with open(os.path.join(self.full_data.cache.cache_dir, MQReader.ingest_state_file)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def load_previous_protein_groups(self, state: Optional[dict]) -> Optional[Dict[str, pd.DataFrame]]:
+        """
+        Loads the cached protein groups, even if the proteinGroups.txt changed since they were cached.
+
+        Parameters
+        ----------
+        state
+            the state of the cached protein groups, see :meth:`read_ingest_state`
+
+        Returns
+        -------
+        Optional[Dict[str, pd.DataFrame]]
+            Mapping with the keys "proteinGroups" and "contaminants" or None if they were not cached or were
+            processed with different settings
+
+        """
+        if state is None:
+            return None
+        if state.get("settings") != self.get_ingest_settings():
+            self.logger.debug("Cached protein groups were processed with different settings")
+            return None
+        previous = {key: self.full_data.cache.load_previous(key) for key in ("proteinGroups", "contaminants")}
+        if any(df is None for df in previous.values()):
+            return None
+        return previous
+
+    def read_protein_groups_delta(self, previous: Dict[str, pd.DataFrame], checksums: Dict[str, str]
+                                  ) -> Optional[Dict[str, pd.DataFrame]]:
+        """
+        Updates the previously loaded protein groups if samples were added to the proteinGroups.txt, eg because new
+        raw files were added to the search. Only the columns of the new samples, the annotation columns and the
+        intensities normalized across all samples are annotated and merged. The columns of the previous samples are
+        only compared to the checksums of the cached tables, since a new search (e.g. with match between runs) can
+        change their values. The new samples are stored as sample_changes in :attr:`full_data`.
+
+        Parameters
+        ----------
+        previous
+            The cached protein groups, see :meth:`load_previous_protein_groups`
+        checksums
+            checksums of the sample columns of the cached protein groups, see :meth:`get_column_checksums`
+
+        Returns
+        -------
+        Optional[Dict[str, pd.DataFrame]]
+            Mapping with the keys "proteinGroups" and "contaminants" or None if samples were removed, the values of the
+            previous samples or the protein groups changed, in which case the complete file needs to be read
+
+        """
+        usecols = self.get_protein_groups_columns()
+        usecols = list(self.proteins_txt_columns) if usecols is None else usecols
+        new_names = self.rename_df_columns(usecols)
+        samples = [col[len("Intensity "):] for col in new_names if col.startswith("Intensity ")]
+        previous_samples = [col[len("Intensity "):] for col in previous["proteinGroups"].columns
+                            if col.startswith("Intensity ")]
+        added = [sample for sample in samples if sample not in previous_samples]
+        if not added or any(sample not in samples for sample in previous_samples):
+            self.logger.debug("Samples of %s were not only added, reading the complete file", MQReader.proteins_txt)
+            return None
+        # the columns of the previous samples are taken from the cached tables
+        previous_suffixes = tuple(" " + sample for sample in previous_samples)
+        required_columns = set(MQReader.protein_groups_annotation_columns) | {self.index_col}
+        previous_columns = [new_col for col, new_col in zip(usecols, new_names)
+                            if col not in required_columns and not new_col.startswith(MQReader.cross_sample_prefixes)
+                            and new_col.endswith(previous_suffixes)]
+        self.logger.info("Found %s new samples in %s, processing %s of %s columns",
+                         len(added), MQReader.proteins_txt, len(usecols) - len(previous_columns), len(usecols))
+        delta = self.parse_protein_groups(usecols, checksum_only=previous_columns)
+        changed = [col for col in previous_columns if checksums.get(col) != self.protein_groups_checksums.get(col)]
+        if changed:
+            self.logger.info("The values of %s columns of the previous samples in %s changed, e.g. %s, "
+                             "reading the complete file", len(changed), MQReader.proteins_txt, changed[0])
+            return None
+        with self.full_data.timings.measure(MQReader.proteins_txt, "merge") as record:
+            tables = {key: MQReader.merge_protein_groups(previous[key], df, new_names) for key, df in delta.items()}
+            if any(df is None for df in tables.values()):
+                self.logger.info("The protein groups in %s changed, reading the complete file", MQReader.proteins_txt)
+                return None
+            TimingRegistry.add_data(record, tables)
+        self.full_data["sample_changes"] = {"added": added}
+        return tables
+
+    @staticmethod
+    def merge_protein_groups(previous: pd.DataFrame, delta: pd.DataFrame, column_order: List[str]
+                             ) -> Optional[pd.DataFrame]:
+        """
+        Adds the columns of delta to previous. The columns of delta replace the columns of previous with the same name.
+
+        Parameters
+        ----------
+        previous
+            previously processed protein groups
+        delta
+            processed protein groups containing the new columns
+        column_order
+            order of the columns in the file
+
+        Returns
+        -------
+        Optional[pd.DataFrame]
+            the merged data with the columns in the order of the file or None if the proteins or their annotation differ
+
+        """
+        shared_columns = [col for col in delta.columns
+                          if col in previous.columns and not col.startswith(MQReader.cross_sample_prefixes)]
+        if not delta.index.equals(previous.index) or not delta[shared_columns].equals(previous[shared_columns]):
+            return None
+        merged = pd.concat([previous.drop([col for col in delta.columns if col in previous.columns], axis=1), delta],
+                           axis=1)
+        # the columns added during annotation follow the columns of the file
+        order = list(dict.fromkeys(list(column_order) + list(delta.columns)))
+        return merged.loc[:, [col for col in order if col in merged.columns]]
+
+    def process_protein_groups(self, df_protein_groups: pd.DataFrame, name: str) -> pd.DataFrame:
+        """
+        Annotates the protein groups with protein id, gene name and protein name, sets the index to the index_col,
+        converts the intensities to numeric values and handles duplicates according to duplicate_handling.
+
+        Parameters
+        ----------
+        df_protein_groups
+            A subset of the rows of the proteinGroups.txt
+        name
+            name of the subset used for logging
+
+        Returns
+        -------
+        pd.DataFrame
+            The processed protein groups
+
+        """
+        with self.full_data.timings.measure(name, "annotate") as record:
+            df_protein_groups = self.annotate_protein_groups(df_protein_groups, name)
+            TimingRegistry.add_data(record, df_protein_groups)
+        with self.full_data.timings.measure(name, "duplicates") as record:
+            df_protein_groups = self.handle_duplicates(df_protein_groups)
+            TimingRegistry.add_data(record, df_protein_groups)
+        self.logger.debug("%s shape after preprocessing: %s", name, df_protein_groups.shape)
+        return df_protein_groups
+
+    def annotate_protein_groups(self, df_protein_groups: pd.DataFrame, name: str) -> pd.DataFrame:
+        if df_protein_groups.empty:
+            concat_df = pd.DataFrame(columns=["protein id", "Gene name", "Protein name"], index=df_protein_groups.index)
+        elif any(df_protein_groups["Fasta headers"].isna()):
             self.logger.warning("Missing fasta headers using default columns for information")
             gene_name = df_protein_groups["Gene names"]
             sep_ind = gene_name.str.contains(";").fillna(False)
@@ -261,42 +913,35 @@ class MQReader(BaseReader):
                 "Protein name": ["Missing"] * gene_name.shape[0],
             })
         else:
-            # split the fasta headers
-            colon_start = df_protein_groups["Fasta headers"].str.startswith(";")
-            df_protein_groups.loc[colon_start, "Fasta headers"] = df_protein_groups.loc[
-                colon_start, "Fasta headers"].str.lstrip(";")
-            # first split all fasta headers that contain multiple entries
-            sep_ind = df_protein_groups["Fasta headers"].str.contains(";").fillna(False)
+            # parse the first entry of all fasta headers at once
+            fasta_col = df_protein_groups["Fasta headers"].str.extract(MQReader.fasta_header_regex)
             # replace all fasta headers with multiple entries with only the first one
-            df_protein_groups.loc[sep_ind, "Fasta headers"] = \
-                df_protein_groups.loc[sep_ind, "Fasta headers"].str.split(";", expand=True)[0]
-            # split the fasta headers with the pipe symbol
-            fasta_col = df_protein_groups["Fasta headers"].str.split("|", n=2).apply(pd.Series)
-            fasta_col.columns = ["trash", "protein id", "description"]
-            # extract the gene name from the description eg: "GN=abcd"
-            gene_names_fasta = fasta_col["description"].str.extract(r"(GN=(.*?)(\s|$))")[1]
+            df_protein_groups = df_protein_groups.assign(**{"Fasta headers": fasta_col["header"]})
             # added upper() function to avoid that non-human gene names are not recognized
             concat_df = pd.DataFrame({
-                "protein id": fasta_col["protein id"],
-                "Gene name": gene_names_fasta.str.upper(),
-                "Protein name": fasta_col["description"].str.split("_", expand=True)[0]
+                "protein id": fasta_col["protein_id"],
+                "Gene name": fasta_col["gene_name"].str.upper(),
+                "Protein name": fasta_col["protein_name"]
             })
         # concat all important columns with the original dataframe
         df_protein_groups = pd.concat([df_protein_groups, concat_df], axis=1)
         # remove all rows where the column used for indexing is missing
         mask = ~pd.isna(df_protein_groups[self.index_col])
         df_protein_groups = df_protein_groups.loc[mask]
-        if ~mask.sum() > 0:
-            self.logger.warning("Removing %s rows because the index col information from: %s is missing",
-                                ~mask.sum(), self.index_col)
+        if (~mask).sum() > 0:
+            self.logger.warning("Removing %s rows from %s because the index col information from: %s is missing",
+                                (~mask).sum(), name, self.index_col)
         # set index
-        self.logger.info("Setting index of %s to %s", MQReader.proteins_txt, self.index_col)
+        self.logger.info("Setting index of %s to %s", name, self.index_col)
         df_protein_groups = df_protein_groups.set_index(df_protein_groups[self.index_col], drop=False)
         # convert all non numeric intensities
         for col in [col for col in df_protein_groups.columns if "Intensity " in col or "LFQ " in col or "iBAQ " in col]:
             if not is_numeric_dtype(df_protein_groups[col]):
                 df_protein_groups[col] = df_protein_groups[col].apply(lambda x: x.replace(",", ".")).fillna(0)
                 df_protein_groups[col] = df_protein_groups[col].astype("int64")
+        return df_protein_groups
+
+    def handle_duplicates(self, df_protein_groups: pd.DataFrame) -> pd.DataFrame:
         # handle all rows with duplicated index column
         duplicates = df_protein_groups.duplicated(subset=self.index_col, keep=False)
         if any(duplicates):
@@ -306,63 +951,195 @@ class MQReader(BaseReader):
                 self.logger.warning("Dropping all %s duplicates.", duplicates.sum())
                 df_protein_groups = df_protein_groups.drop_duplicates(subset=self.index_col, keep=False)
             elif self.duplicate_handling == "sum":
-                def group_sum(x):
-                    x.iloc[0].loc[x.select_dtypes("number").columns] = x.sum(axis=0, numeric_only=True)
-                    return x.iloc[0]
-
                 new_index = df_protein_groups.index.drop_duplicates(keep=False)
                 duplicate_index = df_protein_groups.index.difference(new_index)
                 df_dup = df_protein_groups.loc[duplicate_index, :]
                 self.logger.warning("Merging %s rows into %s by summing numerical columns. "
                                     "Some information might be incorrect", df_dup.shape[0], duplicate_index.shape[0])
-                df_dup = df_dup.groupby(df_dup.index).apply(group_sum)
+                df_dup = MQReader.sum_duplicates(df_dup)
                 df_protein_groups = pd.concat([df_protein_groups.loc[new_index, :], df_dup], axis=0)
-        self.logger.debug("%s shape after preprocessing: %s", MQReader.proteins_txt, df_protein_groups.shape)
         return df_protein_groups
 
+    @staticmethod
+    def sum_duplicates(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Merges all rows with the same index into one. Numerical columns are summed, all other columns are taken from
+        the first row of each group.
+
+        Parameters
+        ----------
+        df
+            data with duplicated index
+
+        Returns
+        -------
+        pd.DataFrame
+            data with unique index sorted by the index
+
+        """
+        numeric_columns = df.select_dtypes("number").columns
+        first_rows = df.loc[~df.index.duplicated(keep="first")].drop(numeric_columns, axis=1)
+        df_sum = first_rows.join(df[numeric_columns].groupby(level=0).sum()).sort_index()
+        return df_sum.loc[:, df.columns]
+
+    def load_protein_groups_table(self, key: str) -> pd.DataFrame:
+        with self.protein_groups_lock:
+            # the table might have been stored while the other key was loaded
+            df = dict.get(self.full_data, key)
+            if df is not None:
+                return df
+            # both tables are created from the same parse, store the other one as well
+            tables = self.read_protein_groups()
+            for other_key, df in tables.items():
+                if other_key != key and other_key not in self.full_data:
+                    self.full_data.store(other_key, df)
+            return tables[key]
+
+    def preprocess_contaminants(self):
+        return self.load_protein_groups_table("contaminants")
+
+    def preprocess_proteinGroups(self):
+        return self.load_protein_groups_table("proteinGroups")
+
     def preprocess_peptides(self):
-        file_dir = os.path.join(self.data_dir, MQReader.peptides_txt)
-        df_peptides = pd.read_csv(file_dir, sep="\t")
-        df_peptides.columns = self.rename_df_columns(df_peptides.columns)
-        not_contaminants = (df_peptides[
-                                ["Reverse", "Potential contaminant"]] == "+"
-                            ).sum(axis=1) == 0
-        df_peptides = df_peptides[not_contaminants]
+        df_peptides = self.read_txt(MQReader.peptides_txt)
+        with self.full_data.timings.measure("peptides", "filter") as record:
+            df_peptides.columns = self.rename_df_columns(df_peptides.columns)
+            not_contaminants = (df_peptides[
+                                    ["Reverse", "Potential contaminant"]] == "+"
+                                ).sum(axis=1) == 0
+            df_peptides = df_peptides[not_contaminants]
+            TimingRegistry.add_data(record, df_peptides)
         self.logger.debug("Removing %s rows from %s because they are marked as contaminant",
                           (~not_contaminants).sum(), MQReader.peptides_txt)
 
         return df_peptides
 
     def preprocess_summary(self):
-        file_dir = os.path.join(self.data_dir, MQReader.summary_txt)
-        df_summary = pd.read_csv(file_dir, sep="\t", encoding="unicode-escape")
+        df_summary = self.read_txt(MQReader.summary_txt, encoding="unicode-escape")
         df_summary.columns = self.rename_df_columns(df_summary.columns)
         df_summary = df_summary[df_summary["Enzyme"].notna()]
-        df_summary["Experiment"] = self.rename_df_columns(df_summary["Experiment"])
+        df_summary["Experiment"] = self.rename_df_values(df_summary["Experiment"])
         return df_summary
 
     def preprocess_parameters(self):
-        file_dir = os.path.join(self.data_dir, MQReader.parameters_txt)
-        df_parameters = pd.read_csv(file_dir, sep="\t", index_col=[0], squeeze=True)
+        df_parameters = self.read_txt(MQReader.parameters_txt, index_col=[0], squeeze=True)
         return df_parameters
 
     def preprocess_evidence(self):
-        file_dir = os.path.join(self.data_dir, MQReader.evidence_txt)
-        df_evidence = pd.read_csv(file_dir, sep="\t")
-        not_contaminants = (df_evidence[["Reverse", "Potential contaminant"]] == "+").sum(axis=1) == 0
-        df_evidence = df_evidence[not_contaminants]
-        df_evidence.columns = self.rename_df_columns(df_evidence.columns)
-        df_evidence["Experiment"] = self.rename_df_columns(df_evidence["Experiment"].tolist())
+        df_evidence = self.read_txt(MQReader.evidence_txt, dtype=self.get_dtypes("evidence"))
+        with self.full_data.timings.measure("evidence", "filter") as record:
+            not_contaminants = (df_evidence[["Reverse", "Potential contaminant"]] == "+").sum(axis=1) == 0
+            df_evidence = df_evidence[not_contaminants]
+            TimingRegistry.add_data(record, df_evidence)
+        with self.full_data.timings.measure("evidence", "rename"):
+            df_evidence.columns = self.rename_df_columns(df_evidence.columns)
+            df_evidence["Experiment"] = self.rename_df_values(df_evidence["Experiment"])
         return df_evidence
 
     def preprocess_msScans(self):
-        file_dir = os.path.join(self.data_dir, MQReader.ms_scans_txt)
-        df_msscans = pd.read_csv(file_dir, sep="\t", index_col=[0],
-                                 usecols=["Raw file", "Total ion current", "Retention time"])
+        df_msscans = self.read_txt(MQReader.ms_scans_txt, index_col=[0], dtype=self.get_dtypes("msScans"),
+                                   usecols=MQReader.required_columns["msScans"])
         return df_msscans
 
     def preprocess_msmsScans(self):
-        file_dir = os.path.join(self.data_dir, MQReader.msms_scans_txt)
-        df_msmsscans = pd.read_csv(file_dir, sep="\t", index_col=[0],
-                                   usecols=["Raw file", "Total ion current", "Retention time"])
+        df_msmsscans = self.read_txt(MQReader.msms_scans_txt, index_col=[0], dtype=self.get_dtypes("msmsScans"),
+                                     usecols=MQReader.required_columns["msmsScans"])
         return df_msmsscans
+
+    def iter_txt_chunks(self, file_name: str, usecols: List[str], dtype: Optional[dict] = None
+                        ) -> Iterator[pd.DataFrame]:
+        """
+        Reads a file in chunks of rows, see :meth:`get_chunksize`.
+
+        Parameters
+        ----------
+        file_name
+            name of the file in the data dir
+        usecols
+            columns to read, all of them need to be present in the file
+        dtype
+            passed to pd.read_csv
+
+        Yields
+        ------
+        pd.DataFrame
+            the next chunk of the file
+
+        """
+        header = self.get_txt_columns(file_name)
+        missing = [col for col in usecols if col not in header]
+        if missing:
+            raise KeyError(f"Missing columns in {file_name}: {missing}")
+        chunksize = self.get_chunksize(file_name)
+        dtype = {col: t for col, t in (dtype or {}).items() if col in usecols}
+        file_size = os.path.getsize(self.get_txt_path(file_name))
+        # the time includes the processing of the chunks by the caller
+        with self.full_data.timings.measure(file_name, "stream", bytes_read=file_size, rows=0) as record:
+            if self.csv_engine == "pyarrow":
+                import pyarrow as pa
+                try:
+                    for chunk in self.iter_txt_chunks_pyarrow(file_name, usecols, dtype, chunksize):
+                        chunk.index = pd.RangeIndex(record["rows"], record["rows"] + len(chunk))
+                        record["rows"] += len(chunk)
+                        yield chunk
+                    return
+                except pa.ArrowException as e:
+                    # the types are inferred from the first block, later blocks might not match them
+                    self.logger.warning("Could not parse %s with pyarrow, reading the remaining rows with pandas: %s",
+                                        file_name, e)
+            n_rows = record["rows"]
+            with self.open_txt(file_name) as file_dir:
+                for chunk in pd.read_csv(file_dir, sep="\t", usecols=usecols, dtype=dtype, chunksize=chunksize,
+                                         skiprows=range(1, n_rows + 1)):
+                    chunk.index += n_rows
+                    record["rows"] += len(chunk)
+                    yield chunk
+
+    def iter_txt_chunks_pyarrow(self, file_name: str, usecols: List[str], dtype: dict, chunksize: int
+                                ) -> Iterator[pd.DataFrame]:
+        import pyarrow as pa
+        import pyarrow.csv
+        parse_options = pyarrow.csv.ParseOptions(delimiter="\t")
+        convert_options = self.get_convert_options(file_name, usecols, MQReader.get_arrow_types(dtype))
+        with self.open_txt(file_name) as file_dir:
+            reader = pyarrow.csv.open_csv(file_dir, parse_options=parse_options, convert_options=convert_options)
+            # pandas does not parse dates, read these columns as strings instead
+            timestamps = [field.name for field in reader.schema if pa.types.is_timestamp(field.type)]
+        if timestamps:
+            convert_options.column_types = dict(convert_options.column_types,
+                                                **{col: pa.string() for col in timestamps})
+        with self.open_txt(file_name) as file_dir:
+            reader = pyarrow.csv.open_csv(file_dir, parse_options=parse_options, convert_options=convert_options)
+            table = None
+            for batch in reader:
+                batch_table = pa.Table.from_batches([batch])
+                table = batch_table if table is None else pa.concat_tables([table, batch_table])
+                while table.num_rows >= chunksize:
+                    yield MQReader.arrow_to_pandas(table.slice(0, chunksize))
+                    table = table.slice(chunksize)
+            if table is not None and table.num_rows > 0:
+                yield MQReader.arrow_to_pandas(table)
+
+    def iter_evidence_chunks(self) -> Iterator[pd.DataFrame]:
+        usecols = MQReader.required_columns["evidence_summary"]
+        for chunk in self.iter_txt_chunks(MQReader.evidence_txt, usecols, dtype=self.get_dtypes("evidence")):
+            not_contaminants = (chunk[["Reverse", "Potential contaminant"]] == "+").sum(axis=1) == 0
+            chunk = chunk[not_contaminants]
+            yield chunk.assign(Experiment=self.rename_df_values(chunk["Experiment"]))
+
+    def preprocess_evidence_summary(self):
+        return EvidenceAggregator.summarize(self.iter_evidence_chunks)
+
+    def read_scan_trace(self, key: str) -> pd.DataFrame:
+        aggregator = ScanTraceAggregator(MQReader.scan_trace_bin_width)
+        for chunk in self.iter_txt_chunks(MQReader.source_txt_files[key], ScanTraceAggregator.required_columns,
+                                          dtype=self.get_dtypes(key)):
+            aggregator.update(chunk.set_index("Raw file"))
+        return aggregator.result()
+
+    def preprocess_msScans_trace(self):
+        return self.read_scan_trace("msScans")
+
+    def preprocess_msmsScans_trace(self):
+        return self.read_scan_trace("msmsScans")
@@ -0,0 +1,202 @@
+from typing import Callable, Dict, Iterable, Optional
+import numpy as np
+import pandas as pd
+
+
+class EvidenceAggregator:
+    """
+    Summarizes the evidence.txt for the MaxQuant report without keeping the complete table in memory.
+    The data is passed in chunks twice. The first pass collects the value ranges, the per experiment counts and the
+    retention time vs retention length histograms, which have fixed bins. The second pass creates the m/z and
+    retention time histograms, whose bins depend on the value range of the whole file.
+
+    Attributes
+    ----------
+    required_columns
+        columns of the evidence that are used
+    rt_rl_range
+        value range of the retention time vs retention length 2D histogram
+    n_rt_rl_bins
+        number of bins per axis of the retention time vs retention length 2D histogram
+
+    """
+    required_columns = ["Experiment", "m/z", "Charge", "Missed cleavages", "Retention time", "Retention length"]
+    overall_name = "overall"
+    rt_rl_range = ((0, 145), (0, 2))
+    n_rt_rl_bins = 100
+    n_mz_bins = 15
+    n_mz_overall_bins = 10
+    n_rt_bins = 25
+
+    def __init__(self):
+        self.mz_range = [np.inf, -np.inf]
+        self.rt_range = [np.inf, -np.inf]
+        self.charge = []
+        self.missed_cleavages = []
+        self.rt_edges = np.linspace(*self.rt_rl_range[0], self.n_rt_rl_bins + 1)
+        self.rl_edges = np.linspace(*self.rt_rl_range[1], self.n_rt_rl_bins + 1)
+        self.rt_rl_hist2d: Dict[str, np.ndarray] = {}
+        self.rt_rl_x_hist: Dict[str, np.ndarray] = {}
+        self.rt_rl_y_hist: Dict[str, np.ndarray] = {}
+        self.mz_edges: Optional[np.ndarray] = None
+        self.mz_overall_edges: Optional[np.ndarray] = None
+        self.rt_hist_edges: Optional[np.ndarray] = None
+        self.mz_hist: Dict[str, np.ndarray] = {}
+        self.mz_overall_hist: Optional[np.ndarray] = None
+        self.rt_hist: Dict[str, np.ndarray] = {}
+
+    @staticmethod
+    def add_counts(d: Dict[str, np.ndarray], key: str, counts: np.ndarray):
+        if key in d:
+            d[key] += counts
+        else:
+            d[key] = counts
+
+    @staticmethod
+    def update_range(value_range: list, values: pd.Series):
+        if values.notna().any():
+            value_range[0] = min(value_range[0], np.nanmin(values.values))
+            value_range[1] = max(value_range[1], np.nanmax(values.values))
+
+    def first_pass(self, chunk: pd.DataFrame):
+        chunk = chunk[chunk["Experiment"].notna()]
+        self.update_range(self.mz_range, chunk["m/z"])
+        self.update_range(self.rt_range, chunk["Retention time"])
+        self.charge.append(self.count(chunk, "Charge"))
+        self.missed_cleavages.append(self.count(chunk, "Missed cleavages"))
+        rt_rl = chunk[["Experiment", "Retention time", "Retention length"]].dropna()
+        for experiment, df in rt_rl.groupby("Experiment", observed=True):
+            self.add_rt_rl_histograms(str(experiment), df["Retention time"].values, df["Retention length"].values)
+        self.add_rt_rl_histograms(self.overall_name, rt_rl["Retention time"].values, rt_rl["Retention length"].values)
+
+    @staticmethod
+    def count(chunk: pd.DataFrame, column: str) -> pd.Series:
+        counts = chunk.groupby([column, "Experiment"], observed=True).size()
+        # the categories can differ between chunks, which prevents combining the counts
+        counts.index = pd.MultiIndex.from_arrays([counts.index.get_level_values(i).astype(object) for i in range(2)])
+        return counts
+
+    def add_rt_rl_histograms(self, key: str, rt: np.ndarray, rl: np.ndarray):
+        h, _, _ = np.histogram2d(rt, rl, bins=(self.rt_edges, self.rl_edges))
+        self.add_counts(self.rt_rl_hist2d, key, h)
+        self.add_counts(self.rt_rl_x_hist, key, np.histogram(rt, bins=self.rt_edges)[0])
+        self.add_counts(self.rt_rl_y_hist, key, np.histogram(rl, bins=self.rl_edges)[0])
+
+    def finish_first_pass(self):
+        self.mz_edges = np.linspace(*self.mz_range, self.n_mz_bins)
+        self.mz_overall_edges = np.linspace(*self.mz_range, self.n_mz_overall_bins + 1)
+        self.rt_hist_edges = np.linspace(*self.rt_range, self.n_rt_bins)
+
+    def second_pass(self, chunk: pd.DataFrame):
+        chunk = chunk[chunk["Experiment"].notna()]
+        mz = chunk["m/z"].dropna().values
+        counts = np.histogram(mz, bins=self.mz_overall_edges)[0]
+        self.mz_overall_hist = counts if self.mz_overall_hist is None else self.mz_overall_hist + counts
+        for experiment, df in chunk.groupby("Experiment", observed=True):
+            self.add_counts(self.mz_hist, str(experiment),
+                            np.histogram(df["m/z"].dropna().values, bins=self.mz_edges)[0])
+            self.add_counts(self.rt_hist, str(experiment),
+                            np.histogram(df["Retention time"].dropna().values, bins=self.rt_hist_edges)[0])
+
+    @staticmethod
+    def counts_to_frame(counts: list) -> pd.DataFrame:
+        counts = pd.concat(counts).groupby(level=[0, 1]).sum()
+        counts = counts.unstack(1)
+        counts.index = counts.index.astype(int)
+        counts.columns = counts.columns.astype(str)
+        return counts.sort_index(axis=0).sort_index(axis=1)
+
+    @staticmethod
+    def hist_to_frame(hists: Dict[str, np.ndarray], edges: np.ndarray) -> pd.DataFrame:
+        df = pd.DataFrame({key: hists[key] for key in sorted(hists)}, dtype=float)
+        df.insert(0, "left", edges[:-1])
+        df.insert(1, "right", edges[1:])
+        return df
+
+    def result(self) -> Dict[str, pd.DataFrame]:
+        """
+        Returns
+        -------
+        Dict[str, pd.DataFrame]
+            "charge" and "missed_cleavages" contain the counts per experiment.
+            "mz_hist", "mz_overall_hist", "rt_hist", "rt_rl_x_hist" and "rt_rl_y_hist" contain histograms with the
+            bin edges in the columns "left" and "right" and one column of counts per experiment.
+            "rt_rl_hist2d" contains the 2D histograms indexed by experiment and retention time bin.
+
+        """
+        hist2d = pd.concat({
+            key: pd.DataFrame(self.rt_rl_hist2d[key], columns=[str(i) for i in range(self.n_rt_rl_bins)])
+            for key in sorted(self.rt_rl_hist2d)
+        }, names=["Experiment", "bin"])
+        return {
+            "charge": self.counts_to_frame(self.charge),
+            "missed_cleavages": self.counts_to_frame(self.missed_cleavages),
+            "mz_hist": self.hist_to_frame(self.mz_hist, self.mz_edges),
+            "mz_overall_hist": self.hist_to_frame({self.overall_name: self.mz_overall_hist}, self.mz_overall_edges),
+            "rt_hist": self.hist_to_frame(self.rt_hist, self.rt_hist_edges),
+            "rt_rl_x_hist": self.hist_to_frame(self.rt_rl_x_hist, self.rt_edges),
+            "rt_rl_y_hist": self.hist_to_frame(self.rt_rl_y_hist, self.rl_edges),
+            "rt_rl_hist2d": hist2d,
+        }
+
+    @classmethod
+    def summarize(cls, get_chunks: Callable[[], Iterable[pd.DataFrame]]) -> Dict[str, pd.DataFrame]:
+        """
+        Summarizes the evidence by iterating twice over all chunks.
+
+        Parameters
+        ----------
+        get_chunks
+            function returning a new iterable over the chunks of the evidence on each call
+
+        Returns
+        -------
+        Dict[str, pd.DataFrame]
+            see :meth:`result`
+
+        """
+        aggregator = cls()
+        for chunk in get_chunks():
+            aggregator.first_pass(chunk)
+        aggregator.finish_first_pass()
+        for chunk in get_chunks():
+            aggregator.second_pass(chunk)
+        return aggregator.result()
+
+
+class ScanTraceAggregator:
+    """
+    Reduces the msScans.txt or msmsScans.txt to a total ion current trace per raw file by averaging retention time and
+    total ion current of all scans within retention time bins of fixed width.
+
+    """
+    required_columns = ["Raw file", "Total ion current", "Retention time"]
+
+    def __init__(self, bin_width: float = 0.05):
+        self.bin_width = bin_width
+        self.partial: Optional[pd.DataFrame] = None
+
+    def update(self, chunk: pd.DataFrame):
+        chunk = chunk.reset_index()
+        # the categories differ between chunks, which prevents combining the partial results
+        chunk["Raw file"] = chunk["Raw file"].astype(str)
+        chunk["bin"] = np.floor(chunk["Retention time"] / self.bin_width)
+        partial = chunk.groupby(["Raw file", "bin"], observed=True).agg(
+            {"Retention time": "sum", "Total ion current": "sum", "bin": "size"}
+        ).rename({"bin": "n_scans"}, axis=1)
+        if self.partial is not None:
+            partial = pd.concat([self.partial, partial]).groupby(level=[0, 1]).sum()
+        self.partial = partial
+
+    def result(self) -> pd.DataFrame:
+        """
+        Returns
+        -------
+        pd.DataFrame
+            indexed by "Raw file" with the columns "Retention time" and "Total ion current", like the scan files
+
+        """
+        trace = self.partial[["Retention time", "Total ion current"]].divide(self.partial["n_scans"], axis=0)
+        trace = trace.reset_index(level=1, drop=True)
+        trace.index = trace.index.astype(str).rename("Raw file")
+        return trace
@@ -0,0 +1,308 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Optional, Union, Iterable, List, Dict, Callable
+import pandas as pd
+
+from mspypeline.version import __version__
+from mspypeline.helpers.Logger import get_logger
+
+
+class DataCache:
+    cache_file_ending = ".parquet"
+    manifest_file_ending = ".json"
+
+    def __init__(self, cache_dir: str, config: Optional[dict] = None, loglevel=logging.DEBUG):
+        """
+        Persistent cache for preprocessed data. Each entry is stored as parquet file(s) together with a small json
+        manifest, which holds the fingerprint of the source files and the configuration the data was created with.
+        An entry is only returned if the fingerprint still matches, otherwise the data has to be preprocessed again.
+
+        Parameters
+        ----------
+        cache_dir
+            directory where the cached files are stored
+        config
+            configuration used to preprocess the data. A hash of the config is part of the fingerprint
+        loglevel
+            level of the logger
+
+        """
+        self.cache_dir = cache_dir
+        self.config_hash = DataCache.hash_config(config)
+        self.logger = get_logger(self.__class__.__name__, loglevel)
+        self.enabled = True
+
+    @staticmethod
+    def hash_config(config: Optional[dict]) -> str:
+        config = {} if config is None else config
+        config_str = json.dumps(config, sort_keys=True, default=str)
+        return hashlib.sha1(config_str.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def file_fingerprint(file_path: str) -> List[Union[str, int]]:
+        stat = os.stat(file_path)
+        return [os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns]
+
+    def fingerprint(self, source_files: Iterable[str]) -> dict:
+        """
+        Creates the fingerprint of data derived from source_files.
+
+        Parameters
+        ----------
+        source_files
+            paths to all files the data was derived from
+
+        Returns
+        -------
+        dict
+            fingerprint containing path, size and modification time of each file, the config hash and the version
+
+        """
+        return {
+            "files": [DataCache.file_fingerprint(file) for file in source_files],
+            "config": self.config_hash,
+            "version": __version__,
+        }
+
+    def get_cache_path(self, key: str, part: str = "") -> str:
+        file_name = key if not part else f"{key}.{part}"
+        return os.path.join(self.cache_dir, file_name + DataCache.cache_file_ending)
+
+    def get_manifest_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + DataCache.manifest_file_ending)
+
+    def read_manifest(self, key: str) -> Optional[dict]:
+        try:
+            with open(self.get_manifest_path(key)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def load(self, key: str, source_files: Iterable[str]
+             ) -> Union[None, pd.DataFrame, pd.Series, Dict[str, pd.DataFrame]]:
+        """
+        Loads the data stored under key if the fingerprint of the source files did not change.
+
+        Parameters
+        ----------
+        key
+            name of the data
+        source_files
+            paths to all files the data was derived from
+
+        Returns
+        -------
+        Union[None, pd.DataFrame, pd.Series, Dict[str, pd.DataFrame]]
+            The cached data or None if there is no valid cache entry
+
+        """
+        if not self.enabled:
+            return None
+        manifest = self.read_manifest(key)
+        if manifest is None:
+            return None
+        try:
+            fingerprint = self.fingerprint(source_files)
+        except FileNotFoundError:
+            return None
+        if manifest.get("fingerprint") != fingerprint:
+            self.logger.debug("Cache of %s is outdated", key)
+            return None
+        return self.read_entry(key, manifest)
+
+    def load_previous(self, key: str) -> Union[None, pd.DataFrame, pd.Series, Dict[str, pd.DataFrame]]:
+        """
+        Loads the data stored under key even if it is outdated, eg to update it with the changes of the source files.
+
+        Parameters
+        ----------
+        key
+            name of the data
+
+        Returns
+        -------
+        Union[None, pd.DataFrame, pd.Series, Dict[str, pd.DataFrame]]
+            The cached data or None if there is no cache entry
+
+        """
+        if not self.enabled:
+            return None
+        manifest = self.read_manifest(key)
+        if manifest is None:
+            return None
+        return self.read_entry(key, manifest)
+
+    def read_entry(self, key: str, manifest: dict) -> Union[None, pd.DataFrame, pd.Series, Dict[str, pd.DataFrame]]:
+        try:
+            parts = {part: pd.read_parquet(self.get_cache_path(key, part)) for part in manifest.get("parts", [""])}
+        except ImportError:
+            self.logger.warning("Could not read cache, parquet support requires pyarrow or fastparquet")
+            self.enabled = False
+            return None
+        except (OSError, ValueError) as e:
+            self.logger.warning("Could not read cache of %s: %s", key, e)
+            return None
+        if manifest.get("is_dict", False):
+            data = parts
+        elif manifest.get("is_series", False):
+            data = parts[""].iloc[:, 0]
+        else:
+            data = parts[""]
+        self.logger.debug("Loaded %s from cache", key)
+        return data
+
+    def save(self, key: str, data: Union[pd.DataFrame, pd.Series, Dict[str, pd.DataFrame]],
+             source_files: Iterable[str]) -> bool:
+        """
+        Stores the data together with the fingerprint of the source files.
+
+        Parameters
+        ----------
+        key
+            name of the data
+        data
+            data that should be stored. Either a DataFrame, a Series or a dict of DataFrames
+        source_files
+            paths to all files the data was derived from
+
+        Returns
+        -------
+        bool
+            True if the data was stored
+
+        """
+        if not self.enabled:
+            return False
+        is_series = isinstance(data, pd.Series)
+        is_dict = isinstance(data, dict)
+        if is_series:
+            parts = {"": data.to_frame()}
+        elif is_dict:
+            parts = data
+        else:
+            parts = {"": data}
+        if not all(isinstance(part, pd.DataFrame) for part in parts.values()):
+            self.logger.debug("Not caching %s, unsupported type: %s", key, type(data))
+            return False
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # remove the manifest first, so a failed write can never be mistaken for a valid entry
+        self.invalidate(key)
+        try:
+            for part, df in parts.items():
+                df.to_parquet(self.get_cache_path(key, part))
+        except ImportError:
+            self.logger.warning("Could not write cache, parquet support requires pyarrow or fastparquet")
+            self.enabled = False
+            return False
+        except (OSError, ValueError, TypeError) as e:
+            self.logger.warning("Could not write cache of %s: %s", key, e)
+            self.invalidate(key)
+            return False
+        manifest = {"fingerprint": self.fingerprint(source_files), "is_series": is_series, "is_dict": is_dict,
+                    "parts": list(parts)}
+        with open(self.get_manifest_path(key), "w") as f:
+            json.dump(manifest, f)
+        self.logger.debug("Stored %s in cache", key)
+        return True
+
+    def invalidate(self, key: Optional[str] = None):
+        """
+        Removes the cache entry stored under key. If key is None all entries are removed. Other files in the cache
+        directory, like the :class:`HeaderIndex`, are kept.
+
+        Parameters
+        ----------
+        key
+            name of the data
+
+        """
+        if not os.path.isdir(self.cache_dir):
+            return
+        for file in os.listdir(self.cache_dir):
+            # keys can not contain a dot, everything after the first dot is the part and file ending
+            file_key = file.split(".")[0]
+            if key is not None and file_key != key:
+                continue
+            if file.endswith(DataCache.cache_file_ending) or (
+                    file.endswith(DataCache.manifest_file_ending) and DataCache.is_manifest(self.read_manifest(file_key))):
+                os.remove(os.path.join(self.cache_dir, file))
+
+    @staticmethod
+    def is_manifest(manifest) -> bool:
+        # json files that are not written by save, eg the header index, have no fingerprint
+        return isinstance(manifest, dict) and "fingerprint" in manifest
+
+
+class HeaderIndex:
+    index_file_name = "header_index.json"
+
+    def __init__(self, index_dir: Optional[str] = None, loglevel=logging.DEBUG):
+        """
+        Index of the header and metadata of source files, like the column names, detected dtypes and an estimate of
+        the number of rows. The metadata of a file is determined once and stored as json in index_dir, so that reads
+        can be planned without parsing the file. An entry is only used while size and modification time of the file
+        did not change.
+
+        Parameters
+        ----------
+        index_dir
+            directory where the index is stored. If None the index is only kept in memory
+        loglevel
+            level of the logger
+
+        """
+        self.index_path = None if index_dir is None else os.path.join(index_dir, HeaderIndex.index_file_name)
+        self.logger = get_logger(self.__class__.__name__, loglevel)
+        self.lock = threading.Lock()
+        self.entries: Dict[str, dict] = self.read()
+
+    def read(self) -> Dict[str, dict]:
+        if self.index_path is None:
+            return {}
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def write(self):
+        if self.index_path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            with open(self.index_path, "w") as f:
+                json.dump(self.entries, f)
+        except OSError as e:
+            self.logger.warning("Could not write header index: %s", e)
+
+    def get(self, file_path: str, describe: Callable[[str], dict]) -> dict:
+        """
+        Gets the metadata of a file. If the file is not indexed yet or changed, it is described again.
+
+        Parameters
+        ----------
+        file_path
+            path of the file
+        describe
+            function returning the metadata of the file at the given path
+
+        Returns
+        -------
+        dict
+            the metadata returned by describe together with the fingerprint of the file
+
+        """
+        fingerprint = DataCache.file_fingerprint(file_path)
+        with self.lock:
+            entry = self.entries.get(fingerprint[0])
+        if entry is not None and entry.get("fingerprint") == fingerprint:
+            return entry
+        self.logger.debug("Indexing %s", file_path)
+        entry = dict(describe(file_path), fingerprint=fingerprint)
+        with self.lock:
+            self.entries[fingerprint[0]] = entry
+            self.write()
+        return entry
@@ -0,0 +1,107 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+
+
+def get_memory_usage(data, deep: bool = True) -> int:
+    """
+    Size in bytes of data, which can be a DataFrame, Series, array or a dict of those. Other data has a size of 0.
+    If deep is False, the objects referenced by object columns are not counted, which avoids iterating over them.
+
+    """
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        return int(np.sum(data.memory_usage(deep=deep, index=True)))
+    if isinstance(data, np.ndarray):
+        return data.nbytes
+    if isinstance(data, dict):
+        return sum(get_memory_usage(value, deep=deep) for value in data.values())
+    return 0
+
+
+def get_number_of_rows(data) -> Optional[int]:
+    if isinstance(data, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(data)
+    if isinstance(data, dict):
+        return sum(get_number_of_rows(value) or 0 for value in data.values())
+    return None
+
+
+class TimingRegistry:
+    columns = ["key", "stage", "seconds", "rows", "bytes_read", "memory", "source", "error"]
+
+    def __init__(self):
+        """
+        Collects timings of the stages of loading data, together with the number of rows and bytes read and the
+        memory used by the resulting data. Each stage is recorded with :meth:`measure`. The records can be
+        exported with :meth:`to_records` and summarized as table with :meth:`summary`.
+
+        """
+        self.records: List[dict] = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, key: str, stage: str, **info):
+        """
+        Measures the wall time of a stage. The yielded record can be updated with further information, eg with
+        :meth:`add_data`. Stages raising an error are recorded as well.
+
+        Parameters
+        ----------
+        key
+            name of the data or file
+        stage
+            name of the stage
+        info
+            further information stored in the record
+
+        Yields
+        ------
+        dict
+            the record of the stage
+
+        """
+        record = {"key": key, "stage": stage, **info}
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record["error"] = repr(e)
+            raise
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            with self.lock:
+                self.records.append(record)
+
+    @staticmethod
+    def add_data(record: dict, data):
+        record["rows"] = get_number_of_rows(data)
+        record["memory"] = get_memory_usage(data)
+
+    def to_records(self) -> List[dict]:
+        with self.lock:
+            return [dict(record) for record in self.records]
+
+    def to_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame(self.to_records())
+        return df.reindex(columns=TimingRegistry.columns + [col for col in df.columns
+                                                            if col not in TimingRegistry.columns])
+
+    def summary(self) -> str:
+        """
+        Returns
+        -------
+        str
+            table of all records, with times in seconds and sizes in megabytes
+
+        """
+        df = self.to_frame()
+        if df.empty:
+            return "No data was loaded"
+        df = df.drop("error", axis=1).assign(bytes_read=df["bytes_read"] / 1e6, memory=df["memory"] / 1e6)
+        for col, fmt in (("seconds", "{:.3f}"), ("rows", "{:.0f}"), ("bytes_read", "{:.3f}"), ("memory", "{:.3f}")):
+            df[col] = [fmt.format(x) if pd.notna(x) else "" for x in df[col]]
+        df = df.rename({"bytes_read": "MB read", "memory": "memory MB"}, axis=1)
+        return df.fillna("").to_string(index=False)
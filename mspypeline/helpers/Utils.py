@@ -1,11 +1,18 @@
-from typing import Optional, Dict, Tuple, Iterator, Union, Iterable, Sized
+import os
+from typing import Optional, Dict, Tuple, Iterator, Union, Iterable, Sized, Callable
+from collections.abc import MutableMapping
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
 import pandas as pd
 from collections import defaultdict as ddict
 from itertools import combinations
-from collections import deque
+from collections import deque, OrderedDict
 import numpy as np
 from matplotlib.lines import Line2D
 
+from mspypeline.helpers.Cache import DataCache
+from mspypeline.helpers.Timing import TimingRegistry, get_memory_usage
+
 
 def get_number_rows_cols_for_fig(obj: Union[int, Sized]) -> Tuple[int, int]:
     if isinstance(obj, Sized):
@@ -128,18 +135,24 @@ def get_number_of_non_na_values(x: int, offset: int = 0) -> int:
     return max(int(np.round(percentage * x)) - offset, 3 - offset)
 
 
-def get_intersection_and_unique(v1: pd.DataFrame, v2: pd.DataFrame, na_function=get_number_of_non_na_values):
+def get_intersection_and_unique(v1: pd.DataFrame, v2: pd.DataFrame, na_function=get_number_of_non_na_values,
+                                detected_1: Optional[pd.Series] = None, detected_2: Optional[pd.Series] = None):
     # get number of allowed non na values for both dataframes
     non_na_group_1 = na_function(v1.shape[1])
     non_na_group_2 = na_function(v2.shape[1])
+    # number of values above 0 per row, eg from the "detected" aggregation of a DataTree
+    if detected_1 is None:
+        detected_1 = (v1 > 0).sum(axis=1)
+    if detected_2 is None:
+        detected_2 = (v2 > 0).sum(axis=1)
     # find rows which fulfill the requirement
-    mask_1 = (v1 > 0).sum(axis=1) >= non_na_group_1
-    mask_2 = (v2 > 0).sum(axis=1) >= non_na_group_2
+    mask_1 = detected_1 >= non_na_group_1
+    mask_2 = detected_2 >= non_na_group_2
     # combine both rows
     mask = np.logical_and(mask_1, mask_2)
     # determine missing
-    missing_1 = (v1 > 0).sum(axis=1) == 0
-    missing_2 = (v2 > 0).sum(axis=1) == 0
+    missing_1 = detected_1 == 0
+    missing_2 = detected_2 == 0
     # determine exclusive
     exclusive_1 = np.logical_and(mask_1, missing_2)
     exclusive_2 = np.logical_and(mask_2, missing_1)
@@ -203,13 +216,20 @@ def get_plot_name_suffix(df_to_use: Optional[str] = None, level: Optional[int] =
 
 
 class DataDict(dict):
-    def __init__(self, data_source, *args, **kwargs):
+    def __init__(self, data_source, *args, cache: Optional[DataCache] = None, memory_limit: Optional[int] = None,
+                 **kwargs):
         """
         Overwrites the standard dictionary to provide an additional DataSource.
         When a missing key is looked up the DataSource is searched for a method named:
         e.g. looking up key=parameters, looking for method named "preprocess_parameters",
         which is expected to return data, which will then be stored under the key.
         This allows data from disk to be loaded on demand instead of loading all possible data at the beginning.
+        If a cache is provided, data is first looked up in the cache and newly preprocessed data is stored in it.
+        The files data is derived from are provided by the DataSource method "get_source_files".
+        Loading is thread safe, a key that is accessed from multiple threads at once is only loaded once.
+        If a memory limit is provided, the least recently used data is removed when the size of all stored data
+        exceeds the limit. Removed data is loaded again from the cache or the DataSource on the next access.
+        The time needed to load each key is recorded in :attr:`timings`.
 
         Parameters
         ----------
@@ -217,23 +237,264 @@ class DataDict(dict):
             class which will be searched for methods
         args
             passed to dict.__init__
+        cache
+            optional :class:`DataCache` to persist preprocessed data between runs
+        memory_limit
+            optional maximum size in bytes of all stored data. Only data that can be loaded again is removed
         kwargs
             passed to dict.__init__
         """
         super().__init__(*args, **kwargs)
         self.data_source = data_source
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.key_locks: Dict[str, threading.Lock] = {}
+        self.memory_limit = memory_limit
+        # size in bytes of the stored data, ordered from least to most recently used
+        self.sizes: Dict[str, int] = OrderedDict()
+        self.timings = TimingRegistry()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if self.memory_limit is not None:
+            with self.lock:
+                self.sizes[key] = DataDict.get_size(value)
+                self.sizes.move_to_end(key)
+                self.evict(keep=key)
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if self.memory_limit is not None:
+            with self.lock:
+                if key in self.sizes:
+                    self.sizes.move_to_end(key)
+        return value
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        with self.lock:
+            self.sizes.pop(key, None)
+
+    # pop, popitem and clear of dict do not call __delitem__
+    def pop(self, key, *args):
+        with self.lock:
+            self.sizes.pop(key, None)
+        return super().pop(key, *args)
+
+    def popitem(self):
+        key, value = super().popitem()
+        with self.lock:
+            self.sizes.pop(key, None)
+        return key, value
+
+    def clear(self):
+        super().clear()
+        with self.lock:
+            self.sizes.clear()
+
+    @staticmethod
+    def get_size(data) -> int:
+        # shallow size, since it is determined whenever data is stored
+        return get_memory_usage(data, deep=False)
+
+    def evict(self, keep=None):
+        """
+        Removes the least recently used data until the size of all data is below the memory limit.
+        Has to be called while holding :attr:`lock`.
+
+        Parameters
+        ----------
+        keep
+            key that should not be removed
+        """
+        total_size = sum(self.sizes.values())
+        for key in list(self.sizes):
+            if total_size <= self.memory_limit:
+                break
+            # data that can not be loaded again is never removed
+            if key == keep or not hasattr(self.data_source, f"preprocess_{key}"):
+                continue
+            total_size -= self.sizes.pop(key)
+            dict.pop(self, key, None)
+            self.data_source.logger.debug("Removed %s from memory to stay below the memory limit", key)
+
+    def get_key_lock(self, key) -> threading.Lock:
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def get_source_files(self, key) -> list:
+        get_source_files = getattr(self.data_source, "get_source_files", None)
+        if get_source_files is None:
+            return []
+        return get_source_files(key)
 
     def __missing__(self, key):
+        with self.get_key_lock(key):
+            # the data might have been loaded by another thread while waiting for the lock
+            data = dict.get(self, key, None)
+            if data is not None or dict.__contains__(self, key):
+                return data
+            return self.load(key)
+
+    def load(self, key):
         try:
-            self.data_source.logger.debug("Reading %s from disk", key)
-            data = getattr(self.data_source, f"preprocess_{key}")()
-            self[key] = data
+            with self.timings.measure(key, "load") as record:
+                source_files = self.get_source_files(key) if self.cache is not None else []
+                data = None
+                if source_files:
+                    data = self.cache.load(key, source_files)
+                if data is None:
+                    self.data_source.logger.debug("Reading %s from disk", key)
+                    record["source"] = "disk"
+                    record["bytes_read"] = sum(os.path.getsize(file) for file in self.get_source_files(key)
+                                               if os.path.isfile(file))
+                    data = getattr(self.data_source, f"preprocess_{key}")()
+                    # the data might have been stored while loading another key
+                    if dict.get(self, key) is not data:
+                        self.store(key, data)
+                else:
+                    record["source"] = "cache"
+                    self[key] = data
+                TimingRegistry.add_data(record, data)
             return data
         except FileNotFoundError as e:
             raise KeyError("Missing file:", key, e)
         except AttributeError as e:
             raise KeyError("Missing function to load:", key, e)
 
+    def store(self, key, data):
+        """
+        Stores data under key and, if a cache is provided, also in the cache.
+
+        Parameters
+        ----------
+        key
+            name of the data
+        data
+            data to store
+        """
+        self[key] = data
+        if self.cache is not None:
+            source_files = self.get_source_files(key)
+            if source_files:
+                self.cache.save(key, data, source_files)
+
+    def invalidate_cache(self, key: Optional[str] = None):
+        """
+        Removes data from the cache, so that it will be preprocessed again on the next access.
+
+        Parameters
+        ----------
+        key
+            name of the data. If None the complete cache is removed
+        """
+        if self.cache is not None:
+            self.cache.invalidate(key)
+
+    def is_available(self, key) -> bool:
+        """
+        Checks whether the data stored under key is loaded or can be loaded from the DataSource. The DataSource
+        method "is_readable" is used to check this without loading the data.
+
+        Parameters
+        ----------
+        key
+            name of the data
+
+        Returns
+        -------
+        bool
+            True if the data is available
+        """
+        if dict.__contains__(self, key):
+            return True
+        if not hasattr(self.data_source, f"preprocess_{key}"):
+            return False
+        is_readable = getattr(self.data_source, "is_readable", None)
+        return is_readable is None or is_readable(key)
+
+    def prefetch(self, keys: Iterable[str], max_workers: Optional[int] = None) -> Dict[str, Future]:
+        """
+        Starts loading all keys, that are not loaded yet, in parallel threads. Accessing a key that is currently
+        loaded waits until loading finished. Errors are not raised here, but again when the key is accessed.
+
+        Parameters
+        ----------
+        keys
+            names of the data to load
+        max_workers
+            maximum number of threads, by default one per key
+
+        Returns
+        -------
+        Dict[str, Future]
+            a future for each key that is loaded
+        """
+        keys = [key for key in dict.fromkeys(keys) if key not in self]
+        if not keys:
+            return {}
+        executor = ThreadPoolExecutor(max_workers=max_workers or len(keys))
+        futures = {key: executor.submit(self.__getitem__, key) for key in keys}
+        # the threads exit once all keys are loaded
+        executor.shutdown(wait=False)
+        return futures
+
+
+class LazyDict(MutableMapping):
+    def __init__(self, *args, cache: bool = False, **kwargs):
+        """
+        Dictionary whose values can be functions, which are only called when the key is accessed. This allows to
+        store data that can be derived from other data without holding it in memory.
+
+        Parameters
+        ----------
+        args
+            passed to dict
+        cache
+            If True the result of a function replaces it, otherwise the function is called on each access
+        kwargs
+            passed to dict
+        """
+        self.data = dict(*args, **kwargs)
+        self.functions: Dict[str, Callable] = {}
+        self.cache = cache
+
+    def set_lazy(self, key, function: Callable):
+        """
+        Stores function, its result is returned when key is accessed.
+
+        """
+        self.data.pop(key, None)
+        self.functions[key] = function
+
+    def __getitem__(self, key):
+        if key in self.data:
+            return self.data[key]
+        value = self.functions[key]()
+        if self.cache:
+            self[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self.functions.pop(key, None)
+        self.data[key] = value
+
+    def __delitem__(self, key):
+        if key in self.functions:
+            del self.functions[key]
+        else:
+            del self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data or key in self.functions
+
+    def __iter__(self):
+        yield from self.data
+        yield from self.functions
+
+    def __len__(self):
+        return len(self.data) + len(self.functions)
+
 
 def format_docstrings(**mapping):
     def docstring_decorator(fn):
@@ -1,10 +1,17 @@
+import json
+import struct
+import warnings
 from collections import defaultdict as ddict
-from collections import deque
+from collections import deque, OrderedDict
+import numpy as np
 import pandas as pd
-from typing import Union, Callable, Dict, List, Sized, Optional
+from pandas.api.types import is_list_like
+from typing import Union, Callable, Dict, List, Sized, Optional, Iterable, Iterator, Hashable, Tuple
 
 
 class DataNode:
+    __slots__ = ("name", "parent", "level", "children", "full_name", "tree", "_data")
+
     def __init__(self, name: str = "",
                  level: int = 0,
                  parent: "DataNode" = None,
@@ -22,7 +29,8 @@ class DataNode:
         parent
             Parent of this node
         data
-            Is None when there are nodes below this one, which were not aggregated as technical replicated
+            Is None when there are nodes below this one, which were not aggregated as technical replicated.
+            If the node belongs to a :class:`DataTree` the data is stored in the matrix of the tree
         children
             Maps name of a child to a child node
 
@@ -33,7 +41,6 @@ class DataNode:
         """
         self.name = name
         self.parent = parent
-        self.data = data
         self.level = level
         self.children = {} if children is None else children
         if self.parent is not None:
@@ -41,7 +48,29 @@ class DataNode:
             self.full_name = prefix + self.name
         else:
             self.full_name = ""
-        self.iter_counter = -1
+        # the tree holding the data of the node, nodes without a tree store their data themselves
+        self.tree: Optional["DataTree"] = self.parent.tree if self.parent is not None else None
+        self._data = None
+        self.data = data
+
+    @property
+    def data(self) -> Optional[pd.Series]:
+        if self.tree is not None:
+            return self.tree.get_node_data(self)
+        return self._data
+
+    @data.setter
+    def data(self, data: Optional[pd.Series]):
+        if self.tree is not None:
+            self.tree.set_node_data(self, data)
+        else:
+            self._data = data
+
+    @property
+    def has_data(self) -> bool:
+        if self.tree is not None:
+            return self.full_name in self.tree.column_positions
+        return self._data is not None
 
     def __str__(self):
         return f"level {self.level}, name: {self.full_name}, n children: {self.get_total_number_children()}"
@@ -54,17 +83,11 @@ class DataNode:
 
     def __setitem__(self, key, node):
         self.children[key] = node
+        if self.tree is not None:
+            self.tree.nodes[node.full_name] = node
 
-    def __iter__(self):
-        self.iter_counter = -1
-        return self
-
-    def __next__(self):
-        self.iter_counter += 1
-        if self.iter_counter < len(self.children.keys()):
-            idx = list(self.children.keys())[self.iter_counter]
-            return self.children[idx]
-        raise StopIteration
+    def __iter__(self) -> Iterator["DataNode"]:
+        yield from self.children.values()
 
     def get_total_number_children(self, go_max_depth: bool = False) -> int:
         """
@@ -83,20 +106,47 @@ class DataNode:
 
         """
         n_children = 0
-        if self.data is not None and not go_max_depth:
+        if self.has_data and not go_max_depth:
             return n_children
         queue = deque([self])
         while queue:
             parent = queue.popleft()
             for child in parent:
-                if child.data is not None and child.children and go_max_depth:
+                if child.has_data and child.children and go_max_depth:
                     queue += [child]
-                elif child.data is None:
+                elif not child.has_data:
                     queue += [child]
                 else:
                     n_children += 1
         return n_children
 
+    def get_data_nodes(self, go_max_depth: bool = False) -> List["DataNode"]:
+        """
+        Finds the nodes that are aggregated, which are the first nodes containing data on each path from this node.
+
+        Parameters
+        ----------
+        go_max_depth
+            If technical replicates were aggregated, this can be specified to use the unaggregated nodes instead.
+
+        Returns
+        -------
+        List[DataNode]
+            The nodes containing data in breadth first order
+
+        """
+        queue = deque([self])
+        nodes = []
+        while queue:
+            parent = queue.popleft()
+            should_go_deeper = go_max_depth and parent.children
+            if parent.has_data and not should_go_deeper:
+                nodes.append(parent)
+            else:
+                for child in parent:
+                    queue += [child]
+        return nodes
+
     def aggregate(self,
                   method: Union[None, str, Callable] = "mean",
                   go_max_depth: bool = False,
@@ -106,7 +156,8 @@ class DataNode:
         Parameters
         ----------
         method
-            If None no aggregation will be applied. Otherwise needs to be accepted by pd.aggregate.
+            If None no aggregation will be applied. Otherwise needs to be accepted by pd.aggregate. For nodes of a
+            :class:`DataTree` "detected" counts the values above 0.
         go_max_depth
             If technical replicates were aggregated, this can be specified to use the unaggregated values instead.
         index
@@ -117,28 +168,49 @@ class DataNode:
         Union[pd.Series, pd.DataFrame]
             Result of the aggregation
         """
-        queue = deque([self])
+        if self.tree is not None:
+            return self.tree.get_result(
+                ("aggregate", self.full_name, method, go_max_depth, DataTree.get_index_key(index)),
+                lambda: self.tree.aggregate_columns(
+                    [node.full_name for node in self.get_data_nodes(go_max_depth)], method, index, self.full_name)
+            )
         data = []
-        while queue:
-            parent = queue.popleft()
-            should_go_deeper = go_max_depth and parent.children
-            if parent.data is not None and not should_go_deeper:
-                if index is not None:
-                    # append only the items in the index
-                    series_data = parent.data.loc[index]
-                    if not isinstance(series_data, pd.Series):
-                        series_data = pd.Series(series_data, name=parent.data.name, index=[index])
-                    data.append(series_data)
-                else:
-                    data.append(parent.data)
+        for node in self.get_data_nodes(go_max_depth):
+            if index is not None:
+                # append only the items in the index
+                series_data = node.data.loc[index]
+                if not isinstance(series_data, pd.Series):
+                    series_data = pd.Series(series_data, name=node.data.name, index=[index])
+                data.append(series_data)
             else:
-                for child in parent:
-                    queue += [child]
+                data.append(node.data)
         data = pd.concat(data, axis=1)
         if method is not None:
             data = data.aggregate(method, axis=1).rename(self.full_name, axis=1)
         return data
 
+    def get_detected(self, go_max_depth: bool = False, index: Optional[Union[str, pd.Index]] = None) -> pd.DataFrame:
+        """
+        Parameters
+        ----------
+        go_max_depth
+            Will be passed to get_data_nodes.
+        index
+            Index to subset the data with. If None no index is applied
+
+        Returns
+        -------
+        pd.DataFrame
+            For each node containing data, whether the values are above 0, like aggregate(None) > 0
+
+        """
+        if self.tree is not None:
+            return self.tree.get_result(
+                ("detected", self.full_name, go_max_depth, DataTree.get_index_key(index)),
+                lambda: self.tree.get_detected([node.full_name for node in self.get_data_nodes(go_max_depth)], index)
+            )
+        return self.aggregate(None, go_max_depth, index) > 0
+
     def groupby(
             self, method: Union[str, Callable] = "mean",
             go_max_depth: bool = False,
@@ -166,6 +238,15 @@ class DataNode:
         aggregate : Will be called on each of the groups
 
         """
+        if self.tree is not None:
+            return self.tree.get_result(
+                ("groupby", self.full_name, method, go_max_depth, DataTree.get_index_key(index)),
+                lambda: self.group_children(method, go_max_depth, index)
+            )
+        return self.group_children(method, go_max_depth, index)
+
+    def group_children(self, method: Union[str, Callable] = "mean", go_max_depth: bool = False,
+                       index: Union[None, str, pd.Index] = None) -> Union[pd.Series, pd.DataFrame]:
         data = {child.name: child.aggregate(method, go_max_depth, index) for child in self}
         data = pd.concat(data, axis=1)
         new_col_names = [self.full_name]
@@ -184,8 +265,64 @@ class DataTree:
         Does stuff
     level_keys_full_name: Dict[int, List[str]]
         Has all DataNode.full_name of a depth level of all levels
+    values: np.ndarray
+        The data of all nodes as one matrix, with a column per node containing data. Numeric data keeps its common
+        dtype, all other data is stored as float
+    index: pd.Index
+        The index of the rows of values
+    column_positions: Dict[str, int]
+        Maps DataNode.full_name to the column of the node in values
+    detected: np.ndarray
+        Whether the values are above 0 as bits packed along the rows with np.packbits. Is created from values when
+        it is first needed
+    nodes: Dict[str, DataNode]
+        Maps DataNode.full_name to all nodes below the root
+    results: Dict[tuple, Union[pd.Series, pd.DataFrame]]
+        Stored results of aggregate and groupby, see :meth:`get_result`. At most max_cached_results results and
+        max_cached_bytes bytes of results are kept, the least recently used results are removed first
+    result_sizes: Dict[tuple, int]
+        Bytes of the results, results which are a view of the matrix of the tree have a size of 0
+    row_positions: Dict[Hashable, Optional[np.ndarray]]
+        Positions in values of the labels of the indices used to subset the data, see :meth:`get_row_positions`
+    source_values: np.ndarray
+        For trees created with :meth:`from_transform`, the matrix of the source tree. Columns positions below its
+        number of columns refer to the transformed columns of source_values, all others to values
+    transform: str
+        name of the transform in transforms applied to source_values
 
     """
+    # reductions over the rows of values, which skip missing values like the pandas methods with the same name
+    reductions = {
+        "mean": lambda x: np.nanmean(x, axis=1),
+        "median": lambda x: np.nanmedian(x, axis=1),
+        "sum": lambda x: np.nansum(x, axis=1),
+        "min": lambda x: np.nanmin(x, axis=1),
+        "max": lambda x: np.nanmax(x, axis=1),
+        "std": lambda x: np.nanstd(x, axis=1, ddof=1),
+        "var": lambda x: np.nanvar(x, axis=1, ddof=1),
+        "count": lambda x: (~np.isnan(x)).sum(axis=1),
+        # number of values above 0, eg detected proteins
+        "detected": lambda x: (x > 0).sum(axis=1),
+    }
+    # reductions that are calculated for all groups of a level at once, see reduce_segments
+    segment_reductions = ("mean", "median", "sum", "count", "detected")
+    # reductions that can be calculated from the partial reductions of the groups of a lower level
+    decomposable_reductions = ("mean", "sum", "count", "detected")
+    # default number of results of aggregate and groupby that are kept, None keeps all results
+    max_cached_results = 256
+    # default number of bytes of results of aggregate and groupby that are kept, None keeps all results
+    max_cached_bytes = 256 * 1024 ** 2
+    # number of set bits of each byte
+    popcount = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    # transforms of the values for trees created with from_transform
+    transforms = {
+        "log2": np.log2,
+    }
+    # start of a snapshot file, followed by the length of the header
+    snapshot_magic = b"MSPTREE1"
+    # the matrix of a snapshot starts at a multiple of this
+    snapshot_alignment = 64
+
     def __init__(self, root: DataNode):
         """
 
@@ -198,8 +335,37 @@ class DataTree:
         self.level_keys_full_name = ddict(list)
         # TODO self.level_keys_name = ddict(list)?
         # TODO self.methods ?
+        self.values: Optional[np.ndarray] = None
+        self.index: Optional[pd.Index] = None
+        self.column_positions: Dict[str, int] = {}
+        self.detected: Optional[np.ndarray] = None
+        # results of aggregate and groupby, ordered from least to most recently used
+        self.results: Dict[tuple, Union[pd.Series, pd.DataFrame]] = OrderedDict()
+        self.max_cached_results = DataTree.max_cached_results
+        self.result_sizes: Dict[tuple, int] = {}
+        self.max_cached_bytes = DataTree.max_cached_bytes
+        self.row_positions: Dict[Hashable, Optional[np.ndarray]] = OrderedDict()
+        self.source_values: Optional[np.ndarray] = None
+        self.transform: Optional[str] = None
+        self.nodes: Dict[str, DataNode] = {}
+        # move the data of the nodes into the matrix of the tree
+        node_data = {}
+        queue = deque([root])
+        while queue:
+            node = queue.popleft()
+            queue += list(node)
+            if node._data is not None:
+                node_data[node.full_name] = node._data
+            node.tree, node._data = self, None
+            if node is not root:
+                self.nodes[node.full_name] = node
+        if node_data:
+            self.set_data(pd.concat(node_data, axis=1))
 
     def __getitem__(self, key: str, sep: str = "_"):
+        node = self.nodes.get(key) if sep == "_" else None
+        if node is not None:
+            return node
         # TODO maybe this should be moved to the data node
         key_split = key.split(sep)
         start = self.root
@@ -251,6 +417,195 @@ class DataTree:
             c.aggregate_technical_replicates()
         return c
 
+    def to_snapshot(self, path: str):
+        """
+        Writes the tree to a single file, which can be opened with :meth:`from_snapshot`. The file starts with a json
+        header holding the nodes, level keys, index and column names, followed by values as raw little endian matrix.
+        The values, names and dtypes of all index levels are stored, so a MultiIndex or tuple labels are kept.
+
+        Parameters
+        ----------
+        path
+            path of the file
+
+        """
+        columns = sorted(self.column_positions, key=self.column_positions.get)
+        values = self.get_values(self.get_column_indexer(columns)) if self.index is not None else np.empty((0, 0))
+        index = self.index if self.index is not None else pd.Index([])
+        header = {
+            "nodes": self.get_node_layout(),
+            "level_keys_full_name": [[level, keys] for level, keys in self.level_keys_full_name.items()],
+            "columns": columns,
+            "index": [index.get_level_values(i).tolist() for i in range(index.nlevels)],
+            "index_names": list(index.names),
+            "index_dtypes": [str(index.get_level_values(i).dtype) for i in range(index.nlevels)],
+            "shape": list(values.shape),
+            "dtype": values.dtype.newbyteorder("<").str,
+            "has_data": self.index is not None,
+        }
+        header = json.dumps(header, default=str).encode("utf-8")
+        start = len(DataTree.snapshot_magic) + 8 + len(header)
+        padding = -start % DataTree.snapshot_alignment
+        with open(path, "wb") as f:
+            f.write(DataTree.snapshot_magic)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            f.write(b"\0" * padding)
+            f.write(np.ascontiguousarray(values, dtype=values.dtype.newbyteorder("<")).tobytes())
+
+    @classmethod
+    def from_snapshot(cls, path: str, mmap: bool = True):
+        """
+        Opens a tree written with :meth:`to_snapshot`.
+
+        Parameters
+        ----------
+        path
+            path of the file
+        mmap
+            If True values is memory mapped from the file, so processes opening the same file share the memory and
+            only the data that is used is read. Otherwise the matrix is read into memory.
+
+        Returns
+        -------
+        cls
+
+        """
+        with open(path, "rb") as f:
+            if f.read(len(DataTree.snapshot_magic)) != DataTree.snapshot_magic:
+                raise ValueError(f"{path} is not a DataTree snapshot")
+            header_length, = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_length).decode("utf-8"))
+        start = len(DataTree.snapshot_magic) + 8 + header_length
+        offset = start + -start % DataTree.snapshot_alignment
+
+        c = cls.from_node_layout(header["nodes"], dict(header["level_keys_full_name"]))
+        if header["has_data"]:
+            shape = tuple(header["shape"])
+            dtype = np.dtype(header.get("dtype", "<f8"))
+            if mmap and shape[0] * shape[1] > 0:
+                values = np.asarray(np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape))
+            else:
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    values = np.fromfile(f, dtype=dtype, count=shape[0] * shape[1]).reshape(shape)
+                values.flags.writeable = False
+            c.values = values
+            levels = []
+            for level_values, dtype in zip(header["index"], header["index_dtypes"]):
+                # json stores tuples as lists
+                if dtype == "object":
+                    level_values = [tuple(x) if isinstance(x, list) else x for x in level_values]
+                levels.append(pd.Index(level_values, dtype=dtype, tupleize_cols=False))
+            if len(levels) == 1:
+                c.index = levels[0].rename(header["index_names"][0])
+            else:
+                c.index = pd.MultiIndex.from_arrays(levels, names=header["index_names"])
+            c.column_positions = {name: i for i, name in enumerate(header["columns"])}
+        return c
+
+    def get_node_layout(self) -> List[list]:
+        """
+        Returns
+        -------
+        List[list]
+            name, level and full name of the parent of all nodes below the root, parents before their children
+
+        """
+        nodes = []
+        queue = deque(self.root)
+        while queue:
+            node = queue.popleft()
+            queue += list(node)
+            nodes.append([node.name, node.level, node.parent.full_name])
+        return nodes
+
+    @classmethod
+    def from_node_layout(cls, nodes: List[list], level_keys_full_name: Dict[int, List[str]]):
+        """
+        Creates a tree without data from the result of :meth:`get_node_layout`.
+
+        Parameters
+        ----------
+        nodes
+            name, level and full name of the parent of all nodes below the root, parents before their children
+        level_keys_full_name
+            full names of the nodes of each level
+
+        Returns
+        -------
+        cls
+
+        """
+        root = DataNode()
+        c = cls(root)
+        for name, level, parent_full_name in nodes:
+            parent = c.nodes[parent_full_name] if parent_full_name else root
+            parent[name] = DataNode(name=name, level=level, parent=parent)
+        for level, keys in level_keys_full_name.items():
+            c.level_keys_full_name[level] = list(keys)
+        return c
+
+    @classmethod
+    def from_transform(cls, tree: "DataTree", transform: str = "log2",
+                       should_aggregate_technical_replicates: bool = False):
+        """
+        Creates a tree with the nodes of tree, whose data is the transformed data of the samples of tree. The matrix
+        of tree is shared and only the columns that are used are transformed, so the new tree needs almost no memory.
+        This gives the same data as creating a tree from the transformed data with :meth:`from_analysis_design`.
+
+        Parameters
+        ----------
+        tree
+            tree containing the untransformed data
+        transform
+            one of transforms
+        should_aggregate_technical_replicates
+            If True the technical replicates are averaged after the transformation. The means are stored in the new
+            tree
+
+        Returns
+        -------
+        cls
+
+        See Also
+        --------
+        materialize: computes and stores all transformed values
+
+        """
+        if transform not in DataTree.transforms:
+            raise ValueError(f"Invalid transform: {transform}")
+        c = cls.from_node_layout(tree.get_node_layout(), tree.level_keys_full_name)
+        c.transform = transform
+        if tree.index is not None:
+            # only the samples are taken, technical replicates are aggregated from the transformed data
+            samples = [node.full_name for node in tree.root.get_data_nodes(go_max_depth=True)]
+            if tree.source_values is None:
+                c.source_values = tree.values
+                c.column_positions = {name: tree.column_positions[name] for name in samples}
+            else:
+                c.source_values = tree.get_values(tree.get_column_indexer(samples))
+                c.column_positions = {name: i for i, name in enumerate(samples)}
+            c.index = tree.index
+            if should_aggregate_technical_replicates:
+                c.aggregate_technical_replicates()
+        return c
+
+    def materialize(self):
+        """
+        Computes all transformed values of a tree created with :meth:`from_transform` and stores them in values,
+        which is faster if all data of the tree is used repeatedly.
+
+        """
+        if self.source_values is None:
+            return
+        columns = sorted(self.column_positions, key=self.column_positions.get)
+        values = self.get_values(self.get_column_indexer(columns))
+        self.source_values = None
+        self.values = values
+        self.column_positions = {name: i for i, name in enumerate(columns)}
+        self.detected = None
+
     def aggregate(
             self, key: Optional[str] = None,
             method: Union[None, str, Callable] = "mean",
@@ -302,21 +657,711 @@ class DataTree:
         elif isinstance(key_or_index, str):
             return self.root[key_or_index].groupby(method, go_max_depth, index)
         elif isinstance(key_or_index, int):
+            return self.get_result(
+                ("groupby_level", key_or_index, new_col_name, method, go_max_depth, DataTree.get_index_key(index)),
+                lambda: self.group_level(key_or_index, new_col_name, method, go_max_depth, index)
+            )
+        else:
+            raise ValueError(f"Invalid input for key: {key_or_index}, with type: {type(key_or_index)}")
+
+    def group_level(self, level: int, new_col_name: str = None, method: Union[None, str, Callable] = "mean",
+                    go_max_depth: bool = False, index=None) -> Union[pd.Series, pd.DataFrame]:
+        if method is None or (isinstance(method, str) and method in DataTree.segment_reductions):
+            data = self.reduce_level(level, method, go_max_depth, index)
+        else:
             data = {
                 child_name: self[child_name].aggregate(method, go_max_depth, index)
-                for child_name in self.level_keys_full_name[key_or_index]
+                for child_name in self.level_keys_full_name[level]
             }
             data = pd.concat(data, axis=1)
-            if new_col_name is None:
-                new_col_names = ["level_0"]
+        if new_col_name is None:
+            new_col_names = ["level_0"]
+        else:
+            new_col_names = [new_col_name]
+        if method is None:
+            new_col_names.append("level_1")
+        data.columns = data.columns.set_names(new_col_names)
+        return data
+
+    def get_level_groups(self, level: int, go_max_depth: bool = False) -> Dict[str, List[str]]:
+        """
+        Parameters
+        ----------
+        level
+            level of the groups
+        go_max_depth
+            Will be passed to get_data_nodes.
+
+        Returns
+        -------
+        Dict[str, List[str]]
+            maps the full names of the nodes of the level to the columns that are aggregated
+
+        """
+        groups = {full_name: [node.full_name for node in self[full_name].get_data_nodes(go_max_depth)]
+                  for full_name in self.level_keys_full_name[level]}
+        if not groups or not all(groups.values()):
+            raise ValueError(f"Not all groups of level {level} contain data")
+        return groups
+
+    def reduce_level(self, level: int, method: Optional[str] = "mean", go_max_depth: bool = False,
+                     index=None) -> pd.DataFrame:
+        """
+        Groups the data by the nodes of a level in one step. The columns of all groups are selected at once and
+        each group is reduced as consecutive segment of columns with :meth:`reduce_segments`.
+
+        Parameters
+        ----------
+        level
+            level of the groups
+        method
+            If None no aggregation will be applied. Otherwise one of segment_reductions.
+        go_max_depth
+            Will be passed to get_data_nodes.
+        index
+            Index to subset the data with. If None no index is applied
+
+        Returns
+        -------
+        pd.DataFrame
+            Data with a column per group, or with a MultiIndex of group and node full name if method is None
+
+        """
+        groups = self.get_level_groups(level, go_max_depth)
+        if method == "detected":
+            return self.count_detected_groups(groups, index)
+        data = self.get_frame([name for column_names in groups.values() for name in column_names], index)
+        if method is None:
+            columns = pd.MultiIndex.from_tuples([(group, name) for group, column_names in groups.items()
+                                                 for name in column_names])
+            return pd.DataFrame(data.to_numpy(), index=data.index, columns=columns)
+        starts = np.cumsum([0] + [len(column_names) for column_names in groups.values()])[:-1]
+        return pd.DataFrame(DataTree.reduce_segments(data.to_numpy(), starts, method), index=data.index,
+                            columns=list(groups))
+
+    @staticmethod
+    def reduce_segments(values: np.ndarray, starts: Iterable[int], method: str) -> np.ndarray:
+        """
+        Reduces consecutive segments of columns, skipping missing values. Sums and counts of all segments are
+        calculated with a single np.add.reduceat, medians are calculated per segment.
+
+        Parameters
+        ----------
+        values
+            matrix containing the columns of all segments
+        starts
+            position of the first column of each segment
+        method
+            one of segment_reductions
+
+        Returns
+        -------
+        np.ndarray
+            matrix with a column per segment
+
+        """
+        if method == "median":
+            starts = np.asarray(starts, dtype=np.intp)
+            ends = np.append(starts[1:], values.shape[1])
+            with warnings.catch_warnings():
+                # rows without any values give nan
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                return np.column_stack([np.nanmedian(values[:, start:end], axis=1)
+                                        for start, end in zip(starts, ends)])
+        return DataTree.finish_partial_reductions(DataTree.get_partial_reductions(values, starts, method), method)
+
+    @staticmethod
+    def get_partial_reductions(values: np.ndarray, starts: Iterable[int], method: str) -> Tuple[np.ndarray, ...]:
+        """
+        Calculates the sums and counts needed for a decomposable reduction of consecutive segments of columns.
+        The partial reductions of multiple segments can be combined by adding them.
+
+        Parameters
+        ----------
+        values
+            matrix containing the columns of all segments
+        starts
+            position of the first column of each segment
+        method
+            one of decomposable_reductions
+
+        Returns
+        -------
+        Tuple[np.ndarray, ...]
+            matrices with a column per segment
+
+        """
+        starts = np.asarray(starts, dtype=np.intp)
+        if len(starts) == values.shape[1]:
+            # each segment is a single column
+            def reduce(x, dtype=None):
+                return x.astype(dtype) if dtype is not None else x
+        else:
+            def reduce(x, dtype=None):
+                return np.add.reduceat(x, starts, axis=1, dtype=dtype)
+        if method == "detected":
+            with np.errstate(invalid="ignore"):
+                return reduce(values > 0, np.int64),
+        missing = np.isnan(values)
+        counts = reduce(~missing, np.int64)
+        if method == "count":
+            return counts,
+        sums = reduce(np.where(missing, 0, values))
+        if method == "sum":
+            return sums,
+        if method == "mean":
+            return sums, counts
+        raise ValueError(f"Invalid segment reduction: {method}")
+
+    @staticmethod
+    def finish_partial_reductions(partials: Tuple[np.ndarray, ...], method: str) -> np.ndarray:
+        if method == "mean":
+            sums, counts = partials
+            with np.errstate(divide="ignore", invalid="ignore"):
+                # rows without any values give nan
+                return sums / counts
+        return partials[0]
+
+    def groupby_levels(self, levels: Iterable[int], method: Union[None, str, Callable] = "mean",
+                       go_max_depth: bool = False, index=None) -> Dict[int, pd.DataFrame]:
+        """
+        Groups the data by the nodes of multiple levels in one pass. Decomposable reductions are calculated for the
+        deepest level from the data, each higher level is combined from the partial reductions of the level below.
+        The results are stored like the results of :meth:`groupby` and only the levels without a stored result are
+        calculated.
+
+        Parameters
+        ----------
+        levels
+            levels of the groups
+        method
+            Will be passed to groupby. Only decomposable_reductions are combined across levels.
+        go_max_depth
+            Will be passed to groupby.
+        index
+            Will be passed to groupby.
+
+        Returns
+        -------
+        Dict[int, pd.DataFrame]
+            Result of :meth:`groupby` for each level
+
+        """
+        levels = sorted(set(levels), reverse=True)
+        if method not in DataTree.decomposable_reductions:
+            return {level: self.groupby(level, method=method, go_max_depth=go_max_depth, index=index)
+                    for level in levels}
+        results = {}
+        partials, partial_groups, row_index = None, None, None
+        for level in levels:
+            key = ("groupby_level", level, None, method, go_max_depth, DataTree.get_index_key(index))
+            stored = self.get_stored_result(key)
+            if stored is not None:
+                results[level] = stored
+                # the next level is calculated from the data
+                partials, partial_groups = None, None
+                continue
+            groups = self.get_level_groups(level, go_max_depth)
+            composition = self.get_group_composition(level, groups, partial_groups)
+            if composition is None and method == "detected":
+                data = self.count_detected_groups(groups, index)
+                partials, row_index = (data.to_numpy(),), data.index
+            elif composition is None:
+                data = self.get_frame([name for column_names in groups.values() for name in column_names], index)
+                starts = np.cumsum([0] + [len(column_names) for column_names in groups.values()])[:-1]
+                partials = DataTree.get_partial_reductions(data.to_numpy(), starts, method)
+                row_index = data.index
             else:
-                new_col_names = [new_col_name]
-            if method is None:
-                new_col_names.append("level_1")
-            data.columns = data.columns.set_names(new_col_names)
+                order = [position for positions in composition for position in positions]
+                starts = np.cumsum([0] + [len(positions) for positions in composition])[:-1]
+                if order != list(range(len(order))):
+                    partials = tuple(partial[:, order] for partial in partials)
+                partials = tuple(np.add.reduceat(partial, starts, axis=1) for partial in partials)
+            partial_groups = groups
+            data = pd.DataFrame(DataTree.finish_partial_reductions(partials, method), index=row_index,
+                                columns=pd.Index(list(groups), name="level_0"))
+            results[level] = self.get_result(key, lambda: data)
+        return results
+
+    def get_group_composition(self, level: int, groups: Dict[str, List[str]],
+                              lower_groups: Optional[Dict[str, List[str]]]) -> Optional[List[List[int]]]:
+        """
+        Parameters
+        ----------
+        level
+            level of the groups
+        groups
+            groups of the level, see :meth:`get_level_groups`
+        lower_groups
+            groups of a lower level
+
+        Returns
+        -------
+        Optional[List[List[int]]]
+            For each group the positions of the lower groups below it or None if the groups do not consist of exactly
+            the columns of the lower groups
+
+        """
+        if lower_groups is None:
+            return None
+        composition = {group: [] for group in groups}
+        for position, lower_group in enumerate(lower_groups):
+            node = self[lower_group]
+            while node.parent is not None and node.level > level:
+                node = node.parent
+            if node.full_name not in composition:
+                return None
+            composition[node.full_name].append(position)
+        lower_columns = list(lower_groups.values())
+        for group, positions in composition.items():
+            if sorted(groups[group]) != sorted(name for position in positions for name in lower_columns[position]):
+                return None
+        return list(composition.values())
+
+    @staticmethod
+    def get_index_key(index) -> Hashable:
+        if index is None or not is_list_like(index):
+            return index
+        return tuple(index)
+
+    @staticmethod
+    def make_read_only(data: Union[pd.Series, pd.DataFrame]) -> Union[pd.Series, pd.DataFrame]:
+        """
+        Prevents changing the values of data inplace. Data with multiple dtypes is copied instead.
+
+        """
+        if isinstance(data, pd.Series) and isinstance(data.values, np.ndarray):
+            data.values.flags.writeable = False
             return data
+        if isinstance(data, pd.DataFrame) and len(set(data.dtypes)) <= 1:
+            values = data.to_numpy()
+            if not values.flags.writeable:
+                # data of a read only matrix, eg of values
+                return data
+            values.flags.writeable = False
+            return pd.DataFrame(values, index=data.index, columns=data.columns)
+        return data.copy()
+
+    def get_result(self, key: tuple, compute: Callable[[], Union[pd.Series, pd.DataFrame]]
+                   ) -> Union[pd.Series, pd.DataFrame]:
+        """
+        Returns the stored result of key or stores the result of compute. The results are read only and are removed
+        when the data of the tree changes. If more than max_cached_results results or max_cached_bytes bytes of
+        results are stored, the least recently used results are removed.
+
+        Parameters
+        ----------
+        key
+            hashable description of the result, e.g. (method name, node full name, method, go_max_depth, index)
+        compute
+            function calculating the result
+
+        Returns
+        -------
+        Union[pd.Series, pd.DataFrame]
+            The result
+
+        """
+        try:
+            result = self.results.get(key)
+        except TypeError:
+            # unhashable arguments are not cached
+            return DataTree.make_read_only(compute())
+        if result is not None:
+            self.results.move_to_end(key)
+            return result
+        result = DataTree.make_read_only(compute())
+        size = self.get_result_size(result)
+        if self.max_cached_results != 0 and (self.max_cached_bytes is None or size <= self.max_cached_bytes):
+            self.results[key] = result
+            self.result_sizes[key] = size
+            while (self.max_cached_results is not None and len(self.results) > self.max_cached_results) or (
+                    self.max_cached_bytes is not None and sum(self.result_sizes.values()) > self.max_cached_bytes):
+                removed_key, _ = self.results.popitem(last=False)
+                self.result_sizes.pop(removed_key)
+        return result
+
+    def get_stored_result(self, key: tuple) -> Union[None, pd.Series, pd.DataFrame]:
+        """
+        Parameters
+        ----------
+        key
+            hashable description of the result, see :meth:`get_result`
+
+        Returns
+        -------
+        Union[None, pd.Series, pd.DataFrame]
+            The stored result or None if it is not stored
+
+        """
+        try:
+            result = self.results.get(key)
+        except TypeError:
+            return None
+        if result is not None:
+            self.results.move_to_end(key)
+        return result
+
+    def get_result_size(self, result: Union[pd.Series, pd.DataFrame]) -> int:
+        """
+        Parameters
+        ----------
+        result
+            result of aggregate or groupby
+
+        Returns
+        -------
+        int
+            bytes of the data of result, 0 if it is a view of the matrix of the tree
+
+        """
+        values = result.values
+        for matrix in (self.values, self.source_values):
+            if matrix is not None and np.may_share_memory(values, matrix):
+                return 0
+        return values.nbytes
+
+    def clear_results(self):
+        """
+        Removes all stored results, see :meth:`get_result`.
+
+        """
+        self.results.clear()
+        self.result_sizes.clear()
+
+    def get_column_indexer(self, column_names: List[str]) -> Union[slice, List[int]]:
+        """
+        Parameters
+        ----------
+        column_names
+            full names of nodes containing data
+
+        Returns
+        -------
+        Union[slice, List[int]]
+            The positions of the columns in values. Consecutive columns are returned as slice, which gives a view
+
+        """
+        positions = [self.column_positions[name] for name in column_names]
+        if positions and positions == list(range(positions[0], positions[0] + len(positions))):
+            return slice(positions[0], positions[0] + len(positions))
+        return positions
+
+    def get_row_positions(self, index) -> Optional[np.ndarray]:
+        """
+        Resolves the labels of an index to positions in values. The positions are stored per index, so repeated
+        queries with the same index do not look up the labels again.
+
+        Parameters
+        ----------
+        index
+            label or list of labels
+
+        Returns
+        -------
+        Optional[np.ndarray]
+            The positions of the labels. None if index is None or the labels can not be resolved to unique positions,
+            e.g. because some are missing. Then the data needs to be subset with .loc
+
+        """
+        if index is None:
+            return None
+        key = DataTree.get_index_key(index)
+        try:
+            if key in self.row_positions:
+                self.row_positions.move_to_end(key)
+                return self.row_positions[key]
+        except TypeError:
+            # unhashable indices are not stored
+            return self.resolve_row_positions(index)
+        positions = self.resolve_row_positions(index)
+        if self.max_cached_results != 0:
+            self.row_positions[key] = positions
+            while self.max_cached_results is not None and len(self.row_positions) > self.max_cached_results:
+                self.row_positions.popitem(last=False)
+        return positions
+
+    def resolve_row_positions(self, index) -> Optional[np.ndarray]:
+        labels = pd.Index(index if is_list_like(index) else [index])
+        if labels.is_boolean() or not self.index.is_unique:
+            return None
+        positions = self.index.get_indexer(labels)
+        if (positions < 0).any():
+            return None
+        positions.flags.writeable = False
+        return positions
+
+    def get_width(self) -> int:
+        """
+        Returns
+        -------
+        int
+            number of column positions, including positions of source_values
+
+        """
+        width = self.values.shape[1] if self.values is not None else 0
+        if self.source_values is not None:
+            width += self.source_values.shape[1]
+        return width
+
+    @staticmethod
+    def take(values: np.ndarray, row_positions: Optional[np.ndarray],
+             column_indexer: Union[slice, List[int], np.ndarray]) -> np.ndarray:
+        if row_positions is None:
+            return values[:, column_indexer]
+        if isinstance(column_indexer, slice):
+            return values[row_positions, column_indexer]
+        return values[np.ix_(row_positions, column_indexer)]
+
+    def get_values(self, column_indexer: Union[slice, List[int]], row_positions: Optional[np.ndarray] = None
+                   ) -> np.ndarray:
+        """
+        Parameters
+        ----------
+        column_indexer
+            positions of the columns, see :meth:`get_column_indexer`
+        row_positions
+            positions of the rows, if None all rows are used
+
+        Returns
+        -------
+        np.ndarray
+            The read only values of the columns. Columns of source_values are transformed
+
+        """
+        if self.source_values is None:
+            values = DataTree.take(self.values, row_positions, column_indexer)
+            values.flags.writeable = False
+            return values
+        positions = np.arange(self.get_width())[column_indexer]
+        n_source = self.source_values.shape[1]
+        is_source = positions < n_source
+        if is_source.all():
+            column_indexer = positions
+            if len(positions) and (np.diff(positions) == 1).all():
+                column_indexer = slice(positions[0], positions[-1] + 1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                values = DataTree.transforms[self.transform](
+                    DataTree.take(self.source_values, row_positions, column_indexer))
         else:
-            raise ValueError(f"Invalid input for key: {key_or_index}, with type: {type(key_or_index)}")
+            n_rows = len(self.index) if row_positions is None else len(row_positions)
+            values = np.empty((n_rows, len(positions)))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                values[:, is_source] = DataTree.transforms[self.transform](
+                    DataTree.take(self.source_values, row_positions, positions[is_source]))
+            values[:, ~is_source] = DataTree.take(self.values, row_positions, positions[~is_source] - n_source)
+        values.flags.writeable = False
+        return values
+
+    def get_frame(self, column_names: List[str], index: Optional = None) -> pd.DataFrame:
+        """
+        Parameters
+        ----------
+        column_names
+            full names of nodes containing data
+        index
+            Index to subset the data with. If None no index is applied
+
+        Returns
+        -------
+        pd.DataFrame
+            The columns of values. Without index the data is a view of values if the columns are consecutive,
+            otherwise only the selected rows are copied
+
+        """
+        column_indexer = self.get_column_indexer(column_names)
+        positions = self.get_row_positions(index)
+        if positions is not None:
+            return pd.DataFrame(self.get_values(column_indexer, positions), index=self.index[positions],
+                                columns=column_names)
+        data = pd.DataFrame(self.get_values(column_indexer), index=self.index, columns=column_names)
+        if index is not None:
+            data = data.loc[index if is_list_like(index) else [index]]
+        return data
+
+    def get_detected_bits(self) -> np.ndarray:
+        if self.detected is None:
+            with np.errstate(invalid="ignore"):
+                detected = np.packbits(self.get_values(slice(0, self.get_width())) > 0, axis=1)
+            detected.flags.writeable = False
+            self.detected = detected
+        return self.detected
+
+    def get_column_mask(self, column_names: List[str]) -> Tuple[slice, np.ndarray]:
+        """
+        Parameters
+        ----------
+        column_names
+            full names of nodes containing data
+
+        Returns
+        -------
+        Tuple[slice, np.ndarray]
+            The bytes of :attr:`detected` containing the columns and the packed mask selecting them in these bytes
+
+        """
+        positions = np.array([self.column_positions[name] for name in column_names], dtype=np.intp)
+        mask = np.zeros(self.get_width(), dtype=bool)
+        mask[positions] = True
+        start, stop = positions.min() // 8, positions.max() // 8 + 1
+        return slice(start, stop), np.packbits(mask)[start:stop]
+
+    def count_detected(self, column_names: List[str], index: Optional = None, name: str = "") -> pd.Series:
+        """
+        Counts the values above 0 of each row by counting the set bits of :attr:`detected`.
+
+        Parameters
+        ----------
+        column_names
+            full names of the nodes that should be counted
+        index
+            Index to subset the data with. If None no index is applied
+        name
+            name of the counts
+
+        Returns
+        -------
+        pd.Series
+            number of detected values per row
+
+        """
+        byte_slice, mask = self.get_column_mask(column_names)
+        positions = self.get_row_positions(index)
+        bits = self.get_detected_bits()[:, byte_slice]
+        if positions is not None:
+            bits = bits[positions]
+        counts = pd.Series(DataTree.popcount[bits & mask].sum(axis=1, dtype=np.int64), name=name,
+                           index=self.index if positions is None else self.index[positions])
+        if index is not None and positions is None:
+            counts = counts.loc[index if is_list_like(index) else [index]]
+        return counts
+
+    def count_detected_groups(self, groups: Dict[str, List[str]], index: Optional = None) -> pd.DataFrame:
+        data = {group: self.count_detected(column_names, index, group) for group, column_names in groups.items()}
+        return pd.concat(data, axis=1)
+
+    def get_detected(self, column_names: List[str], index: Optional = None) -> pd.DataFrame:
+        """
+        Parameters
+        ----------
+        column_names
+            full names of nodes containing data
+        index
+            Index to subset the data with. If None no index is applied
+
+        Returns
+        -------
+        pd.DataFrame
+            whether the values of the columns are above 0
+
+        """
+        byte_slice, _ = self.get_column_mask(column_names)
+        row_positions = self.get_row_positions(index)
+        bits = self.get_detected_bits()[:, byte_slice]
+        if row_positions is not None:
+            bits = bits[row_positions]
+        bits = np.unpackbits(bits, axis=1)
+        positions = [self.column_positions[name] - byte_slice.start * 8 for name in column_names]
+        data = pd.DataFrame(bits[:, positions].astype(bool), columns=column_names,
+                            index=self.index if row_positions is None else self.index[row_positions])
+        if index is not None and row_positions is None:
+            data = data.loc[index if is_list_like(index) else [index]]
+        return data
+
+    def get_node_data(self, node: DataNode) -> Optional[pd.Series]:
+        position = self.column_positions.get(node.full_name)
+        if position is None:
+            return None
+        return pd.Series(self.get_values(slice(position, position + 1))[:, 0], index=self.index, name=node.full_name)
+
+    def set_node_data(self, node: DataNode, data: Optional[pd.Series]):
+        if data is None:
+            self.column_positions.pop(node.full_name, None)
+            self.detected = None
+            self.clear_results()
+        else:
+            self.set_data(data.rename(node.full_name).to_frame())
+
+    def set_data(self, data: pd.DataFrame):
+        """
+        Stores the columns of data in values. Existing columns with the same name are replaced. The columns of
+        source_values are kept if the index of data is the same, otherwise all values are materialized first.
+
+        Parameters
+        ----------
+        data
+            Data with the full names of DataNodes as column names
+
+        """
+        if self.source_values is not None and not data.index.equals(self.index):
+            self.materialize()
+        kept = [name for name in self.column_positions if name not in data.columns]
+        offset, source_positions = 0, {}
+        if self.source_values is not None:
+            offset = self.source_values.shape[1]
+            source_positions = {name: self.column_positions[name] for name in kept
+                                if self.column_positions[name] < offset}
+            kept = [name for name in kept if name not in source_positions]
+        if self.index is not None and kept and not data.index.equals(self.index):
+            # align the data on the union of both indices
+            data = pd.concat([self.get_frame(kept), data], axis=1)
+            kept = []
+        # numeric data keeps its common dtype, e.g. integer counts stay integers, all other data is converted to float
+        dtypes = list(data.dtypes)
+        dtype = float
+        if dtypes and all(isinstance(d, np.dtype) and d.kind in "biuf" for d in dtypes):
+            dtype = np.result_type(*dtypes)
+        values = data.to_numpy(dtype=dtype)
+        if kept:
+            values = np.hstack([self.get_values(self.get_column_indexer(kept)), values])
+        # the matrix is shared with the returned data, it can only be changed by replacing it
+        values.flags.writeable = False
+        self.values = values
+        if self.index is None or not data.index.equals(self.index):
+            self.row_positions.clear()
+        self.index = data.index
+        self.column_positions = {name: offset + i for i, name in enumerate(kept + list(data.columns))}
+        self.column_positions.update(source_positions)
+        self.detected = None
+        self.clear_results()
+
+    def aggregate_columns(self, column_names: List[str], method: Union[None, str, Callable] = "mean",
+                          index: Optional = None, name: str = "") -> Union[pd.Series, pd.DataFrame]:
+        """
+        Aggregates columns of values. Without index and method the data is a view of values. Common methods are
+        calculated on the matrix directly, all other methods are passed to pd.aggregate.
+
+        Parameters
+        ----------
+        column_names
+            full names of the nodes that should be aggregated
+        method
+            If None no aggregation will be applied. Otherwise needs to be accepted by pd.aggregate.
+        index
+            Index to subset the data with. If None no index is applied
+        name
+            name of the aggregated data
+
+        Returns
+        -------
+        Union[pd.Series, pd.DataFrame]
+            Result of the aggregation
+
+        """
+        if not column_names:
+            raise ValueError(f"No data below node {name}")
+        if method == "detected":
+            return self.count_detected(column_names, index, name)
+        data = self.get_frame(column_names, index)
+        if method is None:
+            return data
+        if isinstance(method, str) and method in DataTree.reductions:
+            with warnings.catch_warnings():
+                # rows without any values give nan
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                values = DataTree.reductions[method](data.to_numpy())
+            return pd.Series(values, index=data.index, name=name)
+        return data.aggregate(method, axis=1).rename(name, axis=1)
 
     def add_data(self, data: pd.DataFrame):
         """
@@ -328,24 +1373,37 @@ class DataTree:
             the full names of the DataNode.
 
         """
+        # the columns are stored in the order of the tree, so the columns below a node are consecutive
+        column_names = []
         queue = deque([self.root])
         while queue:
             parent = queue.popleft()
             for child in parent:
                 queue += [child]
                 if child.full_name in data.columns:
-                    child.data = data.loc[:, child.full_name]
+                    column_names.append(child.full_name)
+        self.set_data(data.loc[:, column_names])
 
     def aggregate_technical_replicates(self):
         """
         Aggregates the deepest level to one level above by using aggregate
 
         """
+        groups = {}
         queue = deque([self.root])
         while queue:
             parent = queue.popleft()
             for child in parent:
                 if child.children:
                     queue += [child]
-                else:
-                    parent.data = parent.aggregate()
+                elif not parent.has_data and parent.full_name not in groups:
+                    groups[parent.full_name] = [node.full_name for node in parent.get_data_nodes()]
+        if not groups:
+            return
+        if not all(groups.values()):
+            raise ValueError("Not all technical replicates contain data")
+        # the means of all nodes are calculated and added at once
+        values = self.get_frame([name for column_names in groups.values() for name in column_names]).to_numpy()
+        starts = np.cumsum([0] + [len(column_names) for column_names in groups.values()])[:-1]
+        self.set_data(pd.DataFrame(DataTree.reduce_segments(values, starts, "mean"), index=self.index,
+                                   columns=list(groups)))
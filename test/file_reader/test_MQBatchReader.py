@@ -0,0 +1,60 @@
+import os
+import logging
+import pandas as pd
+import pytest
+
+from .test_MQReader import write_protein_groups
+
+
+@pytest.fixture
+def run_dirs(tmp_path):
+    run_dirs = [str(tmp_path / "run1"), str(tmp_path / "run2")]
+    write_protein_groups(run_dirs[0])
+    write_protein_groups(run_dirs[1], n_proteins=25)
+    mapping = pd.DataFrame({"old name": ["A_1_1", "A_1_2", "B_1_1", "B_1_2"],
+                            "new name": ["C_1_1", "C_1_2", "D_1_1", "D_1_2"]})
+    mapping.to_csv(os.path.join(run_dirs[1], "sample_mapping.txt"), sep="\t", index=False)
+    return run_dirs
+
+
+def test_batch_reader(tmp_path, run_dirs):
+    from mspypeline import MQReader, MQBatchReader, MaxQuantPlotter
+    reader = MQBatchReader(str(tmp_path), {"txt_dirs": run_dirs, "use_cache": False}, loglevel=logging.WARNING)
+    assert sorted(reader.reader_config["analysis_design"]) == ["A", "B", "C", "D"]
+    assert reader.reader_config["levels"] == 3
+    df = reader.full_data["proteinGroups"]
+    runs = [MQReader(run_dir, {"use_cache": False}, loglevel=logging.WARNING).full_data["proteinGroups"]
+            for run_dir in run_dirs]
+    assert set(df.index) == set(runs[0].index) | set(runs[1].index)
+    assert df.index.is_unique
+    for run, sample in zip(runs, ["A_1_1", "C_1_1"]):
+        col = "LFQ intensity " + sample
+        assert df.loc[run.index, col].equals(run[col])
+        assert (df.loc[df.index.difference(run.index), col] == 0).all()
+    assert df["Protein name"].notna().all()
+    assert not reader.full_data["contaminants"].empty
+
+    plotter = MaxQuantPlotter.from_file_reader(reader, loglevel=logging.WARNING)
+    assert plotter.all_tree_dict["lfq_log2"].aggregate(method=None, go_max_depth=True).shape == (df.shape[0], 8)
+    # the log2 intensities are computed once
+    assert plotter.all_intensities_dict["lfq_log2"] is plotter.all_intensities_dict["lfq_log2"]
+
+
+def test_batch_reader_duplicated_samples(tmp_path, run_dirs):
+    from mspypeline import MQBatchReader, MissingFilesException
+    with pytest.raises(ValueError):
+        MQBatchReader(str(tmp_path), {"txt_dirs": [run_dirs[0], run_dirs[0]]}, loglevel=logging.WARNING)
+    with pytest.raises(MissingFilesException):
+        MQBatchReader(str(tmp_path), {}, loglevel=logging.WARNING)
+
+
+def test_batch_reader_missing_run(tmp_path, run_dirs):
+    from mspypeline import MQBatchReader, MissingFilesException
+    missing_dir = str(tmp_path / "missing")
+    os.makedirs(os.path.join(missing_dir, "txt"))
+    reader = MQBatchReader(str(tmp_path), {"txt_dirs": [run_dirs[0], missing_dir, run_dirs[1]], "use_cache": False},
+                           loglevel=logging.WARNING)
+    assert len(reader.readers) == 2
+    assert sorted(reader.reader_config["analysis_design"]) == ["A", "B", "C", "D"]
+    with pytest.raises(MissingFilesException):
+        MQBatchReader(str(tmp_path), {"txt_dirs": [missing_dir]}, loglevel=logging.WARNING)
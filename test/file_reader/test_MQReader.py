@@ -0,0 +1,393 @@
+import os
+import logging
+import pandas as pd
+import numpy as np
+import pytest
+
+
+def write_protein_groups(start_dir, n_proteins=20):
+    samples = ["A_1_1", "A_1_2", "B_1_1", "B_1_2"]
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame({
+        "Protein IDs": [f"P{i}" for i in range(n_proteins)],
+        "Protein names": [f"Protein {i}" for i in range(n_proteins)],
+        "Gene names": [f"GENE{i % (n_proteins - 3)}" for i in range(n_proteins)],
+        "Fasta headers": [f"sp|P{i}|PROT{i}_HUMAN Protein {i} OS=Homo sapiens GN=GENE{i % (n_proteins - 3)} PE=1"
+                          for i in range(n_proteins)],
+        "Only identified by site": [""] * n_proteins,
+        "Reverse": ["+" if i == 0 else "" for i in range(n_proteins)],
+        "Potential contaminant": ["+" if i == 1 else "" for i in range(n_proteins)],
+    })
+    # protein groups with multiple fasta entries
+    df.loc[2, "Fasta headers"] = df.loc[2, "Fasta headers"] + ";sp|Q2|OTHER_HUMAN Other OS=Homo sapiens GN=OTHER PE=1"
+    df.loc[3, "Fasta headers"] = ";" + df.loc[3, "Fasta headers"]
+    for prefix in ("Intensity ", "LFQ intensity ", "iBAQ ", "Peptides ", "Sequence coverage "):
+        for sample in samples:
+            df[prefix + sample] = rng.randint(0, 1000, n_proteins).astype(float)
+    txt_dir = os.path.join(start_dir, "txt")
+    os.makedirs(txt_dir, exist_ok=True)
+    df.to_csv(os.path.join(txt_dir, "proteinGroups.txt"), sep="\t", index=False)
+    return df
+
+
+@pytest.fixture
+def reader_dir(tmp_path):
+    write_protein_groups(str(tmp_path))
+    return str(tmp_path)
+
+
+def test_protein_groups_column_selection(reader_dir):
+    from mspypeline import MQReader
+    reader = MQReader(reader_dir, {"use_cache": False}, loglevel=logging.WARNING)
+    df = reader.full_data["proteinGroups"]
+    assert not any(col.startswith(("Peptides ", "Sequence coverage ", "Protein IDs")) for col in df.columns)
+    assert all(f"{prefix}A_1_1" in df.columns for prefix in ("Intensity ", "LFQ intensity ", "iBAQ "))
+    reader = MQReader(reader_dir, {"use_cache": False, "load_all_columns": True}, loglevel=logging.WARNING)
+    df_all = reader.full_data["proteinGroups"]
+    assert "Peptides A_1_1" in df_all.columns
+    assert df_all.loc[:, df.columns].equals(df)
+
+
+def test_protein_groups_single_parse(reader_dir, monkeypatch):
+    from mspypeline import MQReader
+    reader = MQReader(reader_dir, {"use_cache": False}, loglevel=logging.WARNING)
+    n_reads = []
+    read_csv = pd.read_csv
+
+    def counting_read_csv(*args, **kwargs):
+        n_reads.append(args[0])
+        return read_csv(*args, **kwargs)
+    monkeypatch.setattr(pd, "read_csv", counting_read_csv)
+    df = reader.full_data["proteinGroups"]
+    assert "contaminants" in reader.full_data
+    contaminants = reader.full_data["contaminants"]
+    assert len(n_reads) == 1
+    assert set(contaminants["Protein names"]) == {"Protein 0", "Protein 1"}
+    assert not set(contaminants["Protein names"]) & set(df["Protein names"])
+
+
+
+def test_protein_groups_single_parse_prefetch(reader_dir, monkeypatch):
+    from mspypeline import MQReader
+    write_evidence(reader_dir)
+    reader = MQReader(reader_dir, {}, loglevel=logging.WARNING)
+    n_reads = []
+    read_txt = reader.read_txt
+
+    def counting_read_txt(file_name, *args, **kwargs):
+        n_reads.append(file_name)
+        return read_txt(file_name, *args, **kwargs)
+    monkeypatch.setattr(reader, "read_txt", counting_read_txt)
+    futures = reader.full_data.prefetch(["proteinGroups", "contaminants", "evidence"])
+    for future in futures.values():
+        future.result()
+    assert n_reads.count(MQReader.proteins_txt) == 1
+    assert reader.full_data["proteinGroups"] is not None and reader.full_data["contaminants"] is not None
+    assert n_reads.count(MQReader.proteins_txt) == 1
+
+
+def test_cache_settings(reader_dir, monkeypatch):
+    from mspypeline import MQReader
+    reader = MQReader(reader_dir, {"use_cache": True}, loglevel=logging.WARNING)
+    df = reader.full_data["proteinGroups"]
+    # settings that do not change the preprocessed data keep the cache valid
+    reader = MQReader(reader_dir, {"use_cache": True, "memory_limit": 10 ** 9, "prefetch_workers": 1, "chunksize": 100},
+                      loglevel=logging.WARNING)
+    n_reads = []
+    monkeypatch.setattr(reader, "read_txt", lambda file_name, *args, **kwargs: n_reads.append(file_name))
+    assert reader.full_data["proteinGroups"].equals(df)
+    assert not n_reads
+    reader = MQReader(reader_dir, {"use_cache": True, "load_all_columns": True}, loglevel=logging.WARNING)
+    assert "Peptides A_1_1" in reader.full_data["proteinGroups"].columns
+
+
+def write_evidence(start_dir, n_rows=500):
+    rng = np.random.RandomState(1)
+    df = pd.DataFrame({
+        "Experiment": rng.choice(["A_1_1", "A_1_2", "B_1_1", "B_1_2"], n_rows),
+        "m/z": rng.uniform(300, 1500, n_rows),
+        "Charge": rng.randint(1, 5, n_rows),
+        "Missed cleavages": rng.randint(0, 3, n_rows),
+        "Retention time": rng.uniform(0, 140, n_rows),
+        "Retention length": rng.uniform(0, 2, n_rows),
+        "Reverse": rng.choice(["", "+"], n_rows, p=[0.9, 0.1]),
+        "Potential contaminant": rng.choice(["", "+"], n_rows, p=[0.9, 0.1]),
+    })
+    df.to_csv(os.path.join(start_dir, "txt", "evidence.txt"), sep="\t", index=False)
+    scans = pd.DataFrame({
+        "Raw file": np.repeat(["A_1_1", "B_1_1"], n_rows // 2),
+        "Retention time": np.tile(np.linspace(0, 140, n_rows // 2), 2),
+        "Total ion current": rng.uniform(0, 1e9, n_rows // 2 * 2),
+    })
+    scans.to_csv(os.path.join(start_dir, "txt", "msScans.txt"), sep="\t", index=False)
+    return df, scans
+
+
+def test_evidence_streaming(reader_dir):
+    from mspypeline import MQReader
+    from mspypeline.helpers.Aggregators import EvidenceAggregator
+    write_evidence(reader_dir)
+    reader = MQReader(reader_dir, {"use_cache": False, "chunksize": 37}, loglevel=logging.WARNING)
+    streamed = reader.full_data["evidence_summary"]
+    evidence = reader.full_data["evidence"]
+    in_memory = EvidenceAggregator.summarize(lambda: [evidence])
+    assert streamed.keys() == in_memory.keys()
+    for key in streamed:
+        pd.testing.assert_frame_equal(streamed[key], in_memory[key], check_dtype=False)
+    charge = evidence.groupby(["Charge", "Experiment"]).size().unstack()
+    assert np.array_equal(streamed["charge"].fillna(0).values, charge.fillna(0).values)
+    assert streamed["mz_hist"].drop(["left", "right"], axis=1).values.sum() == len(evidence)
+
+    trace = reader.full_data["msScans_trace"]
+    scans = reader.full_data["msScans"]
+    assert set(trace.index) == set(scans.index)
+    assert np.isclose(trace["Total ion current"].max(), scans["Total ion current"].max())
+
+
+def test_sum_duplicates(reader_dir):
+    from mspypeline import MQReader
+    df = write_protein_groups(reader_dir)
+    df = df.set_index(df["Gene names"], drop=False)
+    df.loc[df.index[5], "Protein names"] = np.nan
+    numeric_columns = df.select_dtypes("number").columns
+    expected = []
+    for _, group in df.groupby(level=0):
+        row = group.iloc[0].copy()
+        row[numeric_columns] = group[numeric_columns].sum()
+        expected.append(row)
+    expected = pd.DataFrame(expected).astype(df.dtypes)
+    result = MQReader.sum_duplicates(df)
+    pd.testing.assert_frame_equal(result, expected, check_names=False)
+    assert result.index.name == "Gene names"
+
+    reader = MQReader(reader_dir, {"use_cache": False}, loglevel=logging.WARNING)
+    protein_groups = reader.full_data["proteinGroups"]
+    assert protein_groups.index.is_unique
+    assert protein_groups.loc["GENE2", "Intensity A_1_1"] == df.loc["GENE2", "Intensity A_1_1"].sum()
+
+
+def test_fasta_header_parsing(reader_dir):
+    from mspypeline import MQReader
+    headers = pd.Series([
+        "sp|P1|ABC_HUMAN Protein ABC OS=Homo sapiens GN=abc PE=1",
+        ";;sp|P2|DEF_HUMAN GN=def1;sp|Q2|OTHER_HUMAN GN=OTHER",
+        "sp|P3|NOGENE_HUMAN Protein without gene",
+        "no pipe",
+    ])
+    fasta_col = headers.str.extract(MQReader.fasta_header_regex)
+    assert fasta_col["header"].tolist()[:2] == ["sp|P1|ABC_HUMAN Protein ABC OS=Homo sapiens GN=abc PE=1",
+                                                "sp|P2|DEF_HUMAN GN=def1"]
+    assert fasta_col["protein_id"].tolist()[:3] == ["P1", "P2", "P3"]
+    assert fasta_col["protein_name"].tolist()[:3] == ["ABC", "DEF", "NOGENE"]
+    assert fasta_col["gene_name"].tolist()[:2] == ["abc", "def1"]
+    assert fasta_col.iloc[2:, :].loc[:, "gene_name"].isna().all()
+    assert fasta_col.iloc[3, 1:].isna().all()
+
+    reader = MQReader(reader_dir, {"use_cache": False}, loglevel=logging.WARNING)
+    df = reader.full_data["proteinGroups"]
+    assert not df["Fasta headers"].str.contains(";").any()
+    assert df.loc["GENE3", "protein id"] == "P3"
+    assert df.loc["GENE3", "Protein name"] == "PROT3"
+
+
+def test_rename_df_columns(reader_dir):
+    from mspypeline import MQReader
+    mapping = pd.DataFrame({"old": ["A_1", "A_1_1", "B_1", "_1_2", "Q_1"],
+                            "new": ["C_2", "C_1_1", "D_1", "_2_2", "R_1"]})
+    mapping.to_csv(os.path.join(reader_dir, "sample_mapping.txt"), sep="\t", index=False)
+    reader = MQReader(reader_dir, {"use_cache": False}, loglevel=logging.WARNING)
+    # the longest matching name is replaced, for equal length the last one in the mapping
+    assert reader.rename_df_columns(["Intensity A_1_1", "Intensity A_1_2", "Intensity B_1_1", "Intensity C"]) == \
+        ["Intensity C_1_1", "Intensity A_2_2", "Intensity D_1_1", "Intensity C"]
+    assert reader.rename_df_columns(["Q_1 B_1 Q_1"]) == ["R_1 B_1 R_1"]
+
+    write_evidence(reader_dir)
+    evidence = reader.full_data["evidence"]
+    assert set(evidence["Experiment"]) == {"C_1_1", "A_2_2", "D_1_1", "B_2_2"}
+
+
+def test_dtypes(reader_dir):
+    from mspypeline import MQReader
+    from mspypeline.helpers.Aggregators import EvidenceAggregator
+    df, _ = write_evidence(reader_dir)
+    # every chunk contains different experiments and charges
+    df.sort_values(["Experiment", "Charge"]).to_csv(os.path.join(reader_dir, "txt", "evidence.txt"), sep="\t",
+                                                    index=False)
+    reader = MQReader(reader_dir, {"use_cache": False, "chunksize": 50}, loglevel=logging.WARNING)
+    evidence = reader.full_data["evidence"]
+    assert evidence["Experiment"].dtype.name == "category"
+    assert evidence["m/z"].dtype == np.float32
+    assert reader.full_data["msScans"].index.dtype.name == "category"
+    in_memory = EvidenceAggregator.summarize(lambda: [evidence])
+    streamed = reader.full_data["evidence_summary"]
+    for key in streamed:
+        pd.testing.assert_frame_equal(streamed[key], in_memory[key], check_dtype=False)
+
+    dtypes = {"evidence": {"m/z": "float64", "Experiment": None}, "msScans": None}
+    reader = MQReader(reader_dir, {"use_cache": False, "dtypes": dtypes}, loglevel=logging.WARNING)
+    evidence = reader.full_data["evidence"]
+    assert evidence["m/z"].dtype == np.float64
+    assert evidence["Experiment"].dtype == object
+    assert evidence["Retention time"].dtype == np.float32
+    assert reader.full_data["msScans"]["Retention time"].dtype == np.float64
+
+
+@pytest.mark.parametrize("file_ending", [".gz", ".bz2", ".zst"])
+def test_compressed_files(reader_dir, file_ending):
+    from mspypeline import MQReader
+    import gzip
+    import bz2
+    write_evidence(reader_dir)
+    expected = MQReader(reader_dir, {"use_cache": False}, loglevel=logging.WARNING)
+    if file_ending == ".gz":
+        compress = gzip.compress
+    elif file_ending == ".bz2":
+        compress = bz2.compress
+    else:
+        compress = pytest.importorskip("zstandard").ZstdCompressor().compress
+    txt_dir = os.path.join(reader_dir, "txt")
+    for file_name in os.listdir(txt_dir):
+        with open(os.path.join(txt_dir, file_name), "rb") as f:
+            data = f.read()
+        with open(os.path.join(txt_dir, file_name + file_ending), "wb") as f:
+            f.write(compress(data))
+        os.remove(os.path.join(txt_dir, file_name))
+    reader = MQReader(reader_dir, {"use_cache": False, "chunksize": 100}, loglevel=logging.WARNING)
+    assert reader.get_source_files("evidence")[0].endswith("evidence.txt" + file_ending)
+    for key in ("proteinGroups", "evidence", "msScans", "msScans_trace"):
+        pd.testing.assert_frame_equal(reader.full_data[key], expected.full_data[key])
+    summary = reader.full_data["evidence_summary"]
+    for key, df in expected.full_data["evidence_summary"].items():
+        pd.testing.assert_frame_equal(summary[key], df)
+
+
+def test_pyarrow_engine(reader_dir):
+    pytest.importorskip("pyarrow")
+    from mspypeline import MQReader
+    write_evidence(reader_dir)
+    txt_dir = os.path.join(reader_dir, "txt")
+    with open(os.path.join(txt_dir, "summary.txt"), "w") as f:
+        f.write("Raw file\tExperiment\tEnzyme\tMS/MS\n")
+        f.write("A_1_1\tA_1_1\tTrypsin/P\t10\nA_1_2\tA_1_2\tTrypsin/P\t12\nTotal\t\t\t22\n")
+        f.write("B_1_1\tB_1_1\tTrypsin/P\t\\u00e4\n")
+    with open(os.path.join(txt_dir, "parameters.txt"), "w") as f:
+        f.write("Parameter\tValue\nVersion\t1.6.0.16\nDate of writing\t2020-01-01\nFixed modifications\t\n")
+    expected = MQReader(reader_dir, {"use_cache": False, "chunksize": 37}, loglevel=logging.WARNING)
+    reader = MQReader(reader_dir, {"use_cache": False, "chunksize": 37, "csv_engine": "pyarrow"},
+                      loglevel=logging.WARNING)
+    for key in ("proteinGroups", "contaminants", "evidence", "msScans", "summary", "msScans_trace"):
+        pd.testing.assert_frame_equal(reader.full_data[key], expected.full_data[key])
+    pd.testing.assert_series_equal(reader.full_data["parameters"], expected.full_data["parameters"])
+    assert reader.full_data["summary"]["MS/MS"].iloc[-1] == "ä"
+    summary = reader.full_data["evidence_summary"]
+    for key, df in expected.full_data["evidence_summary"].items():
+        pd.testing.assert_frame_equal(summary[key], df)
+    # the types of the first block do not match the rest of the file
+    rows = ["\t".join(["A_1_1", str(i), "1"]) for i in range(200000)] + ["B_1_1\tnot a number\t1"]
+    with open(os.path.join(txt_dir, "msScans.txt"), "w") as f:
+        f.write("Raw file\tRetention time\tTotal ion current\n" + "\n".join(rows) + "\n")
+    reader.reader_config["chunksize"] = expected.reader_config["chunksize"] = 30000
+    chunks = list(reader.iter_txt_chunks("msScans.txt", ["Raw file", "Retention time", "Total ion current"]))
+    expected_chunks = list(expected.iter_txt_chunks("msScans.txt", ["Raw file", "Retention time",
+                                                                    "Total ion current"]))
+    pd.testing.assert_frame_equal(pd.concat(chunks).astype(str), pd.concat(expected_chunks).astype(str))
+    with pytest.raises(ValueError):
+        MQReader(reader_dir, {"use_cache": False, "csv_engine": "unknown"}, loglevel=logging.WARNING)
+
+
+def test_header_index(reader_dir, monkeypatch):
+    import gzip
+    from mspypeline import MQReader
+    evidence, _ = write_evidence(reader_dir, n_rows=5000)
+    reader = MQReader(reader_dir, {"use_cache": True}, loglevel=logging.WARNING)
+    info = reader.get_file_info("evidence.txt")
+    assert info["columns"] == list(evidence.columns)
+    assert info["dtypes"]["m/z"] == "float64"
+    assert not info["complete"]
+    assert abs(info["n_rows"] - len(evidence)) < 0.05 * len(evidence)
+    assert reader.get_chunksize("evidence.txt") == max(1000, int(MQReader.chunk_bytes / info["row_bytes"]))
+    assert os.path.isfile(os.path.join(reader_dir, "cache", "header_index.json"))
+    # the index is stored and only rebuilt if the file changes
+    describe_txt = MQReader.describe_txt
+    monkeypatch.setattr(MQReader, "describe_txt", lambda *args: pytest.fail("file was indexed again"))
+    reader = MQReader(reader_dir, {"use_cache": True}, loglevel=logging.WARNING)
+    assert reader.get_file_info("evidence.txt") == info
+    monkeypatch.setattr(MQReader, "describe_txt", describe_txt)
+    evidence_file = os.path.join(reader_dir, "txt", "evidence.txt")
+    evidence.drop("Retention length", axis=1).iloc[:100].to_csv(evidence_file, sep="\t", index=False)
+    os.utime(evidence_file, ns=(0, 0))
+    info = reader.get_file_info("evidence.txt")
+    assert info["complete"] and info["n_rows"] == 100
+    # sections of the report that can not be created are known before parsing
+    assert reader.full_data.is_available("evidence")
+    assert not reader.full_data.is_available("evidence_summary")
+    assert reader.full_data.is_available("msScans_trace")
+    assert not reader.full_data.is_available("peptides")
+    assert not reader.full_data.is_available("unknown")
+    with open(evidence_file + ".gz", "wb") as f:
+        f.write(gzip.compress(evidence.to_csv(sep="\t", index=False).encode()))
+    os.remove(evidence_file)
+    info = reader.get_file_info("evidence.txt")
+    assert abs(info["n_rows"] - len(evidence)) < 0.25 * len(evidence)
+
+
+def test_load_timings(reader_dir):
+    from mspypeline import MQReader
+    write_evidence(reader_dir)
+    reader = MQReader(reader_dir, {"use_cache": False, "chunksize": 100}, loglevel=logging.WARNING)
+    reader.full_data["proteinGroups"], reader.full_data["evidence"], reader.full_data["evidence_summary"]
+    df = reader.full_data.timings.to_frame()
+    stages = set(zip(df["key"], df["stage"]))
+    assert {("proteinGroups.txt", "parse"), ("proteinGroups.txt", "filter"), ("proteinGroups", "annotate"),
+            ("proteinGroups", "duplicates"), ("contaminants", "annotate"), ("proteinGroups", "load"),
+            ("evidence.txt", "parse"), ("evidence", "filter"), ("evidence", "rename"), ("evidence", "load"),
+            ("evidence.txt", "stream"), ("evidence_summary", "load")} <= stages
+    parse = df[(df["key"] == "evidence.txt") & (df["stage"] == "parse")].iloc[0]
+    assert parse["rows"] == 500
+    assert parse["bytes_read"] == os.path.getsize(os.path.join(reader_dir, "txt", "evidence.txt"))
+    assert parse["engine"] == "pandas"
+    # the evidence is read twice for the summary
+    assert (df[(df["key"] == "evidence.txt") & (df["stage"] == "stream")]["rows"] == 500).sum() == 2
+
+
+def test_incremental_protein_groups(tmp_path):
+    from mspypeline import MQReader
+    start_dir = str(tmp_path)
+    df = write_protein_groups(start_dir)
+    protein_groups_file = os.path.join(start_dir, "txt", "proteinGroups.txt")
+    # the first search contains only the samples of group A
+    df.loc[:, [col for col in df.columns if not col.endswith(("B_1_1", "B_1_2"))]].to_csv(
+        protein_groups_file, sep="\t", index=False)
+    config = {"use_cache": True, "incremental": True}
+    reader = MQReader(start_dir, dict(config), loglevel=logging.WARNING)
+    reader.full_data["proteinGroups"]
+    assert "sample_changes" not in reader.full_data
+    # samples of group B are added to the search
+    df.to_csv(protein_groups_file, sep="\t", index=False)
+    expected = MQReader(start_dir, {"use_cache": False}, loglevel=logging.WARNING)
+    reader = MQReader(start_dir, dict(config), loglevel=logging.WARNING)
+    for key in ("proteinGroups", "contaminants"):
+        pd.testing.assert_frame_equal(reader.full_data[key], expected.full_data[key])
+    assert reader.full_data["sample_changes"]["added"] == ["B_1_1", "B_1_2"]
+    stages = reader.full_data.timings.to_frame()
+    assert ("proteinGroups.txt", "merge") in set(zip(stages["key"], stages["stage"]))
+    # a new search changed the values of a previous sample, the complete file is read
+    changed = df.copy()
+    changed["iBAQ A_1_1"] += 1
+    changed["Intensity C_1_1"] = 1.
+    changed.to_csv(protein_groups_file, sep="\t", index=False)
+    expected = MQReader(start_dir, {"use_cache": False}, loglevel=logging.WARNING)
+    reader = MQReader(start_dir, dict(config), loglevel=logging.WARNING)
+    pd.testing.assert_frame_equal(reader.full_data["proteinGroups"], expected.full_data["proteinGroups"])
+    assert "sample_changes" not in reader.full_data
+    # the proteins changed, the complete file is read
+    df["Fasta headers"] = df["Fasta headers"].str.replace("Protein 5 ", "Protein five ")
+    df["Intensity C_1_1"] = 1.
+    df.to_csv(protein_groups_file, sep="\t", index=False)
+    expected = MQReader(start_dir, {"use_cache": False}, loglevel=logging.WARNING)
+    reader = MQReader(start_dir, dict(config), loglevel=logging.WARNING)
+    pd.testing.assert_frame_equal(reader.full_data["proteinGroups"], expected.full_data["proteinGroups"])
+    assert "sample_changes" not in reader.full_data
+    # the cached protein groups are not used with different settings
+    reader = MQReader(start_dir, dict(config, drop_columns=["C_1_1"]), loglevel=logging.WARNING)
+    assert reader.load_previous_protein_groups(reader.read_ingest_state()) is None
@@ -80,3 +80,192 @@ def test_get_plot_name_suffix():
     assert get_plot_name_suffix("test") == "_test"
     assert get_plot_name_suffix(level=1) == "_level_1"
     assert get_plot_name_suffix("test", 1) == "_test_level_1"
+
+
+def test_data_dict_cache(tmp_path):
+    from mspypeline.helpers import DataDict, DataCache, get_logger
+    import pandas as pd
+    import pytest
+    import os
+    pytest.importorskip("pyarrow")
+    source_file = tmp_path / "source.txt"
+    source_file.write_text("a\tb\n1\t2\n")
+
+    class Source:
+        logger = get_logger("Source")
+        n_calls = 0
+
+        def get_source_files(self, key):
+            return [str(source_file)] if key != "uncached" else []
+
+        def preprocess_table(self):
+            Source.n_calls += 1
+            return pd.read_csv(str(source_file), sep="\t")
+
+        def preprocess_series(self):
+            Source.n_calls += 1
+            return pd.Series(["x", "y"], index=pd.Index(["a", "b"], name="Parameter"), name="Value")
+
+    cache_dir = str(tmp_path / "cache")
+    for _ in range(2):
+        d = DataDict(Source(), cache=DataCache(cache_dir, {"option": 1}))
+        assert d["table"].equals(pd.DataFrame({"a": [1], "b": [2]}))
+        assert d["series"].equals(Source().preprocess_series())
+    # second DataDict was served from the cache
+    assert Source.n_calls == 4
+    # a different config does not match the cache
+    d = DataDict(Source(), cache=DataCache(cache_dir, {"option": 2}))
+    d["table"]
+    assert Source.n_calls == 5
+    # changing the source file invalidates the entry
+    source_file.write_text("a\tb\n1\t3\n")
+    d = DataDict(Source(), cache=DataCache(cache_dir, {"option": 2}))
+    assert d["table"].loc[0, "b"] == 3
+    assert Source.n_calls == 6
+    # files that are not cache entries are kept
+    (tmp_path / "cache" / "header_index.json").write_text("{}")
+    (tmp_path / "cache" / "protein_groups_state.json").write_text('{"samples": []}')
+    d.invalidate_cache()
+    assert sorted(os.listdir(cache_dir)) == ["header_index.json", "protein_groups_state.json"]
+
+
+def test_data_dict_prefetch():
+    from mspypeline.helpers import DataDict, get_logger
+    import threading
+    import pytest
+
+    class Source:
+        logger = get_logger("Source")
+        n_calls = {}
+        lock = threading.Lock()
+        # a and b are only loaded if both are loaded at the same time
+        barrier = threading.Barrier(2, timeout=10)
+
+        def load(self, key):
+            with Source.lock:
+                Source.n_calls[key] = Source.n_calls.get(key, 0) + 1
+            Source.barrier.wait()
+            return key
+
+        def preprocess_a(self):
+            return self.load("a")
+
+        def preprocess_b(self):
+            return self.load("b")
+
+    d = DataDict(Source())
+    futures = d.prefetch(["a", "b", "a", "missing"])
+    assert set(futures) == {"a", "b", "missing"}
+    # accessing a key that is loading waits for the data instead of loading it again
+    threads = [threading.Thread(target=d.__getitem__, args=("a",)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert d["a"] == "a" and d["b"] == "b"
+    assert Source.n_calls == {"a": 1, "b": 1}
+    # errors are raised on access
+    assert isinstance(futures["missing"].exception(), KeyError)
+    with pytest.raises(KeyError):
+        d["missing"]
+    assert d.prefetch(["a", "b"]) == {}
+
+
+def test_data_dict_memory_limit():
+    from mspypeline.helpers import DataDict, get_logger
+    import numpy as np
+    import pandas as pd
+
+    class Source:
+        logger = get_logger("Source")
+        n_calls = 0
+
+        def load(self):
+            Source.n_calls += 1
+            return pd.DataFrame(np.zeros((1000, 10)))
+
+        def preprocess_a(self):
+            return self.load()
+
+        def preprocess_b(self):
+            return self.load()
+
+        def preprocess_c(self):
+            return self.load()
+
+    size = DataDict.get_size(Source().load())
+    d = DataDict(Source(), memory_limit=int(3.5 * size))
+    d["fixed"] = pd.DataFrame(np.zeros((1000, 10)))
+    d["a"], d["b"], d["a"]
+    assert set(d) == {"fixed", "a", "b"}
+    d["c"]
+    # b was used least recently, data without preprocess function is never removed
+    assert set(d) == {"fixed", "a", "c"}
+    assert sum(d.sizes.values()) <= 3.5 * size
+    Source.n_calls = 0
+    assert d["b"].shape == (1000, 10)
+    assert Source.n_calls == 1
+    assert "a" not in d
+    # removed data is not counted
+    d.pop("b")
+    assert set(d.sizes) == set(d) == {"fixed", "c"}
+    d.popitem()
+    assert set(d.sizes) == set(d)
+    d.clear()
+    assert not d.sizes
+
+
+def test_data_dict_timings():
+    from mspypeline.helpers import DataDict, get_logger
+    import numpy as np
+    import pandas as pd
+    import pytest
+
+    class Source:
+        logger = get_logger("Source")
+
+        def preprocess_a(self):
+            with d.timings.measure("a", "parse", bytes_read=10):
+                return pd.DataFrame(np.zeros((100, 10)))
+
+        def preprocess_missing(self):
+            raise FileNotFoundError("missing.txt")
+
+    d = DataDict(Source())
+    d["a"]
+    with pytest.raises(KeyError):
+        d["missing"]
+    df = d.timings.to_frame().set_index(["key", "stage"])
+    assert list(df.index) == [("a", "parse"), ("a", "load"), ("missing", "load")]
+    assert df.loc[("a", "load"), "rows"] == 100
+    assert df.loc[("a", "load"), "memory"] == DataDict.get_size(d["a"])
+    assert df.loc[("a", "load"), "source"] == "disk"
+    assert df.loc[("a", "parse"), "bytes_read"] == 10
+    assert "FileNotFoundError" in df.loc[("missing", "load"), "error"]
+    assert (df["seconds"] >= 0).all()
+    assert "load" in d.timings.summary()
+
+
+def test_lazy_dict():
+    from mspypeline.helpers import LazyDict
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    d = LazyDict({"a": 0})
+    d.set_lazy("b", compute)
+    assert calls == []
+    assert "b" in d and list(d) == ["a", "b"] and len(d) == 2
+    assert d["b"] == 1 and d["b"] == 2
+    d["b"] = 10
+    assert d["b"] == 10 and calls == [1, 1]
+    d = LazyDict(cache=True)
+    d.set_lazy("c", compute)
+    assert d["c"] == 3 and d["c"] == 3
+    del d["c"]
+    assert "c" not in d
+    d.set_lazy("d", compute)
+    del d["d"]
+    assert dict(d) == {}
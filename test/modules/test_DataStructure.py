@@ -68,3 +68,288 @@ def test_simple_structure():
     assert tree["Ex1"].get_total_number_children(go_max_depth=True) == 4
     assert tree["Ex1_A"].get_total_number_children(go_max_depth=True) == 2
     assert tree["Ex1_A_1"].get_total_number_children(go_max_depth=True) == 0
+
+
+def test_array_backed_tree():
+    from mspypeline import DataNode, DataTree
+    import numpy as np
+    import pandas as pd
+    analysis_design = {"A": {"1": {"1": "A_1_1", "2": "A_1_2"}, "2": {"1": "A_2_1"}}, "B": {"1": {"1": "B_1_1"}}}
+    data = pd.DataFrame([[1., np.nan, 3., 4.], [5., 6., np.nan, np.nan]],
+                        columns=["B_1_1", "A_2_1", "A_1_2", "A_1_1"], index=["p1", "p2"])
+    tree = DataTree.from_analysis_design(analysis_design, data, True)
+    # all data is stored in one matrix, the columns below a node are consecutive
+    assert tree.values.shape == (2, 7)
+    assert np.shares_memory(tree["A"].aggregate(None).values, tree.values)
+    assert np.shares_memory(tree["A"].aggregate(None, go_max_depth=True).values, tree.values)
+    assert list(tree["A"].aggregate(None, go_max_depth=True).columns) == ["A_1_1", "A_1_2", "A_2_1"]
+    pd.testing.assert_series_equal(tree["A_1"].data, pd.Series([3.5, np.nan], index=["p1", "p2"], name="A_1"))
+    pd.testing.assert_series_equal(tree.aggregate("A", method="sum", go_max_depth=True),
+                                   pd.Series([7., 6.], index=["p1", "p2"], name="A"))
+    assert tree.aggregate("A", index="p2", method=None).shape == (1, 2)
+    # nodes created before the tree move their data into the tree
+    root = DataNode()
+    root["x"] = DataNode("x", parent=root, data=pd.Series([1., 2.], name="x"))
+    tree = DataTree(root)
+    assert root["x"].tree is tree and tree.values.shape == (2, 1)
+    root["x"].data = None
+    assert not root["x"].has_data
+    # integer data keeps its dtype, reductions return the same dtype as pandas
+    counts = pd.DataFrame([[1, 0, 3, 4], [5, 6, 0, 2]], columns=["B_1_1", "A_2_1", "A_1_2", "A_1_1"])
+    tree = DataTree.from_analysis_design(analysis_design, counts, False)
+    assert tree["A"].aggregate(None, go_max_depth=True).dtypes.tolist() == [np.int64] * 3
+    pd.testing.assert_series_equal(tree.aggregate("A", method="sum", go_max_depth=True),
+                                   counts[["A_1_1", "A_1_2", "A_2_1"]].sum(axis=1).rename("A"))
+    assert tree.aggregate("A", method="mean", go_max_depth=True).dtype == np.float64
+
+
+def test_cached_results():
+    from mspypeline import DataTree
+    import numpy as np
+    import pandas as pd
+    analysis_design = {"A": {"1": "A_1", "2": "A_2"}, "B": {"1": "B_1", "2": "B_2"}}
+    data = pd.DataFrame(np.arange(12, dtype=float).reshape(3, 4), columns=["A_1", "A_2", "B_1", "B_2"])
+    tree = DataTree.from_analysis_design(analysis_design, data, False)
+    result = tree.groupby(0)
+    assert tree.groupby(0) is result
+    assert tree["A"].aggregate(index=[0, 1]) is tree["A"].aggregate(index=[0, 1])
+    assert tree["A"].aggregate(index=[0, 1]) is not tree["A"].aggregate(index=[1, 2])
+    # results can not be changed
+    with pytest.raises(ValueError):
+        result.iloc[0, 0] = 100
+    with pytest.raises(ValueError):
+        tree["A"].aggregate(None).iloc[0, 0] = 100
+    # new data removes the stored results
+    tree.add_data(data * 2)
+    assert tree.groupby(0)["A"].tolist() == [1., 9., 17.]
+    tree.max_cached_results = 1
+    tree.groupby(1), tree.groupby(0)
+    assert len(tree.results) == 1
+    # the stored results are also limited by their size
+    tree.max_cached_results = None
+    tree.max_cached_bytes = 3 * 8 * 2
+    tree.groupby(0), tree["A"].aggregate(), tree["B"].aggregate()
+    # the groupby result is removed to store the aggregate of B
+    assert len(tree.results) == 2 and sum(tree.result_sizes.values()) == 3 * 8 * 2
+    assert tree.get_result_size(tree.groupby(0)) == 3 * 8 * 2
+    # results larger than the limit are not stored
+    tree.max_cached_bytes = 8
+    tree.clear_results()
+    result = tree.groupby(0)
+    assert tree.groupby(0) is not result and not tree.results
+
+
+@pytest.mark.parametrize("method", [None, "mean", "median", "sum", "count", "detected"])
+def test_level_segment_reductions(method):
+    from mspypeline import DataTree
+    import numpy as np
+    import pandas as pd
+    analysis_design = {"B": {"1": {"1": "B_1_1", "2": "B_1_2"}, "2": {"1": "B_2_1"}},
+                       "A": {"1": {"1": "A_1_1", "2": "A_1_2", "3": "A_1_3"}}}
+    data = pd.DataFrame(np.random.RandomState(0).normal(0, 1, (20, 6)),
+                        columns=["A_1_1", "A_1_2", "A_1_3", "B_1_1", "B_1_2", "B_2_1"])
+    data[data < -0.5] = np.nan
+    tree = DataTree.from_analysis_design(analysis_design, data, True)
+    for level in (0, 1):
+        for go_max_depth in (False, True):
+            result = tree.groupby(level, method=method, go_max_depth=go_max_depth)
+            expected = {key: tree[key].aggregate(method, go_max_depth) for key in tree.level_keys_full_name[level]}
+            expected = pd.concat(expected, axis=1)
+            assert result.columns.names[0] == "level_0"
+            assert list(result.columns) == list(expected.columns)
+            np.testing.assert_allclose(result.to_numpy(), expected.to_numpy())
+
+
+def test_node_iteration_and_lookup():
+    from mspypeline import DataNode, DataTree
+    analysis_design = {"A": {"1": "A_1", "2": "A_2"}, "B": {"1": "B_1"}}
+    tree = DataTree.from_analysis_design(analysis_design, None, False)
+    # nested iteration over the same node
+    pairs = [(x.name, y.name) for x in tree["A"] for y in tree["A"]]
+    assert pairs == [("1", "1"), ("1", "2"), ("2", "1"), ("2", "2")]
+    assert tree.nodes["A_2"] is tree["A"]["2"] is tree["A_2"]
+    assert set(tree.nodes) == {"A", "A_1", "A_2", "B", "B_1"}
+    tree["B"]["2"] = DataNode("2", 1, parent=tree["B"])
+    assert tree["B_2"].full_name == "B_2"
+    with pytest.raises(KeyError):
+        tree["C_1"]
+    with pytest.raises(AttributeError):
+        tree["A"].unknown_attribute = 1
+
+
+@pytest.mark.parametrize("method", ["mean", "sum", "count", "detected", "median"])
+def test_groupby_levels(method):
+    from mspypeline import DataTree
+    import numpy as np
+    import pandas as pd
+    analysis_design = {"B": {"1": {"1": "B_1_1", "2": "B_1_2"}, "2": {"1": "B_2_1"}},
+                       "A": {"1": {"1": "A_1_1", "2": "A_1_2", "3": "A_1_3"}, "2": "A_2"}}
+    data = pd.DataFrame(np.random.RandomState(0).normal(0, 1, (20, 7)),
+                        columns=["A_1_1", "A_1_2", "A_1_3", "A_2", "B_1_1", "B_1_2", "B_2_1"])
+    data[data < -0.5] = np.nan
+    for should_aggregate in (True, False):
+        for go_max_depth in (False, True):
+            for index in (None, [3, 1, 2]):
+                tree = DataTree.from_analysis_design(analysis_design, data, should_aggregate)
+                results = tree.groupby_levels([0, 1, 2], method=method, go_max_depth=go_max_depth, index=index)
+                assert sorted(results) == [0, 1, 2]
+                for level, result in results.items():
+                    # the results are stored for groupby
+                    assert tree.groupby(level, method=method, go_max_depth=go_max_depth, index=index) is result
+                    expected = DataTree.from_analysis_design(analysis_design, data, should_aggregate).groupby(
+                        level, method=method, go_max_depth=go_max_depth, index=index)
+                    pd.testing.assert_frame_equal(result, expected)
+                # only the levels without a stored result are calculated
+                tree.results.pop(("groupby_level", 1, None, method, go_max_depth, DataTree.get_index_key(index)))
+                calculated = []
+                get_level_groups = tree.get_level_groups
+                tree.get_level_groups = lambda level, *args: calculated.append(level) or get_level_groups(level, *args)
+                again = tree.groupby_levels([0, 1, 2], method=method, go_max_depth=go_max_depth, index=index)
+                assert again[0] is results[0] and again[2] is results[2]
+                pd.testing.assert_frame_equal(again[1], results[1])
+                assert calculated.count(0) == 0 and calculated.count(2) == 0
+
+
+def test_detection_bits():
+    from mspypeline import DataTree
+    import numpy as np
+    import pandas as pd
+    # more than 8 samples, so the groups span multiple bytes of the bitmap
+    analysis_design = {group: {str(i): f"{group}_{i}" for i in range(1, 7)} for group in ("A", "B")}
+    columns = [f"{group}_{i}" for group in ("A", "B") for i in range(1, 7)]
+    data = pd.DataFrame(np.random.RandomState(1).normal(0, 1, (30, 12)), columns=columns)
+    data[data < -1] = np.nan
+    tree = DataTree.from_analysis_design(analysis_design, data, False)
+    assert tree.detected is None
+    for key in ("A", "B", "A_3"):
+        intensities = tree[key].aggregate(None)
+        np.testing.assert_array_equal(tree[key].aggregate("detected"), (intensities > 0).sum(axis=1))
+        pd.testing.assert_frame_equal(tree[key].get_detected(), intensities > 0)
+    assert tree.detected.shape == (30, 2)
+    # columns that are not consecutive
+    counts = tree.count_detected(["A_2", "B_5", "A_6"], index=[4, 2])
+    assert counts.tolist() == (data.loc[[4, 2], ["A_2", "B_5", "A_6"]] > 0).sum(axis=1).tolist()
+    np.testing.assert_array_equal(tree.groupby(0, method="detected"), (data > 0).groupby(
+        lambda x: x.split("_")[0], axis=1).sum())
+    # new data replaces the bitmap
+    tree.add_data(-data)
+    assert tree.detected is None
+    assert tree["A"].aggregate("detected").tolist() == (-data.loc[:, columns[:6]] > 0).sum(axis=1).tolist()
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_snapshot(tmp_path, mmap):
+    from mspypeline import DataTree
+    import numpy as np
+    import pandas as pd
+    analysis_design = {"B": {"1": {"1": "B_1_1", "2": "B_1_2"}, "2": {"1": "B_2_1"}},
+                       "A": {"1": {"1": "A_1_1", "2": "A_1_2"}}}
+    data = pd.DataFrame(np.random.RandomState(0).normal(0, 1, (10, 5)),
+                        columns=["A_1_1", "A_1_2", "B_1_1", "B_1_2", "B_2_1"],
+                        index=pd.Index([f"P{i}" for i in range(10)], name="Protein"))
+    data[data < -0.5] = np.nan
+    tree = DataTree.from_analysis_design(analysis_design, data, True)
+    path = str(tmp_path / "tree.snapshot")
+    tree.to_snapshot(path)
+    loaded = DataTree.from_snapshot(path, mmap=mmap)
+    assert dict(loaded.level_keys_full_name) == dict(tree.level_keys_full_name)
+    assert list(loaded.nodes) == list(tree.nodes)
+    assert loaded["B_1"].parent is loaded["B"]
+    assert loaded["B_1"].level == 1
+    assert loaded.column_positions == tree.column_positions
+    for level in (0, 1):
+        pd.testing.assert_frame_equal(loaded.groupby(level), tree.groupby(level))
+    pd.testing.assert_frame_equal(loaded.aggregate("A", None, go_max_depth=True),
+                                  tree.aggregate("A", None, go_max_depth=True))
+    # the matrix can not be changed
+    with pytest.raises(ValueError):
+        loaded.values[0, 0] = 1
+    # the dtype of the values is kept
+    tree = DataTree.from_analysis_design(analysis_design, (data.fillna(0) * 10).astype(int), False)
+    tree.to_snapshot(path)
+    loaded = DataTree.from_snapshot(path, mmap=mmap)
+    assert loaded.values.dtype == np.int64
+    pd.testing.assert_frame_equal(loaded.groupby(0, method="sum"), tree.groupby(0, method="sum"))
+    # names and dtypes of all index levels are kept
+    for index in (pd.MultiIndex.from_arrays([[f"P{i}" for i in range(10)], list(range(10))], names=["Protein", "Id"]),
+                  pd.Index([(f"P{i}", i) for i in range(10)], tupleize_cols=False, name="Protein")):
+        data.index = index
+        tree = DataTree.from_analysis_design(analysis_design, data, True)
+        tree.to_snapshot(path)
+        loaded = DataTree.from_snapshot(path, mmap=mmap)
+        pd.testing.assert_index_equal(loaded.index, index)
+        pd.testing.assert_frame_equal(loaded.groupby(0), tree.groupby(0))
+    # a tree without data
+    tree = DataTree.from_analysis_design(analysis_design, None, False)
+    tree.to_snapshot(path)
+    loaded = DataTree.from_snapshot(path, mmap=mmap)
+    assert loaded.values is None and list(loaded.nodes) == list(tree.nodes)
+    with open(path, "wb") as f:
+        f.write(b"not a tree")
+    with pytest.raises(ValueError):
+        DataTree.from_snapshot(path)
+
+
+def test_row_positions():
+    from mspypeline import DataTree
+    import numpy as np
+    import pandas as pd
+    analysis_design = {"A": {"1": "A_1", "2": "A_2"}, "B": {"1": "B_1", "2": "B_2"}}
+    data = pd.DataFrame(np.arange(20, dtype=float).reshape(5, 4), columns=["A_1", "A_2", "B_1", "B_2"],
+                        index=["P1", "P2", "P3", "P4", "P5"])
+    tree = DataTree.from_analysis_design(analysis_design, data, False)
+    tree.max_cached_results = 2
+    index = ["P4", "P1"]
+    pd.testing.assert_frame_equal(tree.aggregate(None, None, index=index), data.loc[index])
+    np.testing.assert_array_equal(tree.get_row_positions(index), [3, 0])
+    assert tree.get_row_positions(index) is tree.get_row_positions(tuple(index))
+    np.testing.assert_array_equal(tree.groupby(0, method=None, index=index), data.loc[index])
+    assert tree.aggregate("B", "detected", index=index).tolist() == [2, 2]
+    assert tree["B"].get_detected(index="P2").index.tolist() == ["P2"]
+    # a single label gives one row
+    assert tree.aggregate("A", None, index="P2").to_numpy().tolist() == [[4., 5.]]
+    assert tree.get_row_positions("P6") is None
+    with pytest.raises(KeyError):
+        tree.aggregate("A", None, index="P6")
+    assert len(tree.row_positions) == 2
+    # positions of an index with duplicates are not resolved
+    tree = DataTree.from_analysis_design(analysis_design, data.rename({"P2": "P1"}), False)
+    assert tree.get_row_positions(["P1"]) is None
+    assert tree.aggregate("A", None, index=["P1"]).shape == (2, 2)
+
+
+@pytest.mark.parametrize("should_aggregate", [True, False])
+def test_transformed_tree(should_aggregate):
+    from mspypeline import DataTree
+    import numpy as np
+    import pandas as pd
+    analysis_design = {"B": {"1": {"1": "B_1_1", "2": "B_1_2"}, "2": {"1": "B_2_1"}},
+                       "A": {"1": {"1": "A_1_1", "2": "A_1_2", "3": "A_1_3"}}}
+    data = pd.DataFrame(np.exp2(np.random.RandomState(0).normal(20, 2, (20, 6))),
+                        columns=["A_1_1", "A_1_2", "A_1_3", "B_1_1", "B_1_2", "B_2_1"])
+    data[data < 2 ** 19] = np.nan
+    tree = DataTree.from_analysis_design(analysis_design, data, should_aggregate)
+    log2_tree = DataTree.from_transform(tree, "log2", should_aggregate)
+    expected = DataTree.from_analysis_design(analysis_design, np.log2(data), should_aggregate)
+    # the matrix is shared, only the aggregated technical replicates are stored
+    assert log2_tree.source_values is tree.values
+    assert log2_tree.values is None or log2_tree.values.shape == (20, 3)
+    assert log2_tree["A_1"].has_data == expected["A_1"].has_data
+    for level in (0, 1):
+        for method in (None, "mean", "median", "detected"):
+            for go_max_depth in (False, True):
+                pd.testing.assert_frame_equal(
+                    log2_tree.groupby(level, method=method, go_max_depth=go_max_depth, index=[3, 1]),
+                    expected.groupby(level, method=method, go_max_depth=go_max_depth, index=[3, 1]))
+    pd.testing.assert_series_equal(log2_tree["B_2_1"].data, expected["B_2_1"].data)
+    pd.testing.assert_frame_equal(log2_tree["A"].get_detected(True), expected["A"].get_detected(True))
+    # new data with the same index is added next to the shared matrix
+    log2_tree.add_data(np.log2(data.iloc[:, :3] * 2))
+    expected.add_data(np.log2(data.iloc[:, :3] * 2))
+    assert log2_tree.source_values is tree.values
+    pd.testing.assert_frame_equal(log2_tree.aggregate(None, None, True), expected.aggregate(None, None, True))
+    log2_tree.materialize()
+    assert log2_tree.source_values is None
+    pd.testing.assert_frame_equal(log2_tree.aggregate(None, None, True), expected.aggregate(None, None, True))
+    with pytest.raises(ValueError):
+        DataTree.from_transform(tree, "log10")
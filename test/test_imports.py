@@ -9,9 +9,10 @@ def test_import():
     assert inspect.isclass(UIHandler)
     assert inspect.isclass(MaxQuantPlotter)
     # test imports from file reader
-    from mspypeline import BaseReader, MQReader
+    from mspypeline import BaseReader, MQReader, MQBatchReader
     assert inspect.isclass(BaseReader)
     assert inspect.isclass(MQReader)
+    assert inspect.isclass(MQBatchReader)
     # test imports from modules
     from mspypeline import DataTree, DataNode, MedianNormalizer, QuantileNormalizer, TailRobustNormalizer
     assert inspect.isclass(DataTree)
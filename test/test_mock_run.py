@@ -6,14 +6,14 @@ from test.mock_data import MockData
 
 
 def experiment_design_location(experimental_design):
-    script_loc = os.path.dirname(os.path.realpath(__file__))
-    path_mock_data = os.path.join(script_loc, "mock_data")
-    return os.path.join(path_mock_data, experimental_design)
+    return os.path.join(MockData.mock_data_dir, experimental_design)
 
 
 # TODO test case with no pathways and go terms
 @pytest.mark.slow
-def test_all_designs_raw():
+def test_all_designs_raw(tmp_path, monkeypatch):
+    # the data, config and plots are written to a temporary dir instead of the test dir
+    monkeypatch.setattr(MockData, "mock_data_dir", str(tmp_path / "mock_data"))
     MockData.delete_mock_data()
     MockData.create_mock_data()
     configs = {